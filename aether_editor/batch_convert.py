@@ -0,0 +1,162 @@
+"""
+Module containing the headless batch converter of the Aether Editor.
+
+Converts a tree of Markdown files to HTML and/or PDF without opening the editor
+window, using the same markdown extensions and CSS themes of the preview. The
+files are distributed over a pool of processes, each one with its own offscreen
+QGuiApplication and its own MarkdownRenderer, so the throughput grows with the
+number of cores.
+
+Example:
+    results = convert_tree("docs", "build/docs", formats=("html", "pdf"), theme="github_light_style.css")
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterator, NamedTuple
+
+MARKDOWN_SUFFIXES = (".md", ".markdown")
+
+# state of each worker process, created by _init_worker.
+_worker = {}
+
+
+class ConversionResult(NamedTuple):
+    """
+    The outcome of the conversion of a single Markdown file.
+
+    Attributes:
+        source (str): the path of the Markdown file.
+        outputs (tuple[str, ...]): the paths of the files written.
+        error (str or None): the error message, None if the conversion succeeded.
+    """
+    source: str
+    outputs: tuple
+    error: str
+
+
+def find_markdown_files(source: str) -> Iterator[str]:
+    """
+    Lists the Markdown files of a directory tree (or the file itself).
+
+    Args:
+        source (str): a directory or a Markdown file.
+
+    Yields:
+        str: the path of each Markdown file, in a stable order.
+    """
+    if os.path.isfile(source):
+        yield source
+        return
+
+    for directory, subdirectories, files in os.walk(source):
+        subdirectories.sort()
+        for name in sorted(files):
+            if name.lower().endswith(MARKDOWN_SUFFIXES):
+                yield os.path.join(directory, name)
+
+
+def _init_worker(theme: str, formats: tuple) -> None:
+    """
+    Prepares a worker process: Qt offscreen application, theme and renderer.
+
+    Args:
+        theme (str): the CSS file name of the theme, in documents_styles.
+        formats (tuple[str, ...]): the output formats ('html' and/or 'pdf').
+    """
+    os.environ["QT_QPA_PLATFORM"] = "offscreen"
+
+    from PySide6.QtGui import QGuiApplication
+
+    from .constants import get_css_style, set_css_style
+    from .markdown_renderer import MarkdownRenderer
+
+    if "pdf" in formats and QGuiApplication.instance() is None:
+        _worker["app"] = QGuiApplication([])
+    set_css_style(theme)
+    _worker["css"] = get_css_style()
+    _worker["renderer"] = MarkdownRenderer()
+    _worker["formats"] = formats
+
+
+def _convert_file(job: tuple) -> ConversionResult:
+    """
+    Converts one Markdown file in a worker process.
+
+    Args:
+        job (tuple[str, str]): the path of the Markdown file and the output path without suffix.
+
+    Returns:
+        ConversionResult: the outcome of the conversion.
+    """
+    from .markdown_renderer import build_html_document
+
+    source, output_base = job
+    outputs = []
+    try:
+        with open(source, "r", encoding="utf-8") as file:
+            markdown_text = file.read()
+
+        html_document = build_html_document(_worker["renderer"].render_html(markdown_text), _worker["css"])
+        os.makedirs(os.path.dirname(output_base) or ".", exist_ok=True)
+
+        if "html" in _worker["formats"]:
+            with open(output_base + ".html", "w", encoding="utf-8") as file:
+                file.write(html_document)
+            outputs.append(output_base + ".html")
+
+        if "pdf" in _worker["formats"]:
+            from .pdf_exporter import write_pdf
+
+            write_pdf(html_document, output_base + ".pdf", base_dir=os.path.dirname(os.path.abspath(source)))
+            outputs.append(output_base + ".pdf")
+
+    except Exception as e:
+        return ConversionResult(source, tuple(outputs), str(e))
+    return ConversionResult(source, tuple(outputs), None)
+
+
+def convert_tree(
+    source: str,
+    output_dir: str,
+    formats: tuple = ("html",),
+    theme: str = "main_style.css",
+    jobs: int = None,
+    on_result: Callable[[ConversionResult], None] = None
+) -> list:
+    """
+    Converts every Markdown file of a directory tree, in parallel.
+
+    The output tree mirrors the source tree: "docs/a/b.md" becomes
+    "<output_dir>/a/b.html" and/or "<output_dir>/a/b.pdf".
+
+    Args:
+        source (str): a directory or a Markdown file.
+        output_dir (str): the directory where the converted files are written.
+        formats (tuple[str, ...]): the output formats ('html' and/or 'pdf').
+        theme (str): the CSS file name of the theme, in documents_styles.
+        jobs (int or None): the number of worker processes, the number of cores by default.
+        on_result (Callable[[ConversionResult], None] or None): called for each finished file.
+
+    Returns:
+        list[ConversionResult]: the outcome of every file, in the order they were found.
+    """
+    root = source if os.path.isdir(source) else os.path.dirname(source)
+    sources = list(find_markdown_files(source))
+    job_list = [
+        (path, os.path.join(output_dir, os.path.splitext(os.path.relpath(path, root))[0]))
+        for path in sources
+    ]
+    if not job_list:
+        return []
+
+    workers = max(1, min(jobs or os.cpu_count() or 1, len(job_list)))
+    # small chunks keep the load balanced; bigger ones save inter-process traffic.
+    chunksize = max(1, len(job_list) // (workers * 8))
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(theme, tuple(formats))) as executor:
+        for result in executor.map(_convert_file, job_list, chunksize=chunksize):
+            results.append(result)
+            if on_result:
+                on_result(result)
+    return results
@@ -1,16 +1,33 @@
+import time
+from collections import OrderedDict
+
 from PySide6.QtCore import (
     Qt, 
+    QEvent,
+    QObject,
+    QPointF,
     QRect, 
     QSize, 
+    QRunnable,
+    QThreadPool,
+    QTimer,
+    Signal,
     Slot
 )
 from PySide6.QtGui import (
     QColor, 
     QFont,
+    QFontMetrics,
     QPainter, 
+    QStaticText,
+    QTextBlock,
+    QTextBlockUserData,
     QTextCharFormat, 
+    QTextCursor,
+    QTextDocument,
+    QTextLayout,
+    QTransform,
     QPalette,
-    QSyntaxHighlighter,
 )
 from PySide6.QtWidgets import (
     QWidget, 
@@ -18,28 +35,176 @@ from PySide6.QtWidgets import (
     QTextEdit
 )
 from PySide6.QtCore import Qt
-import re
 
-class MarkdownHighlighter(QSyntaxHighlighter):
+from .code_lexer import (
+    fence_language,
+    get_lexer,
+    is_lexer_loaded,
+    lex_code,
+    lex_line
+)
+from .constants import EDITOR_CODE_STYLE, SEARCH_MATCH_COLOR
+from .heading_index import HeadingIndex
+from .instrumentation import traced
+from .markdown_tokenizer import (
+    BOLD,
+    CODE_BLOCK,
+    CODE_INLINE,
+    HEADER,
+    ITALIC,
+    LIST,
+    QUOTE,
+    STATE_CODE,
+    STATE_NORMAL,
+    flatten_spans,
+    parse_heading,
+    scan_code_fence,
+    scan_markdown_line
+)
+from .text_search import TextSearch
+from shiboken6 import isValid
+
+class CodeBlockData(QTextBlockUserData):
     """
-    Custom syntax highlighter (QSyntaxHighlighter) for Markdown.
+    Pygments tokens of a line of a fenced code block, kept in the block.
+
+    Attributes:
+        language (str or None): the language of the code block.
+        text_hash (int or None): hash of the text the tokens were found in (None in the opening line).
+        tokens (list[tuple[int, int, pygments.token._TokenType]]): the (start, length, token type) tokens that have a format.
+        fence_hash (int or None): in the opening line, hash of the language and the code the block was last lexed with
+            (and of None, for a language without lexer).
+    """
+    def __init__(self, language: str, text_hash: int, tokens: list, fence_hash: int = None):
+        super().__init__()
+        self.language = language
+        self.text_hash = text_hash
+        self.tokens = tokens
+        self.fence_hash = fence_hash
+
+
+class LexerLoadSignals(QObject):
+    """
+    Signals emitted by a LexerLoadTask, delivered in the thread of the receiver.
+
+    Attributes:
+        loaded (Signal(str)): the language whose lexer was looked up.
+    """
+    loaded = Signal(str)
+
+
+class LexerLoadTask(QRunnable):
+    """
+    Worker that imports Pygments and creates the lexer of a language, keeping the GUI thread free.
+
+    Attributes:
+        language (str): the language of the lexer.
+        signals (LexerLoadSignals): signals used to report the end of the lookup.
+    """
+    def __init__(self, language: str):
+        super().__init__()
+        self.language = language
+        self.signals = LexerLoadSignals()
+
+    def run(self):
+        """Looks up the lexer; get_lexer() keeps it for the GUI thread."""
+        try:
+            get_lexer(self.language)
+        finally:
+            self.signals.loaded.emit(self.language)
+
+
+class MarkdownHighlighter(QObject):
+    """
+    Custom syntax highlighter for Markdown, with lazy highlighting of large documents.
 
     This class applies syntax highlighting to Markdown elements, such as headings, bold, italics,
-    and lists. The highlighting uses regular expressions for single-line rules. For multi-line code blocks (enclosed by ```),
-    the QSyntaxHighlighter's state logic is used, applying a specific text color format to distinguish the code.
+    and lists. Each line is scanned once by scan_markdown_line (see markdown_tokenizer), which returns
+    the spans to format; the formats are set on the layout of the block, like QSyntaxHighlighter does.
+    For multi-line code blocks (enclosed by ```), the user state of each block records whether it
+    ends inside a code block, so the code block highlighting extends over multiple lines.
+
+    QSyntaxHighlighter highlights every changed block as soon as the document changes, which
+    makes loading a big file cost one call per line before the first paint. Here the changes
+    only mark blocks as pending. Once the visible blocks are known (see set_visible_blocks),
+    the code block states are brought up to date until the end of the screen with a cheap
+    scan (scan_code_fence), the visible blocks are highlighted at once and the others are
+    highlighted in small time slices while the event loop is idle. Without visible blocks,
+    every change is highlighted at once.
+
+    Code blocks with a language are colored with the matching Pygments lexer. The tokens
+    of each line are kept in its CodeBlockData and reused while its text is the same.
+    The whole code block is lexed when its opening line is highlighted, which is exact even
+    for tokens that span several lines. An edited line is lexed on its own at once, and its
+    code block is lexed again FENCE_LEX_DELAY_MS after the last edit, so typing in a long
+    code block does not lex all of it on every keystroke. A lexer that was never loaded is
+    created in a worker thread (see LexerLoadTask), and its code blocks stay plain until then.
 
     Attributes:
-        highlighting_rules (list): Single-line highlighting rules (Regex and format).
+        span_formats (dict[str, QTextCharFormat]): The format of each kind of span returned by the scanner.
         code_block_format (QTextCharFormat): Format for multi-line code blocks (text color only).
+        visible_blocks (tuple[int, int] or None): The first and last visible block numbers; None highlights every change at once.
+        idle_timer (QTimer): Zero interval timer that highlights the pending blocks between events.
+        fence_timer (QTimer): Single shot timer that lexes again the code blocks edited line by line.
+        headings (HeadingIndex): The headings of the document, updated with each highlighted line.
     """
-    STATE_NORMAL = 0
-    STATE_CODE = 1
-    def __init__(self, parent):
+    STATE_NORMAL = STATE_NORMAL
+    STATE_CODE = STATE_CODE
+    # blocks highlighted at once above and below the visible ones.
+    VISIBLE_MARGIN = 50
+    # time spent highlighting pending blocks on each pass of the event loop.
+    SLICE_MS = 8
+    # blocks whose state is followed at a time after an edit changed the state of the next ones.
+    STATE_BATCH = 1000
+    # the layouts copy the format ranges, so the same ones are reused for the spans that repeat.
+    FORMAT_RANGE_CACHE_SIZE = 4096
+    # time without edits before the edited code blocks are lexed again as a whole.
+    FENCE_LEX_DELAY_MS = 300
+    # longer code blocks are only lexed line by line.
+    FENCE_LEX_MAX_LINES = 5000
+
+    def __init__(self, parent: QTextDocument):
+        """
+        Initializes the highlighter and installs it on a document.
+
+        Args:
+            parent (QTextDocument): the highlighted document, which is also the parent object.
+        """
         super().__init__(parent)
+        self.visible_blocks = None
+        self._document = None
+        # blocks whose state may be wrong, then blocks whose formats may be outdated; both
+        # are [first, last] ranges of block positions kept by cursors that follow the edits.
+        self._stale_states = None
+        self._stale_formats = None
+        self._visible_changed = False
+        self._format_ranges = {}
+        self.idle_timer = QTimer(self)
+        self.idle_timer.setInterval(0)
+        self.idle_timer.timeout.connect(self._highlight_pending_blocks)
+        self._pending_fences = []
+        # the numbers of the last line inside a code block and of its opening line, while the states before it do not change.
+        self._last_fence_line = None
+        # cursors in the code blocks that wait for the lexer of their language, and the load tasks.
+        self._waiting_fences = {}
+        self._lexer_tasks = {}
+        self._token_formats = {}
+        self.headings = HeadingIndex(self)
+        self.fence_timer = QTimer(self)
+        self.fence_timer.setSingleShot(True)
+        self.fence_timer.setInterval(self.FENCE_LEX_DELAY_MS)
+        self.fence_timer.timeout.connect(self._lex_pending_fences)
         self._setup_styles()
-        self.highlighting_rules = []
-        self._setup_rules()
-        
+        self.span_formats = {
+            LIST: self.list_format,
+            HEADER: self.header_format,
+            BOLD: self.bold_format,
+            ITALIC: self.italic_format,
+            QUOTE: self.quote_format,
+            CODE_INLINE: self.code_inline_format,
+            CODE_BLOCK: self.code_block_format,
+        }
+        self.setDocument(parent)
 
     def _setup_styles(self):
         """
@@ -84,82 +249,708 @@ class MarkdownHighlighter(QSyntaxHighlighter):
         self.default_text_format = QTextCharFormat()
         self.default_text_format.setForeground(QColor("#D0D0D0"))
 
-    def _setup_rules(self):
-        """Define as regras Regex para realce de linha única."""
-        self.highlighting_rules.append(
-            (re.compile(r"^\s*(\*|\-|\+|\d+\.)\s+.*"), self.list_format)
-        )
-        self.highlighting_rules.append((re.compile(r'^#+\s.*'), self.header_format)) 
-        self.highlighting_rules.append((re.compile(r'(\*\*|__)(.+?)(\*\*|__)'), self.bold_format))
-        self.highlighting_rules.append((re.compile(r'(\*|_)(.+?)(\*|_)'), self.italic_format))
-        self.highlighting_rules.append((re.compile(r'^>\s.*'), self.quote_format))
-        self.highlighting_rules.append((re.compile(r'`[^`]+`'), self.code_inline_format))
-        
-        self.start_code_block_exp = re.compile(r"^\s*`{3}")
-        self.end_code_block_exp = re.compile(r"`{3}\s*$")
+    def document(self) -> QTextDocument:
+        """
+        Returns:
+            QTextDocument or None: the highlighted document.
+        """
+        return self._document
 
-    def highlightBlock(self, text: str):
+    def setDocument(self, document: QTextDocument) -> None:
         """
-        Applies syntax highlighting to the provided text block (line).
+        Installs the highlighter on another document, which is entirely highlighted again.
 
-        Highlighting occurs in two phases: applying single-line rules
-        (Regex) and managing state for multi-line blocks.
+        Args:
+            document (QTextDocument or None): the new document.
+        """
+        # the previous document may have been deleted by the editor when it was replaced.
+        if self._document is not None and isValid(self._document):
+            self._document.contentsChange.disconnect(self._on_contents_change)
+        self._document = document
+        self._stale_states = self._stale_formats = None
+        self._pending_fences = []
+        self._last_fence_line = None
+        self._waiting_fences = {language: [] for language in self._lexer_tasks}
+        self.headings.clear()
+        self.idle_timer.stop()
+        self.fence_timer.stop()
+        if document is not None:
+            document.contentsChange.connect(self._on_contents_change)
+            self.rehighlight()
 
-        1. **Single-Line Rules (Regex):** Elements such as headings, lists,
-        bold, italics, and inline code are formatted independently
-        of the previous block's state.
+    def set_visible_blocks(self, first: int, last: int) -> None:
+        """
+        Informs the range of blocks on screen, which is highlighted before the others.
 
-        2. **Multi-Line Block Management (State):** The method uses the state
-        of the previous block (`previousBlockState()`) and sets the state of the current block (`setCurrentBlockState()`) to track the extent of code blocks
-        (delimited by ```). The state allows the code block highlighting to extend over multiple lines.
+        Args:
+            first (int): the number of the first visible block.
+            last (int): the number of the last visible block.
+        """
+        if self.visible_blocks == (first, last):
+            return
+        self.visible_blocks = (first, last)
+        if self._stale_formats is not None:
+            self._visible_changed = True
+            self.idle_timer.start()
+
+    @Slot()
+    def rehighlight(self) -> None:
+        """Highlights the whole document again."""
+        if self._document is not None:
+            self.rehighlightBlocks(self._document.begin(), self._document.lastBlock())
+
+    def rehighlightBlock(self, block: QTextBlock) -> None:
+        """
+        Highlights a block again, and the following ones if its state changes.
 
         Args:
-            text: The text string of the current block (line) to be processed.
+            block (QTextBlock): the block to highlight.
         """
-        for expression, format in self.highlighting_rules:
-            for match in expression.finditer(text):
-                self.setFormat(match.start(), match.end() - match.start(), format)
-        
-        current_state = self.previousBlockState()
-        index = 0
-        
-        while index < len(text):
-            
-            if current_state == self.STATE_CODE:
-                end_match = self.end_code_block_exp.search(text, index)
-                
-                if end_match:
-                    self.setFormat(0, end_match.end(), self.code_block_format)
-                    current_state = self.STATE_NORMAL
-                    index = end_match.end()
-                    continue 
-
-                else:
-                    self.setFormat(0, len(text), self.code_block_format)
-                    break 
-            
+        self.rehighlightBlocks(block, block)
+
+    def rehighlightBlocks(self, first: QTextBlock, last: QTextBlock) -> None:
+        """
+        Highlights a range of blocks again, and the following ones if the state of the last changes.
+
+        The visible blocks are highlighted at once, the others in the idle time.
+
+        Args:
+            first (QTextBlock): the first block of the range.
+            last (QTextBlock): the last block of the range.
+        """
+        self._stale_states = self._extend_range(self._stale_states, first.position(), last.position())
+        self._stale_formats = self._extend_range(self._stale_formats, first.position(), last.position())
+        if self.visible_blocks is None:
+            self._highlight_all_pending_blocks()
+            return
+        self._highlight_visible_blocks()
+        if self._stale_formats is not None or self._stale_states is not None:
+            self.idle_timer.start()
+
+    @Slot(int, int, int)
+    def _on_contents_change(self, position: int, removed: int, added: int):
+        """
+        Marks the blocks touched by an edit as pending and highlights the visible ones.
+
+        Args:
+            position (int): the position of the change.
+            removed (int): the number of removed characters.
+            added (int): the number of inserted characters.
+        """
+        # the changes that replace the whole document count the final paragraph separator.
+        end = min(position + added, self._document.characterCount() - 1)
+        self._last_fence_line = None
+        self.rehighlightBlocks(self._document.findBlock(position), self._document.findBlock(end))
+
+    @Slot()
+    def _highlight_pending_blocks(self):
+        """Highlights pending blocks for a time slice, the visible ones first."""
+        deadline = time.perf_counter() + self.SLICE_MS / 1000
+        if self._visible_changed:
+            self._visible_changed = False
+            self._highlight_visible_blocks()
+        self._highlight_next_pending_blocks(deadline)
+        if self._stale_formats is None and self._stale_states is None:
+            self.idle_timer.stop()
+
+    def _highlight_all_pending_blocks(self) -> None:
+        """Highlights every pending block at once."""
+        self._highlight_next_pending_blocks(None)
+
+    @traced("highlight")
+    def _highlight_next_pending_blocks(self, deadline: float) -> None:
+        """
+        Highlights the blocks with outdated formats in order, following the changes of states.
+
+        Args:
+            deadline (float or None): the time.perf_counter() value to stop at; None runs until nothing is pending.
+        """
+        while self._stale_formats is not None or self._stale_states is not None:
+            if self._stale_formats is None:
+                # the last changed block passed a new state on: follow it until the states agree again.
+                self._update_states_ahead(self._document.findBlock(self._stale_states[0].position()))
             else:
-                start_match = self.start_code_block_exp.search(text, index)
-                
-                if start_match:
-                    start_pos = start_match.start()
-                    index = start_match.end()
-                    
-                    end_match = self.end_code_block_exp.search(text, index)
-                    
-                    if end_match:
-                        self.setFormat(start_pos, end_match.end() - start_pos, self.code_block_format)
-                        index = end_match.end()
-                        current_state = self.STATE_NORMAL
-                    else:
-                        self.setFormat(start_pos, len(text) - start_pos, self.code_block_format)
-                        current_state = self.STATE_CODE 
-                        break
-
-                else:
-                    break 
-        
-        self.setCurrentBlockState(current_state)
+                self._highlight_stale_formats(deadline)
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+
+    def _highlight_stale_formats(self, deadline: float) -> None:
+        """
+        Highlights consecutive blocks from the start of the outdated formats.
+
+        Highlighting a block also sets its state, so the pending states reached by
+        the run are followed here instead of being scanned twice.
+
+        Args:
+            deadline (float or None): the time.perf_counter() value to stop at; None runs to the end of the range.
+        """
+        start, end = self._stale_formats
+        first = block = self._document.findBlock(start.position())
+        formats_end = end.position()
+        if self._stale_states is not None and self._stale_states[0].position() < block.position():
+            self._update_states(block.previous().position())
+        states_start = states_end = None
+        if self._stale_states is not None:
+            # an insertion at the start of a block moves the cursors inside it.
+            states_start, states_end = (self._document.findBlock(cursor.position()).position() for cursor in self._stale_states)
+
+        while True:
+            changed = self._highlight_block(block)
+            position = block.position()
+            following = block.next()
+            following_states = states_start is not None and position >= states_start
+            if following_states and position >= states_end and not changed:
+                # the following blocks keep their states, since this one passes on the same state.
+                self._stale_states = None
+                states_start = None
+                following_states = False
+            if not following.isValid() or (following.position() > formats_end and not following_states):
+                self._stale_formats = None
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                start.setPosition(following.position())
+                if following.position() > formats_end:
+                    end.setPosition(following.position())
+                break
+            block = following
+
+        if states_start is not None and block.position() >= states_start:
+            if not following.isValid():
+                self._stale_states = None
+            else:
+                self._stale_states[0].setPosition(following.position())
+                if following.position() > states_end:
+                    self._stale_states[1].setPosition(following.position())
+        self._mark_dirty(first, block)
+
+    @traced("highlight")
+    def _highlight_visible_blocks(self) -> None:
+        """Highlights at once the pending blocks on screen and around it."""
+        if self.visible_blocks is None or self._stale_formats is None:
+            return
+        first, last = self.visible_blocks
+        first_block = self._document.findBlockByNumber(max(0, first - self.VISIBLE_MARGIN))
+        last_block = self._document.findBlockByNumber(min(self._document.blockCount() - 1, last + self.VISIBLE_MARGIN))
+        self._update_states(last_block.position())
+        start, end = self._stale_formats
+        if end.position() < first_block.position() or start.position() > last_block.position():
+            return
+
+        block = self._document.findBlock(max(start.position(), first_block.position()))
+        highlighted = block
+        while block.isValid() and block.position() <= min(end.position(), last_block.position()):
+            self._highlight_block(block)
+            highlighted = block
+            block = block.next()
+        self._mark_dirty(self._document.findBlock(max(start.position(), first_block.position())), highlighted)
+
+        # the visible blocks at the start of the pending range do not need to be highlighted again.
+        if first_block.position() <= start.position():
+            if block.isValid() and block.position() <= end.position():
+                start.setPosition(block.position())
+            else:
+                self._stale_formats = None
+
+    def _update_states(self, until: int) -> None:
+        """
+        Recomputes the code block state of the pending blocks up to a position.
+
+        Only the fences are looked at; the blocks whose state is recomputed have
+        their formats outdated and are added to the blocks to highlight. After the
+        last changed block, the states are followed while they keep changing.
+
+        Args:
+            until (int): the position of the last block that needs a correct state.
+        """
+        if self._stale_states is None:
+            return
+        start, end = self._stale_states
+        if start.position() > until:
+            return
+        first = block = self._document.findBlock(start.position())
+        previous = block.previous()
+        state = previous.userState() if previous.isValid() else -1
+        while True:
+            _, state = scan_code_fence(block.text(), state)
+            changed = state != block.userState()
+            if changed:
+                block.setUserState(state)
+                self._state_changed(block)
+            following = block.next()
+            if not following.isValid() or (block.position() >= end.position() and not changed):
+                # the following blocks keep their states, since this one passes on the same state.
+                self._stale_states = None
+                break
+            if following.position() > until:
+                start.setPosition(following.position())
+                if following.position() > end.position():
+                    end.setPosition(following.position())
+                break
+            block = following
+        self._stale_formats = self._extend_range(self._stale_formats, first.position(), block.position())
+
+    def _update_states_ahead(self, block: QTextBlock) -> None:
+        """
+        Recomputes the pending states from a block up to STATE_BATCH blocks after it.
+
+        Args:
+            block (QTextBlock): the first block that needs a correct state.
+        """
+        number = min(self._document.blockCount() - 1, block.blockNumber() + self.STATE_BATCH)
+        self._update_states(self._document.findBlockByNumber(number).position())
+
+    def _highlight_block(self, block: QTextBlock) -> bool:
+        """
+        Sets the formats and the state of a block, whose previous block has a correct state.
+
+        The layout is not redrawn; see _mark_dirty.
+
+        Args:
+            block (QTextBlock): the block to highlight.
+
+        Returns:
+            bool: True if the state of the block changed.
+        """
+        previous = block.previous()
+        previous_state = previous.userState() if previous.isValid() else -1
+        text = block.text()
+        spans, state = scan_markdown_line(text, previous_state)
+        if state == STATE_CODE and previous_state != STATE_CODE:
+            self._lex_fence(block)
+        elif state == STATE_CODE:
+            data = block.userData()
+            if isinstance(data, CodeBlockData) and data.text_hash is None:
+                # the line opened a code block, whose lines now belong to the code block of this line.
+                self._queue_fence(block)
+            spans = spans + self._code_tokens(block, text)
+        elif block.userData() is not None:
+            block.setUserData(None)
+        self.headings.update_block(block, parse_heading(text) if spans and spans[0][2] == HEADER else None)
+        self._set_formats(block, spans)
+        if state == block.userState():
+            return False
+        block.setUserState(state)
+        self._state_changed(block)
+        return True
+
+    def _set_formats(self, block: QTextBlock, spans: list) -> None:
+        """
+        Sets the formats of the spans of a block on its layout.
+
+        Args:
+            block (QTextBlock): the block.
+            spans (list[tuple[int, int, object]]): the spans, in the order they are applied; the kind of
+                each span is a key of span_formats or a Pygments token type.
+        """
+        ranges = []
+        for span in flatten_spans(spans):
+            format_range = self._format_ranges.get(span)
+            if format_range is None:
+                if len(self._format_ranges) >= self.FORMAT_RANGE_CACHE_SIZE:
+                    self._format_ranges.clear()
+                format_range = QTextLayout.FormatRange()
+                format_range.start, format_range.length, kind = span
+                char_format = self.span_formats.get(kind)
+                format_range.format = char_format if char_format is not None else self._token_format(kind)
+                self._format_ranges[span] = format_range
+            ranges.append(format_range)
+        block.layout().setFormats(ranges)
+
+    def _code_tokens(self, block: QTextBlock, text: str) -> list:
+        """
+        Returns the tokens of a line inside a code block, lexing the line only if its text changed.
+
+        A line lexed on its own schedules the lexing of its whole code block.
+
+        Args:
+            block (QTextBlock): the line.
+            text (str): the text of the line, whose previous line is in the same code block.
+
+        Returns:
+            list[tuple[int, int, pygments.token._TokenType]]: the tokens that have a format.
+        """
+        # the data of the previous line may still have the language of an edited opening line.
+        language = fence_language(self._fence_opening(block).text())
+        data = block.userData()
+        text_hash = hash(text)
+        if isinstance(data, CodeBlockData) and data.text_hash == text_hash and data.language == language:
+            return data.tokens
+
+        if not is_lexer_loaded(language):
+            block.setUserData(CodeBlockData(language, text_hash, []))
+            self._wait_for_lexer(language, block)
+            return []
+        lexer = get_lexer(language)
+        tokens = self._formatted_tokens(lex_line(lexer, text)) if lexer is not None else []
+        block.setUserData(CodeBlockData(language, text_hash, tokens))
+        if lexer is not None:
+            self._queue_fence(block)
+        return tokens
+
+    def _lex_fence(self, opening: QTextBlock) -> None:
+        """
+        Lexes a whole code block, unless its code did not change since it was last lexed.
+
+        Args:
+            opening (QTextBlock): the opening line of the code block, with a correct state.
+        """
+        language = fence_language(opening.text())
+        data = opening.userData()
+        if not is_lexer_loaded(language):
+            opening.setUserData(CodeBlockData(language, None, [], None))
+            if opening.next().isValid():
+                self._wait_for_lexer(language, opening.next())
+            return
+        lexer = get_lexer(language)
+        if lexer is None:
+            blocks = self._fence_lines(opening, None)
+            fence_hash = hash((language, None, "\n".join(text for _, text in blocks)))
+            if not isinstance(data, CodeBlockData) or data.fence_hash != fence_hash:
+                opening.setUserData(CodeBlockData(language, None, [], fence_hash))
+                # the lines lose the tokens of another language they were lexed with.
+                self._set_fence_tokens(language, blocks, ([] for _ in blocks))
+            return
+
+        blocks = self._fence_lines(opening, self.FENCE_LEX_MAX_LINES + 1)
+        if len(blocks) > self.FENCE_LEX_MAX_LINES:
+            opening.setUserData(CodeBlockData(language, None, [], None))
+            return
+
+        code = "\n".join(text for _, text in blocks)
+        fence_hash = hash((language, code))
+        if isinstance(data, CodeBlockData) and data.fence_hash == fence_hash:
+            return
+        opening.setUserData(CodeBlockData(language, None, [], fence_hash))
+        self._set_fence_tokens(language, blocks, map(self._formatted_tokens, lex_code(lexer, code)))
+
+    def _fence_lines(self, opening: QTextBlock, limit: int) -> list:
+        """
+        Finds the lines inside a code block.
+
+        The lines are found from their text, since their states may not be up to date yet.
+
+        Args:
+            opening (QTextBlock): the opening line of the code block.
+            limit (int or None): the maximum number of lines returned; None for all of them.
+
+        Returns:
+            list[tuple[QTextBlock, str]]: the lines and their texts.
+        """
+        blocks = []
+        state = STATE_CODE
+        block = opening.next()
+        while block.isValid() and (limit is None or len(blocks) < limit):
+            text = block.text()
+            _, state = scan_code_fence(text, state)
+            if state != STATE_CODE:
+                break
+            blocks.append((block, text))
+            block = block.next()
+        return blocks
+
+    def _set_fence_tokens(self, language: str, blocks: list, token_lists) -> None:
+        """
+        Stores the tokens of the lines of a code block.
+
+        The lines whose tokens change and that are not waiting to be highlighted get their formats at once.
+
+        Args:
+            language (str or None): the language of the code block.
+            blocks (list[tuple[QTextBlock, str]]): the lines and their texts.
+            token_lists (Iterable[list]): the tokens that have a format, for each line.
+        """
+        first_changed = last_changed = None
+        stale_start, stale_end = (cursor.position() for cursor in self._stale_formats) if self._stale_formats else (-1, -1)
+        for (block, text), tokens in zip(blocks, token_lists):
+            data = block.userData()
+            if isinstance(data, CodeBlockData) and data.language == language and data.tokens == tokens:
+                continue
+            block.setUserData(CodeBlockData(language, hash(text), tokens))
+            if not stale_start <= block.position() <= stale_end:
+                self._set_formats(block, [(0, len(text), CODE_BLOCK)] + tokens if text else [])
+                if first_changed is None:
+                    first_changed = block
+                last_changed = block
+        if first_changed is not None:
+            self._mark_dirty(first_changed, last_changed)
+
+    def _fence_opening(self, block: QTextBlock) -> QTextBlock:
+        """
+        Finds the opening line of the code block of a line, going up while the lines are inside it.
+
+        Args:
+            block (QTextBlock): a line inside a code block.
+
+        Returns:
+            QTextBlock: the opening line.
+        """
+        previous = block.previous()
+        number = block.blockNumber()
+        # the lines of a code block are highlighted in order, so the opening of the previous line is reused.
+        if self._last_fence_line is not None and self._last_fence_line[0] == number - 1 \
+                and previous.previous().isValid() and previous.previous().userState() == STATE_CODE:
+            opening = self._document.findBlockByNumber(self._last_fence_line[1])
+        else:
+            opening = previous
+            while opening.isValid() and opening.previous().isValid() and opening.previous().userState() == STATE_CODE:
+                opening = opening.previous()
+        self._last_fence_line = (number, opening.blockNumber())
+        return opening
+
+    def _state_changed(self, block: QTextBlock) -> None:
+        """
+        Forgets the opening line found by _fence_opening if it depended on the state of a block.
+
+        Args:
+            block (QTextBlock): the block whose state changed.
+        """
+        if self._last_fence_line is not None and block.blockNumber() < self._last_fence_line[0]:
+            self._last_fence_line = None
+
+    def _queue_fence(self, block: QTextBlock) -> None:
+        """
+        Schedules the lexing of the whole code block of a line lexed on its own.
+
+        Args:
+            block (QTextBlock): the line.
+        """
+        if not any(cursor.block() == block for cursor in self._pending_fences):
+            cursor = QTextCursor(block)
+            self._pending_fences.append(cursor)
+        self.fence_timer.start()
+
+    def _wait_for_lexer(self, language: str, block: QTextBlock) -> None:
+        """
+        Loads the lexer of a language in the background, and lexes the code block of a line when it is ready.
+
+        Args:
+            language (str): the language of the code block.
+            block (QTextBlock): a line inside the code block.
+        """
+        cursors = self._waiting_fences.setdefault(language, [])
+        # the lines of a code block are highlighted in order, so one cursor follows them.
+        if cursors and cursors[-1].block() == block.previous():
+            cursors[-1].setPosition(block.position())
+        elif not cursors or cursors[-1].block() != block:
+            cursors.append(QTextCursor(block))
+        if language not in self._lexer_tasks:
+            task = LexerLoadTask(language)
+            task.signals.loaded.connect(self._on_lexer_loaded)
+            self._lexer_tasks[language] = task
+            QThreadPool.globalInstance().start(task)
+
+    @Slot(str)
+    def _on_lexer_loaded(self, language: str):
+        """
+        Lexes the code blocks that waited for the lexer of a language.
+
+        Args:
+            language (str): the language whose lexer was loaded.
+        """
+        self._lexer_tasks.pop(language, None)
+        for cursor in self._waiting_fences.pop(language, []):
+            self._queue_fence(cursor.block())
+
+    @Slot()
+    def _lex_pending_fences(self):
+        """Lexes again the code blocks of the lines lexed on their own, once the highlighting is done."""
+        if self._stale_states is not None or self._stale_formats is not None:
+            self.fence_timer.start()
+            return
+        cursors, self._pending_fences = self._pending_fences, []
+        openings = set()
+        for cursor in cursors:
+            block = cursor.block()
+            previous = block.previous()
+            if not previous.isValid() or previous.userState() != STATE_CODE:
+                continue
+            opening = self._fence_opening(block)
+            if opening.position() not in openings:
+                openings.add(opening.position())
+                self._lex_fence(opening)
+
+    def _formatted_tokens(self, tokens: list) -> list:
+        """
+        Keeps only the tokens that have a format of their own.
+
+        Args:
+            tokens (list[tuple[int, int, pygments.token._TokenType]]): the tokens.
+
+        Returns:
+            list[tuple[int, int, pygments.token._TokenType]]: the tokens painted over the code block format.
+        """
+        return [token for token in tokens if self._token_format(token[2]) is not None]
+
+    def _token_format(self, token_type) -> QTextCharFormat:
+        """
+        Returns the format of a Pygments token type in the EDITOR_CODE_STYLE style.
+
+        Args:
+            token_type (pygments.token._TokenType): the token type.
+
+        Returns:
+            QTextCharFormat or None: the format, or None if the token looks like plain text in the style.
+        """
+        if token_type in self._token_formats:
+            return self._token_formats[token_type]
+        from pygments.styles import get_style_by_name
+        from pygments.token import Text
+
+        style = get_style_by_name(EDITOR_CODE_STYLE)
+        definition = style.style_for_token(token_type)
+        token_format = None
+        if definition["color"] != style.style_for_token(Text)["color"] or definition["bold"] or definition["italic"]:
+            token_format = QTextCharFormat()
+            if definition["color"]:
+                token_format.setForeground(QColor(f"#{definition['color']}"))
+            else:
+                token_format.setForeground(self.code_block_format.foreground())
+            if definition["bold"]:
+                token_format.setFontWeight(QFont.Bold)
+            token_format.setFontItalic(definition["italic"])
+        self._token_formats[token_type] = token_format
+        return token_format
+
+    def _mark_dirty(self, first: QTextBlock, last: QTextBlock) -> None:
+        """
+        Redraws a range of highlighted blocks.
+
+        Args:
+            first (QTextBlock): the first block of the range.
+            last (QTextBlock): the last block of the range.
+        """
+        if first.isValid() and last.isValid() and last.position() >= first.position():
+            self._document.markContentsDirty(first.position(), last.position() + last.length() - first.position())
+
+    def _extend_range(self, block_range: tuple, first: int, last: int) -> tuple:
+        """
+        Grows a range of block positions so it contains [first, last].
+
+        Args:
+            block_range (tuple[QTextCursor, QTextCursor] or None): the range, None if it is empty.
+            first (int): the position of the first block to include.
+            last (int): the position of the last block to include.
+
+        Returns:
+            tuple[QTextCursor, QTextCursor]: the grown range.
+        """
+        if block_range is None:
+            start, end = QTextCursor(self._document), QTextCursor(self._document)
+            start.setPosition(first)
+            end.setPosition(last)
+            return start, end
+        start, end = block_range
+        if first < start.position():
+            start.setPosition(first)
+        if last > end.position():
+            end.setPosition(last)
+        return block_range
+
+class LineNumberRenderer:
+    """
+    Paints the line numbers of a CodeEditor, reusing the metrics and the glyphs between paints.
+
+    The font metrics are read once per font and the gutter width once per number of
+    digits. Each number is laid out once in a QStaticText, whose prepared glyphs are
+    reused on the next paints; the most recently painted numbers are kept.
+
+    Attributes:
+        font (QFont): the font of the numbers.
+        line_height (int): the height of a line of the font.
+        digit_width (int): the advance of a digit.
+    """
+    # pixels of the gutter besides the digits
+    MARGIN = 9
+    # painted numbers kept with their glyphs
+    CACHE_SIZE = 2048
+
+    def __init__(self, font: QFont):
+        self.set_font(font)
+
+    def set_font(self, font: QFont) -> None:
+        """
+        Changes the font of the numbers, discarding the cached metrics and glyphs.
+
+        Args:
+            font (QFont): the new font.
+        """
+        self.font = QFont(font)
+        metrics = QFontMetrics(self.font)
+        self.line_height = metrics.height()
+        self.digit_width = metrics.horizontalAdvance("9")
+        self._widths = {}
+        self._numbers = OrderedDict()
+
+    def width(self, block_count: int) -> int:
+        """
+        Returns the width of the gutter for a number of lines.
+
+        Args:
+            block_count (int): the number of lines of the document.
+
+        Returns:
+            int: the width in pixels.
+        """
+        digits = len(str(max(1, block_count)))
+        width = self._widths.get(digits)
+        if width is None:
+            width = self._widths[digits] = self.MARGIN + self.digit_width * digits
+        return width
+
+    def number_text(self, number: int) -> tuple:
+        """
+        Returns the prepared text of a line number, laying it out only the first time.
+
+        Args:
+            number (int): the line number.
+
+        Returns:
+            tuple[QStaticText, float]: the text and its width.
+        """
+        text = self._numbers.get(number)
+        if text is not None:
+            self._numbers.move_to_end(number)
+            return text
+
+        static_text = QStaticText(f"{number} ")
+        static_text.setTextFormat(Qt.TextFormat.PlainText)
+        static_text.prepare(QTransform(), self.font)
+        text = self._numbers[number] = (static_text, static_text.size().width())
+        if len(self._numbers) > self.CACHE_SIZE:
+            self._numbers.popitem(last=False)
+        return text
+
+    def paint(self, painter: QPainter, editor: "CodeEditor", rect: QRect, width: int, background: QColor, foreground: QColor) -> None:
+        """
+        Paints the numbers of the visible lines that intersect a rectangle of the gutter.
+
+        Args:
+            painter (QPainter): the painter of the gutter widget.
+            editor (CodeEditor): the editor, which gives the geometry of the lines.
+            rect (QRect): the area to paint.
+            width (int): the width of the gutter.
+            background (QColor): the background color.
+            foreground (QColor): the color of the numbers and of the border.
+        """
+        painter.fillRect(rect, background)
+        painter.setPen(foreground)
+        painter.setFont(self.font)
+        border = width - 2
+        painter.drawLine(border, rect.top(), border, rect.bottom())
+
+        block = editor.firstVisibleBlock()
+        number = block.blockNumber() + 1
+        top = editor.blockBoundingGeometry(block).translated(editor.contentOffset()).top()
+        paint_top, paint_bottom = rect.top(), rect.bottom()
+        while block.isValid() and top <= paint_bottom:
+            height = editor.blockBoundingRect(block).height()
+            if block.isVisible() and top + height >= paint_top:
+                text, text_width = self.number_text(number)
+                painter.drawStaticText(QPointF(width - text_width, top), text)
+            block = block.next()
+            top += height
+            number += 1
+
 
 class LineNumberArea(QWidget):
     """
@@ -192,8 +983,14 @@ class CodeEditor(QPlainTextEdit):
     to a code editor: persistent line numbering and a visual highlight
     for the line where the cursor is positioned.
 
+    The matches of the find bar are highlighted too, only the ones in view: the
+    extra selections are the current line plus the matches of the visible lines,
+    built again when the view or the matches change.
+
     Attributes:
         line_number_area (LineNumberArea): The helper widget for displaying line numbers.
+        line_number_renderer (LineNumberRenderer): Paints the numbers with cached metrics and glyphs.
+        search (TextSearch): The matches of the find bar in the document.
     """
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -201,12 +998,25 @@ class CodeEditor(QPlainTextEdit):
         self.setObjectName("CodeEditor")
         self.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
         
+        self.line_number_renderer = LineNumberRenderer(self.font())
+        self._line_number_area_width = None
         self.line_number_area = LineNumberArea(self)
         self.line_number_area.setObjectName("lineNumberArea")
+
+        self.search = TextSearch(self.document(), self)
+        self._line_selections = []
+        self._search_selections = []
+        self._search_range = None
+        self._search_matches = []
+        self._search_format = QTextCharFormat()
+        self._search_format.setBackground(QColor(SEARCH_MATCH_COLOR))
         
         self.blockCountChanged.connect(self.update_line_number_area_width)
         self.updateRequest.connect(self.update_line_number_area)
+        self.updateRequest.connect(self.update_visible_blocks)
+        self.updateRequest.connect(lambda: self.update_search_selections(False))
         self.cursorPositionChanged.connect(self.highlight_current_line)
+        self.search.changed.connect(self.update_search_selections)
         
         font = QFont("Consolas")
         font.setStyleHint(QFont.Monospace)
@@ -214,27 +1024,45 @@ class CodeEditor(QPlainTextEdit):
 
         self.update_line_number_area_width(0)
         self.highlight_current_line()
+        self.update_visible_blocks()
 
    
+    def set_loaded_document(self, document):
+        """
+        Replaces the edited document with a document loaded in the background.
+
+        The editor takes ownership of the new document, applies its font to it and
+        moves the syntax highlighter there; only then the new text is highlighted.
+        A document previously handed to this method is deleted.
+
+        Args:
+            document (QTextDocument): the new document, with a QPlainTextDocumentLayout.
+        """
+        old_document = self.document()
+        delete_old_document = old_document.parent() is self
+        document.setParent(self)
+        document.setDefaultFont(self.font())
+        # the highlighter is a child of the old document, which may be deleted by setDocument.
+        self.highlighter.setParent(self)
+        self.highlighter.setDocument(document)
+        self.setDocument(document)
+        self.search.set_document(document)
+        self.update_line_number_area_width(0)
+        self.highlight_current_line()
+        if delete_old_document:
+            old_document.deleteLater()
+
     def line_number_area_width(self):
         """
         Calculates the required width for the line numbering widget.
 
-        The width is based on the total number of blocks (lines) and adjusted 
-        dynamically to ensure space for the maximum line number.
+        The width is based on the number of digits of the total number of blocks (lines),
+        to ensure space for the maximum line number; see LineNumberRenderer.width.
 
         Returns:
             int: The width in pixels required to display the line numbers.
         """
-
-        digits = 1
-        max_value = max(1, self.blockCount())
-        while max_value >= 10:
-            max_value /= 10
-            digits += 1
-        
-        space = 9 + self.fontMetrics().horizontalAdvance('9') * digits
-        return space
+        return self.line_number_renderer.width(self.blockCount())
 
     @Slot(int)
     def update_line_number_area_width(self, new_block_count: int):
@@ -242,12 +1070,16 @@ class CodeEditor(QPlainTextEdit):
         Updates the editor viewport margins to accommodate line numbering.
 
         This method is connected to the "blockCountChanged" signal and 
-        ensures that the left margin is always wide enough.
+        ensures that the left margin is always wide enough. The margins are only
+        set when the width changes.
 
         Args:
             new_block_count(int): The new total number of blocks (lines), although the actual value of the argument is not consumed, only the method call.
         """
-        self.setViewportMargins(self.line_number_area_width(), 0, 0, 0)
+        width = self.line_number_area_width()
+        if width != self._line_number_area_width:
+            self._line_number_area_width = width
+            self.setViewportMargins(width, 0, 0, 0)
 
     @Slot(QRect, int)
     def update_line_number_area(self, rect, dy):
@@ -270,6 +1102,18 @@ class CodeEditor(QPlainTextEdit):
         if rect.contains(self.viewport().rect()):
             self.update_line_number_area_width(0)
 
+    @Slot()
+    def update_visible_blocks(self):
+        """
+        Informs the highlighter which blocks are on screen, so they are highlighted first.
+
+        Connected to the "updateRequest" signal; the number of visible blocks is
+        estimated from the viewport height, the highlighter adds a margin around them.
+        """
+        first = self.firstVisibleBlock().blockNumber()
+        line_height = max(1, self.fontMetrics().height())
+        self.highlighter.set_visible_blocks(first, first + self.viewport().height() // line_height + 1)
+
     def resizeEvent(self, event):
         """
         Window resize event handler.
@@ -291,48 +1135,37 @@ class CodeEditor(QPlainTextEdit):
         """
         Draws line numbers in the "LineNumberArea" widget.
 
-        This is the primary rendering method. It iterates over the visible 
-        blocks and draws their line numbers, separating them with a vertical line.
+        This is the primary rendering method. The numbers of the visible blocks,
+        separated from the text by a vertical line, are painted by the line_number_renderer.
 
         Arguments:
             event (QPaintEvent): The paint event triggered by "LineNumberArea".
         """
         painter = QPainter(self.line_number_area)
-        bg_color = self.line_number_area.palette().color(QPalette.ColorRole.Window)
-        painter.fillRect(event.rect(), bg_color) 
+        palette = self.line_number_area.palette()
+        self.line_number_renderer.paint(
+            painter,
+            self,
+            event.rect(),
+            self.line_number_area.width(),
+            palette.color(QPalette.ColorRole.Window),
+            palette.color(QPalette.ColorRole.WindowText)
+        )
 
-        border_color_prop = self.line_number_area.palette().color(QPalette.ColorRole.WindowText)
-        painter.setPen(border_color_prop)
-        
-        x_pos = self.line_number_area.width() - 2
-        painter.drawLine(x_pos, event.rect().top(), x_pos, event.rect().bottom())
+    def changeEvent(self, event):
+        """
+        Widget change event handler.
 
-        block = self.firstVisibleBlock()
-        block_number = block.blockNumber()
-        
-        top = self.blockBoundingGeometry(block).translated(self.contentOffset()).top()
-        bottom = top + self.blockBoundingRect(block).height()
-
-
-        text_color = self.line_number_area.palette().color(QPalette.ColorRole.WindowText)
-
-        while block.isValid() and top <= event.rect().bottom():
-            if block.isVisible() and bottom >= event.rect().top():
-                number = str(block_number + 1)+" "
-                painter.setPen(text_color) 
-                
-                painter.drawText(
-                    0, top, 
-                    self.line_number_area.width(), 
-                    self.fontMetrics().height(),
-                    Qt.AlignmentFlag.AlignRight, 
-                    number
-                )
-            
-            block = block.next()
-            top = bottom
-            bottom = top + self.blockBoundingRect(block).height()
-            block_number += 1
+        A new font invalidates the metrics and the glyphs cached for the line numbers.
+
+        Args:
+            event (QEvent): The received change event.
+        """
+        super().changeEvent(event)
+        if event.type() == QEvent.Type.FontChange:
+            self.line_number_renderer.set_font(self.font())
+            self.update_line_number_area_width(0)
+            self.line_number_area.update()
 
     @Slot()
     def highlight_current_line(self):
@@ -341,7 +1174,7 @@ class CodeEditor(QPlainTextEdit):
 
         This slot is connected to the "cursorPositionChanged" signal. It creates an
         "ExtraSelection" using the current theme's highlight color and applies it
-        to the line where the cursor is.
+        to the line where the cursor is, under the highlighted matches.
         """
         extraSelections = []
         if not self.isReadOnly():
@@ -353,4 +1186,42 @@ class CodeEditor(QPlainTextEdit):
             selection.cursor.clearSelection()
             extraSelections.append(selection)
         
-        self.setExtraSelections(extraSelections)
\ No newline at end of file
+        self._line_selections = extraSelections
+        self.setExtraSelections(self._line_selections + self._search_selections)
+
+    @Slot()
+    def update_search_selections(self, force: bool = True):
+        """
+        Highlights the matches of the search on the visible lines.
+
+        Connected to the "changed" signal of the search and, without force, to the
+        "updateRequest" signal: the selections are only built again when other
+        lines come into view.
+
+        Args:
+            force (bool): builds the selections again even if the same lines are visible.
+        """
+        first_block = self.firstVisibleBlock()
+        line_height = max(1, self.fontMetrics().height())
+        last_block = self.document().findBlockByNumber(first_block.blockNumber() + self.viewport().height() // line_height + 1)
+        if not last_block.isValid():
+            last_block = self.document().lastBlock()
+        visible_range = (first_block.position(), last_block.position() + last_block.length())
+        if not force and visible_range == self._search_range:
+            return
+        self._search_range = visible_range
+
+        matches = self.search.matches_between(*visible_range)
+        if matches == self._search_matches:
+            return
+        self._search_matches = matches
+        selections = []
+        for start, end in matches:
+            selection = QTextEdit.ExtraSelection()
+            selection.format = self._search_format
+            selection.cursor = QTextCursor(self.document())
+            selection.cursor.setPosition(start)
+            selection.cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+            selections.append(selection)
+        self._search_selections = selections
+        self.setExtraSelections(self._line_selections + self._search_selections)
\ No newline at end of file
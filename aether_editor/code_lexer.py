@@ -0,0 +1,136 @@
+"""
+Module containing the Pygments lexing of fenced code used by the editor highlighter.
+
+The editor highlights the document line by line, while Pygments lexes a whole
+text at once and some of its tokens (like C comments or Python docstrings) span
+several lines. lex_code() lexes the code of a whole fenced block and splits the
+tokens by line, so each line can keep its own tokens; lex_line() lexes a single
+line on its own, which is exact for most lines and is used to color an edited
+line at once, before its code block is lexed again.
+
+The lexers are created on first use and reused, and Pygments itself is only
+imported then. Loading Pygments and a lexer can take long (an unknown name
+makes Pygments look for plugins in every installed package), so the editor
+creates the lexers in a worker thread and checks is_lexer_loaded() before
+lexing on the GUI thread.
+
+Example:
+    lexer = get_lexer(fence_language("```python"))
+    for number, tokens in enumerate(lex_code(lexer, code)):
+        for start, length, token_type in tokens:
+            ...
+"""
+import re
+import threading
+from collections import OrderedDict
+
+FENCE_LANGUAGE_EXP = re.compile(r"\s*`{3,}\s*\{?\s*\.?([\w+#.-]+)")
+# languages whose lexer (or None, if unknown) is kept.
+MAX_LEXERS = 64
+
+_lexers = OrderedDict()
+_lexers_lock = threading.Lock()
+
+
+def fence_language(text: str) -> str:
+    """
+    Reads the language of a code block from its opening fence, as in "```python" or "``` {.python}".
+
+    Args:
+        text (str): the text of the opening line.
+
+    Returns:
+        str or None: the language, or None if the fence has none.
+    """
+    match = FENCE_LANGUAGE_EXP.match(text)
+    return match.group(1).lower() if match else None
+
+
+def get_lexer(language: str):
+    """
+    Finds the Pygments lexer of a language, creating it only once.
+
+    Can be called from any thread.
+
+    Args:
+        language (str or None): the name or alias of the language.
+
+    Returns:
+        pygments.lexer.Lexer or None: the lexer, or None if the language is unknown.
+    """
+    if not language:
+        return None
+    with _lexers_lock:
+        if language in _lexers:
+            _lexers.move_to_end(language)
+            return _lexers[language]
+
+    from pygments.lexers import get_lexer_by_name
+    from pygments.util import ClassNotFound
+
+    try:
+        lexer = get_lexer_by_name(language)
+    except ClassNotFound:
+        lexer = None
+    with _lexers_lock:
+        _lexers[language] = lexer
+        while len(_lexers) > MAX_LEXERS:
+            _lexers.popitem(last=False)
+    return lexer
+
+
+def is_lexer_loaded(language: str) -> bool:
+    """
+    Checks if get_lexer() can answer at once, without importing or searching anything.
+
+    Args:
+        language (str or None): the name or alias of the language.
+
+    Returns:
+        bool: True if the language has no lexer to load or its lexer was already looked up.
+    """
+    if not language:
+        return True
+    with _lexers_lock:
+        return language in _lexers
+
+
+def lex_code(lexer, code: str) -> list:
+    """
+    Lexes the code of a fenced block and splits the tokens by line.
+
+    Args:
+        lexer (pygments.lexer.Lexer): the lexer.
+        code (str): the lines of the block, joined by '\\n'.
+
+    Returns:
+        list[list[tuple[int, int, pygments.token._TokenType]]]: for each line, the
+            (start, length, token type) tokens, with positions relative to the line.
+    """
+    lines = [[]]
+    line_start = 0
+    # the trailing line break lets the rules that end at a line break match on the last line.
+    for position, token_type, value in lexer.get_tokens_unprocessed(code + "\n"):
+        for index, piece in enumerate(value.split("\n")):
+            if index:
+                lines.append([])
+                position += 1
+                line_start = position
+            if piece:
+                lines[-1].append((position - line_start, len(piece), token_type))
+            position += len(piece)
+    return lines[:code.count("\n") + 1]
+
+
+def lex_line(lexer, text: str) -> list:
+    """
+    Lexes a single line of code on its own.
+
+    Args:
+        lexer (pygments.lexer.Lexer): the lexer.
+        text (str): the text of the line, without the line break.
+
+    Returns:
+        list[tuple[int, int, pygments.token._TokenType]]: the (start, length, token type) tokens.
+    """
+    return lex_code(lexer, text)[0]
@@ -2,6 +2,7 @@
 Module containing the ConfigFrame class, which provides an interface for 
 selecting and applying visual themes (CSS styles) to the application.
 """
+from PySide6.QtCore import Signal, Slot
 from PySide6.QtWidgets import (
     QWidget, 
     QGridLayout, 
@@ -16,7 +17,12 @@ class ConfigFrame(QWidget):
     A configuration widget (frame) responsible for allowing the user to select and apply 
     different themes (CSS styles) to the application.
     The themes are arranged as buttons in a QGridLayout.
+
+    Attributes:
+        theme_changed (Signal(str)): emitted with the css file name of the selected theme.
     """
+    theme_changed = Signal(str)
+
     def __init__(self, parent: QWidget):
         """ 
         Initializes the ConfigFrame.
@@ -37,7 +43,7 @@ class ConfigFrame(QWidget):
 
         It defines a list of available styles (name, CSS file, grid position) 
         and creates a QPushButton for each style. Each button's click signal 
-        is connected to the set_css_style function to apply the corresponding 
+        is connected to the select_theme method to apply the corresponding 
         theme using its CSS file name.
         """
         styles=[
@@ -52,6 +58,17 @@ class ConfigFrame(QWidget):
             button.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
 
             css_file_name = i["css file name"]
-            button.clicked.connect(lambda checked, filename=css_file_name: set_css_style(filename))
+            button.clicked.connect(lambda checked, filename=css_file_name: self.select_theme(filename))
             self.main_layout.addWidget(button, i["row"], i["column"])
 
+    @Slot(str)
+    def select_theme(self, css_file_name: str):
+        """
+        Applies a theme and tells the preview to restyle itself.
+
+        Args:
+            css_file_name (str): the name of the css file of the theme.
+        """
+        set_css_style(css_file_name)
+        self.theme_changed.emit(css_file_name)
+
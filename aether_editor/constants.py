@@ -23,34 +23,117 @@ H4.setPointSize(15)
 
 BASE_PATH=os.path.dirname(__file__)
 
-css_path=os.path.join(BASE_PATH,"documents_styles", "main_style.css")
-with open(css_path,"r", encoding="utf-8") as file:
-    markdown_preview_style = file.read() 
+# memory budget (bytes) of the highlighted code cache used by the preview
+CODE_HIGHLIGHT_CACHE_BYTES=32*1024*1024
+
+# memory budget (bytes) of the decoded images of the previews, shared by every document
+PREVIEW_IMAGE_CACHE_BYTES=128*1024*1024
+
+# memory budget (bytes) of the previews of the documents that are not on screen
+INACTIVE_PREVIEWS_BYTES=64*1024*1024
+
+# render workers shared by the previews of every open document
+RENDER_THREADS=2
+
+# Pygments style of the code blocks in the editor (the editor has a dark theme)
+EDITOR_CODE_STYLE="monokai"
+
+# background of the matches of the find bar in the editor
+SEARCH_MATCH_COLOR="#6b5a1e"
+
+# directory of the edit journals used to recover unsaved text after a crash
+RECOVERY_DIR=os.environ.get(
+    "AETHER_RECOVERY_DIR", os.path.join(os.path.expanduser("~"), ".aether_editor", "recovery")
+)
+
+# directory of the stored indexes of the workspace folders
+WORKSPACE_INDEX_DIR=os.environ.get(
+    "AETHER_WORKSPACE_DIR", os.path.join(os.path.expanduser("~"), ".aether_editor", "workspaces")
+)
+
+# extensions of the documents of a workspace, and folders not scanned (besides the hidden ones)
+WORKSPACE_EXTENSIONS=(".md", ".markdown")
+WORKSPACE_SKIPPED_DIRS=("node_modules", "__pycache__")
+
+# instrumentation of the render phases, the highlighting and the file I/O (any value but 0 enables it)
+INSTRUMENTATION_ENABLED=os.environ.get("AETHER_TRACE", "") not in ("", "0")
+
+# phases kept for the exported trace, and recent durations of each phase used by the p50/p95
+INSTRUMENTATION_EVENTS=20000
+INSTRUMENTATION_WINDOW=200
+
+# directory of the CSS themes of the preview
+DOCUMENTS_STYLES_PATH=os.path.join(BASE_PATH,"documents_styles")
+
+# content of each theme already read, by file name: (modification time, css)
+_css_styles={}
+css_file_name="main_style.css"
+css_path=os.path.join(DOCUMENTS_STYLES_PATH, css_file_name)
+
+def load_css_style(file_name: str) -> str:
+    """
+    Returns the content of a theme, reading the file only if it changed since the last read.
+
+    Args:
+        file_name (str): name of the css file, in documents_styles
+
+    Returns:
+        str: content of css file
+    """
+    path=os.path.join(DOCUMENTS_STYLES_PATH, file_name)
+    modified=os.stat(path).st_mtime_ns
+    cached=_css_styles.get(file_name)
+    if cached is not None and cached[0]==modified:
+        return cached[1]
+
+    with open(path,"r", encoding="utf-8") as file:
+        css=file.read()
+    _css_styles[file_name]=(modified, css)
+    return css
+
+def preload_css_styles() -> None:
+    """reads every theme of documents_styles, so switching themes never waits for the disk (called after the startup)"""
+    for file_name in sorted(os.listdir(DOCUMENTS_STYLES_PATH)):
+        if file_name.endswith(".css"):
+            load_css_style(file_name)
 
 def get_css_style() -> str:
     """
     the getter of css style
 
+    The content comes from the cache of themes, and is read again if the file was modified.
+
     Returns: 
         str: content of css file
     """
-    return markdown_preview_style
+    return load_css_style(css_file_name)
 
-def set_css_style(css_file_name: str) -> None:
+def set_css_style(file_name: str) -> None:
     """
     set new css file for document
     
     Args:
-        css_file_name (str): name of css file 
+        file_name (str): name of css file 
     """
-    global css_path, markdown_preview_style 
-    css_path=os.path.join(BASE_PATH,"documents_styles",css_file_name)
-
-    with open(css_path,"r", encoding="utf-8") as file:
-        markdown_preview_style = file.read()
+    global css_file_name, css_path
+    load_css_style(file_name)
+    css_file_name=file_name
+    css_path=os.path.join(DOCUMENTS_STYLES_PATH, file_name)
 
 QSS_PATH=os.path.join(BASE_PATH,"app_styles","dark_theme.qss")
-with open(QSS_PATH,"r", encoding="utf-8") as file:
-    qss_style_sheet = file.read()
+_qss_style_sheet=None
+
+def get_qss_style() -> str:
+    """
+    the getter of the style sheet of the application, read on first use
+
+    Returns:
+        str: content of qss file
+    """
+    global _qss_style_sheet
+    if _qss_style_sheet is None:
+        with open(QSS_PATH,"r", encoding="utf-8") as file:
+            _qss_style_sheet=file.read()
+    return _qss_style_sheet
     
 
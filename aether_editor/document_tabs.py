@@ -0,0 +1,238 @@
+"""
+Module containing the DocumentTabWidget class, the tabs of the open documents.
+
+Every document has its own MarkdownEditorFrame, but the frames share one pool of
+render workers and one cache of highlighted code: a code block that appears in
+several documents is highlighted once, and the renders of all the documents
+never use more than RENDER_THREADS threads.
+
+The preview of a document is a QTextDocument with the layout of every block,
+which is the largest part of its memory. The documents that are not on screen
+keep their previews while their estimated memory fits in INACTIVE_PREVIEWS_BYTES;
+beyond that, the least recently shown ones release them, and a released preview
+is filled again from the cached HTML when its tab is shown.
+
+Example:
+    documents = DocumentTabWidget(parent=self)
+    documents.open_file("notas.md")
+"""
+import os
+
+from PySide6.QtCore import QThreadPool, QTimer, Slot
+from PySide6.QtWidgets import (
+    QMessageBox,
+    QPushButton,
+    QTabWidget,
+    QWidget
+)
+
+from .constants import INACTIVE_PREVIEWS_BYTES, RECOVERY_DIR, RENDER_THREADS
+from .edit_journal import discard_session, find_recoverable_sessions, recover_session
+from .editor_frame import MarkdownEditorFrame
+from .highlight_cache import CodeHighlightCache
+from .image_loader import ImageLoader
+
+
+class DocumentTabWidget(QTabWidget):
+    """
+    Tabs of the open documents, with the render resources they share.
+
+    Attributes:
+        code_cache (CodeHighlightCache): the cache of highlighted code of every document.
+        image_loader (ImageLoader): the decoded images of the previews of every document.
+        render_pool (QThreadPool): the pool that runs the renders of every document.
+        preview_budget (int): the memory, in bytes, the previews of the hidden documents may keep.
+    """
+    UNTITLED = "sem título"
+
+    def __init__(self, parent: QWidget, preview_budget: int = INACTIVE_PREVIEWS_BYTES):
+        """
+        Initializes the tabs with the sample document and offers the text of crashed sessions.
+
+        Args:
+            parent (QWidget): the parent widget of the tabs.
+            preview_budget (int): the memory, in bytes, the previews of the hidden documents may keep.
+        """
+        super().__init__(parent=parent)
+        self.code_cache = CodeHighlightCache()
+        self.image_loader = ImageLoader(self)
+        self.render_pool = QThreadPool(self)
+        self.render_pool.setMaxThreadCount(RENDER_THREADS)
+        self.preview_budget = preview_budget
+        # the documents, from the least to the most recently shown.
+        self._recent = []
+
+        self.setTabsClosable(True)
+        self.setMovable(True)
+        self.setDocumentMode(True)
+        new_button = QPushButton("+")
+        new_button.setToolTip("Novo documento")
+        new_button.clicked.connect(lambda: self.new_document())
+        self.setCornerWidget(new_button)
+        self.tabCloseRequested.connect(self.close_document)
+        self.currentChanged.connect(self._show_document)
+
+        self.new_document(sample=True)
+        QTimer.singleShot(0, self.offer_recovery)
+
+    def current_document(self) -> MarkdownEditorFrame:
+        """
+        Returns:
+            MarkdownEditorFrame: the document on screen.
+        """
+        return self.currentWidget()
+
+    def documents(self) -> list:
+        """
+        Returns:
+            list[MarkdownEditorFrame]: the open documents, in the order of the tabs.
+        """
+        return [self.widget(index) for index in range(self.count())]
+
+    def new_document(self, sample: bool = False) -> MarkdownEditorFrame:
+        """
+        Opens an empty document in a new tab, which becomes the current one.
+
+        Args:
+            sample (bool): starts the document with the sample text.
+
+        Returns:
+            MarkdownEditorFrame: the new document.
+        """
+        document = MarkdownEditorFrame(
+            self, code_cache=self.code_cache, image_loader=self.image_loader, thread_pool=self.render_pool, sample=sample
+        )
+        document.open_requested.connect(self.open_file)
+        document.filename_changed.connect(self._set_tab_title)
+        self.setCurrentIndex(self.addTab(document, self.UNTITLED))
+        return document
+
+    @Slot(str)
+    def open_file(self, filename: str) -> None:
+        """
+        Opens a file: shows its tab if it is already open, or loads it in the current
+        document if it is untouched, or else in a new one.
+
+        Args:
+            filename (str): the path of the file.
+        """
+        path = os.path.abspath(filename)
+        for document in self.documents():
+            if document.current_filename and os.path.abspath(document.current_filename) == path:
+                self.setCurrentWidget(document)
+                return
+
+        document = self.current_document()
+        if document is None or not document.is_untouched():
+            document = self.new_document()
+        document.load_file(filename)
+
+    @Slot(int)
+    def close_document(self, index: int) -> None:
+        """
+        Closes the document of a tab, asking first if it has unsaved changes.
+
+        The last tab is replaced with an empty document.
+
+        Args:
+            index (int): the index of the tab.
+        """
+        document = self.widget(index)
+        if document.editor.document().isModified():
+            answer = QMessageBox.question(
+                self, "Fechar documento",
+                f"{self.tabText(index)} tem alterações não salvas.\nDeseja fechá-lo mesmo assim?"
+            )
+            if answer != QMessageBox.StandardButton.Yes:
+                return
+
+        document.close_session(keep_unsaved=False)
+        if document in self._recent:
+            self._recent.remove(document)
+        self.removeTab(index)
+        document.deleteLater()
+        if not self.count():
+            self.new_document()
+
+    @Slot()
+    def offer_recovery(self) -> None:
+        """
+        Offers the text left unsaved by previous sessions, each one in its own document.
+
+        A session is deleted once recovered or refused; one that fails to be read is kept.
+        """
+        sessions = find_recoverable_sessions(RECOVERY_DIR)
+        if not sessions:
+            return
+
+        if len(sessions) == 1:
+            question = "Foi encontrado texto não salvo de uma sessão anterior.\nDeseja recuperá-lo?"
+        else:
+            question = f"Foram encontrados textos não salvos de {len(sessions)} documentos.\nDeseja recuperá-los?"
+        answer = QMessageBox.question(self, "Recuperar texto", question)
+        for session in sessions:
+            if answer == QMessageBox.StandardButton.Yes:
+                try:
+                    recovered = recover_session(session)
+                except Exception as e:
+                    self.current_document().save_status.setText(f"falha ao recuperar o texto: {e}")
+                    continue
+                document = self.current_document()
+                if not document.is_untouched():
+                    document = self.new_document()
+                document.load_recovered(recovered)
+            discard_session(session)
+
+    @Slot()
+    def start_preview(self) -> None:
+        """Renders the first preview of the document on screen."""
+        self.current_document().start_preview()
+
+    @Slot()
+    def apply_theme(self) -> None:
+        """Restyles the previews of every document with the current theme."""
+        for document in self.documents():
+            document.apply_theme()
+
+    def close_session(self) -> None:
+        """Ends the session of every document, keeping the journals of the unsaved ones."""
+        for document in self.documents():
+            document.close_session()
+
+    @Slot(str)
+    def _set_tab_title(self, filename: str):
+        """
+        Names the tab of the document that emitted filename_changed after its file.
+
+        Args:
+            filename (str): the path of the file of the document.
+        """
+        index = self.indexOf(self.sender())
+        if index >= 0:
+            self.setTabText(index, os.path.basename(filename))
+            self.setTabToolTip(index, filename)
+
+    @Slot(int)
+    def _show_document(self, index: int):
+        """
+        Restores the preview of the document shown, and releases the previews of the
+        least recently shown ones that go over the budget.
+
+        Args:
+            index (int): the index of the current tab, -1 if there is none.
+        """
+        document = self.widget(index)
+        if document is None:
+            return
+        if document in self._recent:
+            self._recent.remove(document)
+        self._recent.append(document)
+        document.restore_preview()
+
+        hidden = [document for document in self._recent[:-1] if not document.preview_released]
+        total = sum(document.preview_memory() for document in hidden)
+        for document in hidden:
+            if total <= self.preview_budget:
+                break
+            total -= document.preview_memory()
+            document.release_preview()
@@ -0,0 +1,458 @@
+"""
+Module containing the append-only edit journal used for crash recovery.
+
+Rewriting the whole file on every autosave costs time proportional to the size
+of the document. The EditJournal instead listens to
+QTextDocument.contentsChange and appends one small record per edit to a journal
+file: the position, the number of removed characters and the inserted text. The
+cost of a keystroke depends only on the size of the edit.
+
+From time to time the journal is compacted: the text is written to a snapshot
+by a QThreadPool worker, a new journal file is started, and the older journals
+are deleted once the snapshot is on disk. After a crash, the snapshot plus the
+records of the journals that follow it rebuild the unsaved text.
+
+The snapshot also records whether the text has unsaved changes, and is written
+again whenever that changes (on the first edit, after a save, after undoing
+back to the saved text); nothing is written for a document that was never
+modified. A session whose text matches the saved file is not offered.
+
+Each editor session owns a directory, locked with a QLockFile while the session
+is running; the directory of a session whose lock is stale belongs to an editor
+that crashed (or was closed with unsaved changes) and can be recovered.
+
+Example:
+    journal = EditJournal(new_session_directory(RECOVERY_DIR), parent=self)
+    journal.attach(editor.document(), filename)
+    ...
+    for directory in find_recoverable_sessions(RECOVERY_DIR):
+        recovered = recover_session(directory)
+"""
+import json
+import os
+import shutil
+import time
+from typing import NamedTuple
+
+from PySide6.QtCore import (
+    QLockFile,
+    QObject,
+    QThreadPool,
+    QTimer,
+    Signal,
+    Slot
+)
+from PySide6.QtGui import (
+    QTextCursor,
+    QTextDocument
+)
+from PySide6.QtWidgets import QPlainTextDocumentLayout
+from shiboken6 import isValid
+
+from .file_saver import FileWriteTask
+
+SNAPSHOT_NAME = "snapshot.json"
+LOCK_NAME = "session.lock"
+JOURNAL_PREFIX = "journal-"
+JOURNAL_SUFFIX = ".log"
+
+# the journal is compacted when it grows past this size or the size of the snapshot, whichever is larger.
+COMPACT_MIN_BYTES = 256 * 1024
+# compactions wait for a pause in the typing.
+COMPACT_DELAY_MS = 2000
+
+
+class RecoveredSession(NamedTuple):
+    """
+    The text rebuilt from the journal of a previous session.
+
+    Attributes:
+        document (QTextDocument): the recovered text, with a QPlainTextDocumentLayout.
+        filename (str or None): the file the text belonged to, None for a new file.
+    """
+    document: QTextDocument
+    filename: str
+
+
+def new_session_directory(root: str) -> str:
+    """
+    Creates the directory of a new session.
+
+    Args:
+        root (str): the directory that holds the sessions.
+
+    Returns:
+        str: the path of the new session directory.
+    """
+    os.makedirs(root, exist_ok=True)
+    base = os.path.join(root, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+    directory, suffix = base, 1
+    while os.path.exists(directory):
+        directory, suffix = f"{base}-{suffix}", suffix + 1
+    os.makedirs(directory)
+    return directory
+
+
+def find_recoverable_sessions(root: str) -> list:
+    """
+    Lists the sessions that are not running anymore and left unsaved text.
+
+    Sessions that are not running and have no snapshot, or whose text had no
+    unsaved changes, hold nothing to recover and are deleted.
+
+    Args:
+        root (str): the directory that holds the sessions.
+
+    Returns:
+        list[str]: the session directories, the most recent first.
+    """
+    if not os.path.isdir(root):
+        return []
+
+    sessions = []
+    for name in os.listdir(root):
+        directory = os.path.join(root, name)
+        snapshot = os.path.join(directory, SNAPSHOT_NAME)
+        lock = QLockFile(os.path.join(directory, LOCK_NAME))
+        if not os.path.isdir(directory) or not lock.tryLock(0):
+            continue
+        lock.unlock()
+        if os.path.isfile(snapshot) and _has_unsaved_text(directory):
+            sessions.append((os.path.getmtime(snapshot), directory))
+        else:
+            discard_session(directory)
+    return [directory for _, directory in sorted(sessions, reverse=True)]
+
+
+def _has_unsaved_text(directory: str) -> bool:
+    """
+    Tells if the text of a session had unsaved changes.
+
+    The snapshot holds the modified flag of the text; an edit recorded after it
+    also means unsaved changes, since the snapshot that follows an edit may not
+    have been written before the crash. A snapshot that cannot be read is kept,
+    so the failure is reported when it is recovered.
+
+    Args:
+        directory (str): the session directory, with a snapshot.
+
+    Returns:
+        bool: True if the session has text to recover.
+    """
+    try:
+        with open(os.path.join(directory, SNAPSHOT_NAME), "r", encoding="utf-8") as file:
+            snapshot = json.load(file)
+    except (OSError, ValueError):
+        return True
+    # the snapshots written before the flag was recorded are always offered.
+    if snapshot.get("modified", True):
+        return True
+    return any(
+        generation >= snapshot.get("generation", 0) and os.path.getsize(path) > 0
+        for generation, path in _list_journals(directory)
+    )
+
+
+def recover_session(directory: str) -> RecoveredSession:
+    """
+    Rebuilds the text of a session from its snapshot and journals.
+
+    A record cut in the middle by the crash ends the replay.
+
+    Args:
+        directory (str): the session directory.
+
+    Returns:
+        RecoveredSession: the recovered document and file name.
+    """
+    with open(os.path.join(directory, SNAPSHOT_NAME), "r", encoding="utf-8") as file:
+        snapshot = json.load(file)
+
+    document = QTextDocument()
+    document.setDocumentLayout(QPlainTextDocumentLayout(document))
+    document.setUndoRedoEnabled(False)
+    cursor = QTextCursor(document)
+    cursor.insertText(snapshot["text"])
+
+    for generation, path in _list_journals(directory):
+        if generation < snapshot["generation"]:
+            continue
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    position, removed, text = json.loads(line)
+                except ValueError:
+                    break
+                end = document.characterCount() - 1
+                cursor.setPosition(min(position, end))
+                cursor.setPosition(min(position + removed, end), QTextCursor.MoveMode.KeepAnchor)
+                cursor.insertText(text)
+
+    document.setUndoRedoEnabled(True)
+    document.setModified(True)
+    return RecoveredSession(document, snapshot.get("filename"))
+
+
+def discard_session(directory: str) -> None:
+    """
+    Deletes the directory of a session.
+
+    Args:
+        directory (str): the session directory.
+    """
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def _list_journals(directory: str) -> list:
+    """
+    Lists the journal files of a session.
+
+    Args:
+        directory (str): the session directory.
+
+    Returns:
+        list[tuple[int, str]]: the generation and the path of each journal, in order.
+    """
+    journals = []
+    for name in os.listdir(directory):
+        if name.startswith(JOURNAL_PREFIX) and name.endswith(JOURNAL_SUFFIX):
+            try:
+                generation = int(name[len(JOURNAL_PREFIX):-len(JOURNAL_SUFFIX)])
+            except ValueError:
+                continue
+            journals.append((generation, os.path.join(directory, name)))
+    return sorted(journals)
+
+
+class EditJournal(QObject):
+    """
+    Records the edits of a document in the journal of a session.
+
+    The snapshot of generation N holds the text at the moment the journal of
+    generation N was started, so recovering means loading the snapshot and
+    replaying the journals of generation N and above. The snapshots are written
+    one at a time, in order, so an older snapshot never replaces a newer one.
+    No snapshot is written until the document is modified for the first time.
+
+    Attributes:
+        failed (Signal(str)): error message of a failed journal or snapshot write.
+        directory (str): the session directory.
+        document (QTextDocument or None): the journaled document.
+        filename (str or None): the file of the document, stored in the snapshots.
+        generation (int): the generation of the current journal.
+        compact_timer (QTimer): single shot timer that delays the compaction to a pause in the typing.
+    """
+    failed = Signal(str)
+
+    def __init__(self, directory: str, parent: QObject = None, thread_pool: QThreadPool = None):
+        """
+        Initializes the journal and locks the session directory.
+
+        Args:
+            directory (str): the session directory, see new_session_directory().
+            parent (QObject): the parent object.
+            thread_pool (QThreadPool): the pool that writes the snapshots, the global pool by default.
+        """
+        super().__init__(parent)
+        self.directory = directory
+        self.thread_pool = thread_pool or QThreadPool.globalInstance()
+        self.document = None
+        self.filename = None
+        self.generation = 0
+        self._lock = QLockFile(os.path.join(directory, LOCK_NAME))
+        self._lock.tryLock(0)
+        self._journal_file = None
+        self._journal_bytes = 0
+        self._snapshot_bytes = 0
+        self._length = 0
+        self._snapshot_in_flight = None
+        self._snapshot_pending = None
+
+        self.compact_timer = QTimer(self)
+        self.compact_timer.setSingleShot(True)
+        self.compact_timer.setInterval(COMPACT_DELAY_MS)
+        self.compact_timer.timeout.connect(self.compact)
+
+    def attach(self, document: QTextDocument, filename: str = None) -> None:
+        """
+        Starts journaling a document, replacing the previous one.
+
+        Args:
+            document (QTextDocument): the document edited by the user.
+            filename (str or None): the file of the document.
+        """
+        self._detach()
+        self.document = document
+        self.filename = filename
+        document.contentsChange.connect(self._record_change)
+        document.modificationChanged.connect(self._on_modification_changed)
+        self.compact()
+
+    def set_filename(self, filename: str) -> None:
+        """
+        Changes the file name stored with the recovered text.
+
+        Args:
+            filename (str or None): the file of the document.
+        """
+        if filename != self.filename:
+            self.filename = filename
+            self.compact()
+
+    @Slot()
+    def compact(self) -> None:
+        """
+        Starts a new journal and writes the current text as its snapshot, in the background.
+
+        Nothing is written while the session has never held a modified document.
+        """
+        self.compact_timer.stop()
+        if self.document is None or (self.generation == 0 and not self.document.isModified()):
+            return
+
+        text = self.document.toPlainText()
+        self._length = len(text)
+        self.generation += 1
+        self._open_journal()
+        snapshot = json.dumps(
+            {"generation": self.generation, "filename": self.filename, "modified": self.document.isModified(), "text": text},
+            ensure_ascii=False
+        )
+        self._snapshot_bytes = len(snapshot)
+        if self._snapshot_in_flight is not None:
+            self._snapshot_pending = (self.generation, snapshot)
+        else:
+            self._write_snapshot(self.generation, snapshot)
+
+    def close(self, keep: bool = False) -> None:
+        """
+        Stops journaling and releases the session.
+
+        Args:
+            keep (bool): keeps the session on disk, so its text is offered for recovery on the next start.
+        """
+        self.compact_timer.stop()
+        self._detach()
+        if self._journal_file is not None:
+            self._journal_file.close()
+            self._journal_file = None
+        self._lock.unlock()
+        if not keep:
+            discard_session(self.directory)
+
+    @Slot(int, int, int)
+    def _record_change(self, position: int, removed: int, added: int):
+        """
+        Appends an edit of the document to the journal.
+
+        Qt counts the final paragraph separator in the changes that replace the
+        whole document, so the counts are clamped to the text length. If the
+        tracked length still disagrees with the document, the journal is
+        compacted to get back in sync.
+
+        Args:
+            position (int): the position of the change.
+            removed (int): the number of removed characters.
+            added (int): the number of inserted characters.
+        """
+        if self._journal_file is None:
+            return
+        length = self.document.characterCount() - 1
+        removed = max(0, min(removed, self._length - position))
+        added = max(0, min(added, length - position))
+        if removed == 0 and added == 0:
+            return
+
+        cursor = QTextCursor(self.document)
+        cursor.setPosition(position)
+        cursor.setPosition(position + added, QTextCursor.MoveMode.KeepAnchor)
+        text = cursor.selectedText().replace("\u2029", "\n").replace("\u2028", "\n")
+        self._length += added - removed
+        if self._length != length:
+            self.compact()
+            return
+
+        record = json.dumps([position, removed, text], ensure_ascii=False) + "\n"
+        try:
+            self._journal_file.write(record)
+            self._journal_file.flush()
+        except OSError as e:
+            self.failed.emit(str(e))
+            return
+        self._journal_bytes += len(record)
+        if self._journal_bytes > max(COMPACT_MIN_BYTES, self._snapshot_bytes) and not self.compact_timer.isActive():
+            self.compact_timer.start()
+
+    @Slot(bool)
+    def _on_modification_changed(self, modified: bool):
+        """
+        Writes a snapshot with the new modified flag, so a saved text is not offered for recovery.
+
+        Args:
+            modified (bool): True if the document has unsaved changes.
+        """
+        self.compact()
+
+    def _detach(self) -> None:
+        """Stops listening to the journaled document."""
+        # the editor may have deleted the document when it was replaced.
+        if self.document is not None and isValid(self.document):
+            self.document.contentsChange.disconnect(self._record_change)
+            self.document.modificationChanged.disconnect(self._on_modification_changed)
+        self.document = None
+
+    def _open_journal(self) -> None:
+        """Closes the current journal file and starts the one of the current generation."""
+        if self._journal_file is not None:
+            self._journal_file.close()
+        path = os.path.join(self.directory, f"{JOURNAL_PREFIX}{self.generation}{JOURNAL_SUFFIX}")
+        try:
+            self._journal_file = open(path, "w", encoding="utf-8")
+        except OSError as e:
+            self._journal_file = None
+            self.failed.emit(str(e))
+        self._journal_bytes = 0
+
+    def _write_snapshot(self, generation: int, snapshot: str) -> None:
+        """
+        Sends the write of a snapshot to the pool.
+
+        Args:
+            generation (int): the generation of the snapshot.
+            snapshot (str): the JSON content of the snapshot.
+        """
+        task = FileWriteTask(os.path.join(self.directory, SNAPSHOT_NAME), snapshot)
+        task.signals.finished.connect(self._on_snapshot_written)
+        task.signals.failed.connect(self._on_snapshot_failed)
+        self._snapshot_in_flight = (task, generation)
+        self.thread_pool.start(task)
+
+    @Slot()
+    def _on_snapshot_written(self):
+        """Deletes the journals already included in the written snapshot."""
+        _, generation = self._snapshot_in_flight
+        self._write_pending_snapshot()
+        for journal_generation, path in _list_journals(self.directory):
+            if journal_generation < generation:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    @Slot(str)
+    def _on_snapshot_failed(self, message: str):
+        """
+        Reports a failed snapshot; the older snapshot and journals are kept.
+
+        Args:
+            message (str): the error message.
+        """
+        self._write_pending_snapshot()
+        self.failed.emit(message)
+
+    def _write_pending_snapshot(self) -> None:
+        """Starts the snapshot waiting for the finished one, if there is one."""
+        self._snapshot_in_flight = None
+        if self._snapshot_pending is not None:
+            pending, self._snapshot_pending = self._snapshot_pending, None
+            self._write_snapshot(*pending)
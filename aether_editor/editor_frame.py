@@ -6,63 +6,174 @@ for the Aether Editor, featuring a source Markdown text editor and a live,
 syntax-highlighted HTML preview pane.
 
 It handles file operations (open, save, PDF export) and manages the debounced 
-preview update logic using QTimer for efficient performance.
+preview update logic, whose Markdown conversion runs in a background thread 
+so typing is never blocked by the preview. The PDF export also runs in the 
+background, from the current source rather than from the preview.
+
+Each open document has its own frame, in a DocumentTabWidget, which shares the
+render worker pool and the cache of highlighted code between the frames and
+may release the preview of the documents that are not on screen.
+
+The editor and the preview scroll together: a SourceMap of the last render maps
+the source lines to the rendered blocks, and the position of a line inside its
+block is interpolated over the height of the block in the preview.
+
+The outline beside the editor lists the headings the highlighter indexes while
+it highlights, so it never parses the document again. The find bar (Ctrl+F)
+searches the document in the background.
 """
 import os
+import time
 
-import markdown 
-from PySide6.QtCore import Slot, QTimer
+from PySide6.QtCore import QPoint, Qt, QThreadPool, QTimer, Signal, Slot
 from PySide6.QtWidgets import (
     QMainWindow,
     QWidget,
     QHBoxLayout,
-    QTextEdit,
     QVBoxLayout,
     QPushButton,
     QFileDialog,
     QToolBar,
     QMessageBox, 
-    QLabel
+    QLabel,
+    QProgressBar
 )
 
-from PySide6.QtPrintSupport import QPrinter
-from PySide6.QtGui import QTextCursor 
+from PySide6.QtGui import QKeySequence, QShortcut, QTextCursor, QTextDocument
 from typing import Callable, Any
 
 from .code_editor import CodeEditor
-from .constants import get_css_style
+from .constants import RECOVERY_DIR, get_css_style
+from .edit_journal import (
+    EditJournal,
+    RecoveredSession,
+    new_session_directory
+)
+from .file_loader import MarkdownFileLoader
+from .file_monitor import FileChangeMonitor
+from .file_saver import MarkdownFileSaver
+from .find_bar import FindBar
+from .highlight_cache import CodeHighlightCache
+from .image_loader import ImageLoader
+from .instrumentation import phase_recorder, span
+from .markdown_renderer import MarkdownRenderer
+from .outline_panel import OutlinePanel
+from .pdf_exporter import MarkdownPdfExporter
+from .preview_patcher import PreviewDocumentPatcher
+from .preview_text_edit import PreviewTextEdit
+from .render_worker import PreviewRenderScheduler
+from .source_map import SourceMap
 
 class MarkdownEditorFrame(QWidget):
     """
     Main component of the Markdown editor interface, providing the text editor 
     and the real-time HTML preview.
 
-    The frame uses a QTimer for 'debounce' logic to delay the preview update, 
-    optimizing performance during typing.
+    The frame uses a PreviewRenderScheduler for 'debounce' logic to delay the preview
+    update, and renders in a worker thread, optimizing performance during typing.
+
+    An empty preview, as after opening a file or after release_preview(), is filled
+    from the top a few blocks at a time while the application is idle, so a large
+    document never blocks the window while its whole preview is laid out.
 
     Attributes:
+        open_requested (Signal(str)): emitted with the path of a file chosen to be opened.
+        filename_changed (Signal(str)): emitted with the new path of the document after a load, save or recovery.
         current_filename (str or None): The file path of the currently loaded Markdown file. None if no file is open.
-        preview_timer (QTimer): The timer instance used to implement debouncing for the live preview update.
+        renderer (MarkdownRenderer): The incremental render engine that keeps the HTML of unchanged blocks.
+        preview_scheduler (PreviewRenderScheduler): Debounces the edits and runs at most one render at a time in the background.
+        preview_patcher (PreviewDocumentPatcher): Replaces only the changed blocks of the preview document.
+        file_loader (MarkdownFileLoader): Reads the opened files in chunks, in the background.
+        file_saver (MarkdownFileSaver): Writes the saved files atomically, in the background.
+        file_monitor (FileChangeMonitor): Reloads the changes made to the file by other programs, as minimal edits.
+        edit_journal (EditJournal): Records every edit, so the unsaved text can be recovered after a crash.
+        pdf_exporter (MarkdownPdfExporter): Writes the PDF of the current text, in the background.
+        restyle_timer (QTimer): Restyles the preview blocks left with the previous theme, while idle.
+        fill_timer (QTimer): Inserts the blocks of an empty preview, while idle.
+        preview_released (bool): True while the preview document is emptied to save memory.
+        source_map (SourceMap): The source lines of the rendered blocks of the last render.
+        outline (OutlinePanel): The headings of the document, beside the editor.
+        find_bar (FindBar): The find and replace bar of the editor, hidden until Ctrl+F.
+        phase_status (QLabel or None): The p50/p95 of the main phases, beside save_status; None unless AETHER_TRACE is set.
     """
-    def __init__(self, parent: QWidget):
+    open_requested = Signal(str)
+    filename_changed = Signal(str)
+
+    # rendered blocks restyled around the visible ones when the theme changes
+    RESTYLE_MARGIN = 10
+    # blocks restyled or inserted in an empty preview at a time, and time of each idle pass (ms)
+    RESTYLE_STEP = 20
+    RESTYLE_SLICE_MS = 8
+    # phases shown beside the status when instrumented, and interval of their update (ms)
+    STATUS_PHASES = ("toPlainText", "render", "layout", "highlight")
+    PHASE_STATUS_MS = 1000
+
+    def __init__(
+        self,
+        parent: QWidget,
+        code_cache: CodeHighlightCache = None,
+        image_loader: ImageLoader = None,
+        thread_pool: QThreadPool = None,
+        sample: bool = True
+    ):
         """
         Initializes the Markdown editor frame, setting up the debounced preview
-        timer and connecting signals.
+        scheduler and connecting signals.
 
         Args:
             parent (QWidget): the parent widget of this frame.
+            code_cache (CodeHighlightCache or None): the cache of highlighted code, shared with other documents.
+            image_loader (ImageLoader or None): the decoded images of the preview, shared with other documents.
+            thread_pool (QThreadPool or None): the pool of the renders, shared with other documents; the global one if None.
+            sample (bool): starts the editor with the sample document instead of an empty one.
         """
         super().__init__(parent=parent)
         self.current_filename = None
-        self.preview_timer = QTimer(self)
-        
-        self.preview_timer.setSingleShot(True) 
-        self.preview_timer.setInterval(200) 
-        self.preview_timer.timeout.connect(self.update_preview)
+        self.preview_released = False
+        self._fill_blocks = None
+        self.source_map = SourceMap()
+        # set while one side is scrolled to follow the other, so it does not answer back.
+        self._syncing_scroll = False
+        self.renderer = MarkdownRenderer(code_cache=code_cache)
+        self._image_loader = image_loader
 
         self._setup_ui()
-        self._set_initial_content()
-        self.debounce_preview() 
+        self.preview_scheduler = PreviewRenderScheduler(
+            self.renderer, self.editor.toPlainText, parent=self, thread_pool=thread_pool
+        )
+        self.preview_scheduler.rendered.connect(self.update_preview)
+        self.preview_scheduler.failed.connect(self.show_preview_error)
+
+        self.file_loader = MarkdownFileLoader(parent=self)
+        self.file_loader.progress.connect(self.load_progress.setValue)
+        self.file_loader.finished.connect(self.finish_loading)
+        self.file_loader.failed.connect(self.show_loading_error)
+        self.file_loader.canceled.connect(self.cancel_loading)
+
+        self.file_saver = MarkdownFileSaver(parent=self)
+        self.file_saver.saved.connect(self.show_saved)
+        self.file_saver.skipped.connect(self.show_save_skipped)
+        self.file_saver.failed.connect(self.show_save_error)
+
+        self.file_monitor = FileChangeMonitor(parent=self)
+        self.file_monitor.changed.connect(self.reload_changed_file)
+        self.file_monitor.reloaded.connect(self.show_reloaded)
+        self.file_monitor.failed.connect(self.show_reload_error)
+
+        self.pdf_exporter = MarkdownPdfExporter(parent=self, code_cache=self.renderer.code_cache)
+        self.pdf_exporter.progress.connect(self.show_export_progress)
+        self.pdf_exporter.finished.connect(self.show_exported)
+        self.pdf_exporter.failed.connect(self.show_export_error)
+        self.pdf_exporter.canceled.connect(self.show_export_canceled)
+
+        # the first preview is rendered by start_preview(), once the window is on screen.
+        if sample:
+            self._set_initial_content()
+        self.editor.textChanged.connect(self.debounce_preview)
+
+        self.edit_journal = EditJournal(new_session_directory(RECOVERY_DIR), parent=self)
+        self.edit_journal.failed.connect(self.show_journal_error)
+        self.edit_journal.attach(self.editor.document(), self.current_filename)
 
     # --- ui config ---
     def _setup_ui(self)->None:
@@ -71,7 +182,7 @@ class MarkdownEditorFrame(QWidget):
 
         The layout uses an QHBoxLayout to split the frame into two halves:
         the left side (editor_v_layout) contains the action toolbar and the 
-        CodeEditor widget, and the right side contains the read-only QTextEdit 
+        CodeEditor widget, with the outline of its headings, and the right side contains the read-only PreviewTextEdit 
         for the rendered preview. Stretches are set to ensure both panes take 
         equal space.
         """
@@ -84,24 +195,83 @@ class MarkdownEditorFrame(QWidget):
         toolbar.addWidget(self._create_button("Abrir MD", "#1d662e", self.open_markdown))
         toolbar.addWidget(self._create_button("Salvar MD", "#4e5cf8", self.save_markdown))
         toolbar.addWidget(self._create_button("Exportar PDF", "#5656f9", self.export_to_pdf))
+        toolbar.addWidget(self._create_button("Sumário", "#3a3f4b", self.toggle_outline))
+        toolbar.addWidget(self._create_button("Buscar", "#3a3f4b", lambda: self.find_bar.open_bar()))
         toolbar.addSeparator()
         self.save_status=QLabel(text="texto atualizado")
         toolbar.addWidget(self.save_status)
 
+        self.phase_status = None
+        if phase_recorder is not None:
+            self.phase_status = QLabel()
+            # a label of fixed size does not lay the window out again each second.
+            template = " · ".join(f"{name} 000/000" for name in self.STATUS_PHASES) + " ms"
+            self.phase_status.setFixedSize(self.phase_status.fontMetrics().horizontalAdvance(template) + 8, self.phase_status.sizeHint().height())
+            toolbar.addWidget(self.phase_status)
+            toolbar.addWidget(self._create_button("Exportar trace", "#3a3f4b", self.export_trace))
+            self.phase_timer = QTimer(self)
+            self.phase_timer.timeout.connect(self.show_phase_stats)
+            self.phase_timer.start(self.PHASE_STATUS_MS)
+
+        self.load_progress = QProgressBar()
+        self.load_progress.setRange(0, 100)
+        self.load_progress.setMaximumWidth(150)
+        self.load_progress_action = toolbar.addWidget(self.load_progress)
+        self.load_progress_action.setVisible(False)
+        self.cancel_load_action = toolbar.addWidget(self._create_button("Cancelar", "#a83232", self.cancel_open))
+        self.cancel_load_action.setVisible(False)
+
+        self.export_progress = QProgressBar()
+        self.export_progress.setMaximumWidth(150)
+        self.export_progress.setFormat("%v/%m")
+        self.export_progress_action = toolbar.addWidget(self.export_progress)
+        self.export_progress_action.setVisible(False)
+        self.cancel_export_action = toolbar.addWidget(self._create_button("Cancelar PDF", "#a83232", self.cancel_export))
+        self.cancel_export_action.setVisible(False)
+
         editor_v_layout.addWidget(toolbar)
         
         self.editor = CodeEditor()
-        self.editor.textChanged.connect(self.debounce_preview)
-        editor_v_layout.addWidget(self.editor)
+        self.outline = OutlinePanel(self.editor)
+        self.outline.setMaximumWidth(220)
+        editor_h_layout = QHBoxLayout()
+        editor_h_layout.addWidget(self.outline)
+        editor_h_layout.addWidget(self.editor)
+        self.find_bar = FindBar(self.editor)
+        editor_v_layout.addWidget(self.find_bar)
+        editor_v_layout.addLayout(editor_h_layout)
+        # every tab has its own bar, so the shortcut only works inside this frame.
+        find_shortcut = QShortcut(QKeySequence.StandardKey.Find, self)
+        find_shortcut.setContext(Qt.ShortcutContext.WidgetWithChildrenShortcut)
+        find_shortcut.activated.connect(self.find_bar.open_bar)
         main_layout.addLayout(editor_v_layout)
 
-        self.preview = QTextEdit()
-        self.preview.setReadOnly(True) 
+        # the images of the preview are decoded in the background, relative to the directory of the file.
+        self.preview = PreviewTextEdit(self._image_loader)
+        self.filename_changed.connect(lambda filename: self.preview.set_base_dir(os.path.dirname(os.path.abspath(filename))))
+        # the body background of the theme is painted by the widget, so a new theme does not lay the preview out again.
+        self.preview_patcher = PreviewDocumentPatcher(self.preview.document(), frame_background=False)
+        self.restyle_timer = QTimer(self)
+        self.restyle_timer.timeout.connect(self._restyle_next_preview_blocks)
+        self.fill_timer = QTimer(self)
+        self.fill_timer.timeout.connect(self._fill_next_preview_blocks)
         main_layout.addWidget(self.preview)
+
+        self.editor.verticalScrollBar().valueChanged.connect(self.sync_preview_to_editor)
+        self.editor.cursorPositionChanged.connect(self.sync_preview_to_editor)
+        # only the scrolls done by the user, not the ones caused by the updates of the preview.
+        self.preview.verticalScrollBar().actionTriggered.connect(
+            lambda _: QTimer.singleShot(0, self.sync_editor_to_preview)
+        )
         
         main_layout.setStretch(0, 1)
         main_layout.setStretch(1, 1)
         
+    @Slot()
+    def toggle_outline(self) -> None:
+        """Shows or hides the outline of the headings."""
+        self.outline.setVisible(not self.outline.isVisible())
+
     def _create_button(self, text: str, color: str, function: Callable[...,Any]) -> QPushButton:
         """
         Creates a custom QPushButton and connects its action.
@@ -160,34 +330,104 @@ class MarkdownEditorFrame(QWidget):
         """
         opens a Markdown file from the file system.
 
-        Prompts the user for a file using QFileDialog, reads the contents into the editor,
-        and updates the current file name and window title.
+        Prompts the user for a file using QFileDialog and emits open_requested, so the
+        tabs can choose the document that receives it (see load_file).
         """
         filename, _ = QFileDialog.getOpenFileName(
             self, "Abrir Arquivo Markdown", "", "Arquivos Markdown (*.md *.markdown);;Todos os Arquivos (*)"
         )
         if filename:
-            try:
-                with open(filename, 'r', encoding='utf-8') as file:
-                    self.editor.setPlainText(file.read())
-                self.current_filename = filename
-                self.setWindowTitle(f"Aether Editor - {os.path.basename(filename)}")
+            self.open_requested.emit(filename)
+
+    def load_file(self, filename: str) -> None:
+        """
+        Starts loading a file in this document.
 
+        The file is read in chunks in the background, showing a progress bar and a 
+        cancel button. The editor keeps the current text until the load finishes 
+        (see finish_loading).
+
+        Args:
+            filename (str): the path of the file.
+        """
+        if filename:
+            try:
+                self.file_loader.load(filename)
             except Exception as e:
-                warning_message=QMessageBox()
-                warning_message.setText(f"falha em abrir o arquivo\nErro: {e}")
-                warning_message.setIcon(QMessageBox.Icon.Warning)
-                warning_message.setStandardButtons(QMessageBox.StandardButton.Ok)
-                warning_message.exec()
+                self.show_loading_error(filename, str(e))
+                return
+            self.save_status.setText(f"abrindo {os.path.basename(filename)}...")
+            self.load_progress_action.setVisible(True)
+            self.cancel_load_action.setVisible(True)
+
+    @Slot()
+    def cancel_open(self):
+        """Cancels the file being opened, keeping the current text in the editor."""
+        self.file_loader.cancel()
+
+    @Slot(QTextDocument, str)
+    def finish_loading(self, document: QTextDocument, filename: str):
+        """
+        Puts the loaded document in the editor and updates the file name and window title.
+
+        The highlighting and the preview of the new text only start here.
+
+        Args:
+            document (QTextDocument): the loaded document.
+            filename (str): the path of the loaded file.
+        """
+        self._hide_loading_progress()
+        self.editor.set_loaded_document(document)
+        self.edit_journal.attach(document, filename)
+        self.current_filename = filename
+        self.file_monitor.watch(filename)
+        self.setWindowTitle(f"Aether Editor - {os.path.basename(filename)}")
+        self.filename_changed.emit(filename)
+        self.save_status.setText("atualizando texto...")
+        self.preview_scheduler.render_now()
+
+    @Slot(str)
+    def cancel_loading(self, filename: str):
+        """
+        Reports a canceled load.
+
+        Args:
+            filename (str): the path of the file that was being opened.
+        """
+        self._hide_loading_progress()
+        self.save_status.setText(f"abertura de {os.path.basename(filename)} cancelada")
+
+    @Slot(str, str)
+    def show_loading_error(self, filename: str, message: str):
+        """
+        Warns that a file could not be opened.
+
+        Args:
+            filename (str): the path of the file.
+            message (str): the error message.
+        """
+        self._hide_loading_progress()
+        self.save_status.setText("texto atualizado")
+        warning_message=QMessageBox()
+        warning_message.setText(f"falha em abrir o arquivo\nErro: {message}")
+        warning_message.setIcon(QMessageBox.Icon.Warning)
+        warning_message.setStandardButtons(QMessageBox.StandardButton.Ok)
+        warning_message.exec()
+
+    def _hide_loading_progress(self) -> None:
+        """Hides the progress bar and the cancel button of the file loading."""
+        self.load_progress_action.setVisible(False)
+        self.cancel_load_action.setVisible(False)
 
     @Slot()
     def save_markdown(self):
         """
-        Saves the current editor content to the file.
+        Saves the current editor content to the file, in the background.
 
         If "self.current_filename" is None, a QFileDialog opens so that
         the user can choose the name and location of the new file. Otherwise,
-        the existing file is overwritten. Displays a QMessageBox indicating success or failure.
+        the existing file is replaced atomically. Saving an unmodified document to
+        its own file is skipped. The outcome is shown in the status label.
         """
         if not self.current_filename:
             filename, _ = QFileDialog.getSaveFileName(
@@ -197,84 +437,517 @@ class MarkdownEditorFrame(QWidget):
             filename = self.current_filename
 
         if filename:
-            try:
-                with open(filename, 'w', encoding='utf-8') as file:
-                    file.write(self.editor.toPlainText())
-                self.current_filename = filename
-                self.setWindowTitle(f"Aether Editor - {os.path.basename(filename)}")
+            if self.file_saver.save(self.editor.document(), filename, self.current_filename):
+                self.save_status.setText(f"salvando {os.path.basename(filename)}...")
 
-                success_message=QMessageBox()
-                success_message.setText("salvamento efetuado com sucesso")
-                success_message.setIcon(QMessageBox.Icon.Information)
-                success_message.setStandardButtons(QMessageBox.StandardButton.Ok)
-                success_message.exec()
+    @Slot(str)
+    def show_saved(self, filename: str):
+        """
+        Reports a finished save and updates the current file name and window title.
 
-            except Exception as e:
-                warning_message=QMessageBox()
-                warning_message.setText(f"falha no salvamento\nErro: {e}")
-                warning_message.setIcon(QMessageBox.Icon.Warning)
-                warning_message.setStandardButtons(QMessageBox.StandardButton.Ok)
-                warning_message.exec()
+        Args:
+            filename (str): the path of the saved file.
+        """
+        self.current_filename = filename
+        # the version just written is not a change made by another program.
+        self.file_monitor.watch(filename)
+        self.setWindowTitle(f"Aether Editor - {os.path.basename(filename)}")
+        self.filename_changed.emit(filename)
+        self.edit_journal.set_filename(filename)
+        self.save_status.setText(f"{os.path.basename(filename)} salvo")
+
+    @Slot(str)
+    def show_save_skipped(self, filename: str):
+        """
+        Reports a save skipped because the document has no unsaved changes.
+
+        Args:
+            filename (str): the path of the file.
+        """
+        self.save_status.setText(f"nenhuma alteração para salvar em {os.path.basename(filename)}")
+
+    @Slot(str, str)
+    def show_save_error(self, filename: str, message: str):
+        """
+        Reports a failed save; the file on disk is left as it was.
+
+        Args:
+            filename (str): the path of the file.
+            message (str): the error message.
+        """
+        self.save_status.setText(f"falha ao salvar {os.path.basename(filename)}: {message}")
+
+    @Slot(str)
+    def reload_changed_file(self, filename: str):
+        """
+        Reloads the file modified by another program, applying only the changed lines.
+
+        The reload is an edit like any other, so Ctrl+Z brings the previous text back.
+        Unsaved changes are only replaced if the user agrees; a file being saved by the
+        editor is left alone, since the save replaces it.
+
+        Args:
+            filename (str): the path of the modified file.
+        """
+        if self.file_saver.is_saving() or self.file_loader.is_loading():
+            return
+        if self.editor.document().isModified():
+            answer = QMessageBox.question(
+                self,
+                "Arquivo modificado",
+                f"{os.path.basename(filename)} foi modificado por outro programa.\n"
+                "Recarregar e substituir as alterações não salvas? (Ctrl+Z desfaz a recarga)"
+            )
+            if answer != QMessageBox.StandardButton.Yes:
+                self.file_monitor.ignore_current_version()
+                return
+        self.save_status.setText(f"recarregando {os.path.basename(filename)}...")
+        self.file_monitor.reload(self.editor.document())
+
+    @Slot(str, int)
+    def show_reloaded(self, filename: str, hunk_count: int):
+        """
+        Reports a finished reload.
+
+        Args:
+            filename (str): the path of the reloaded file.
+            hunk_count (int): the number of changed ranges of lines.
+        """
+        changes = "1 trecho alterado" if hunk_count == 1 else f"{hunk_count} trechos alterados"
+        self.save_status.setText(f"{os.path.basename(filename)} recarregado ({changes})")
+
+    @Slot(str, str)
+    def show_reload_error(self, filename: str, message: str):
+        """
+        Reports a failed reload; the text of the editor is left as it was.
+
+        Args:
+            filename (str): the path of the file.
+            message (str): the error message.
+        """
+        self.save_status.setText(f"falha ao recarregar {os.path.basename(filename)}: {message}")
+
+    def load_recovered(self, recovered: RecoveredSession) -> None:
+        """
+        Puts the text recovered from a previous session in this document.
+
+        The recovered text replaces the editor content and stays marked as modified
+        until it is saved.
+
+        Args:
+            recovered (RecoveredSession): the recovered document and its file name.
+        """
+        self.editor.set_loaded_document(recovered.document)
+        self.edit_journal.attach(recovered.document, recovered.filename)
+        self.current_filename = recovered.filename
+        if recovered.filename:
+            self.file_monitor.watch(recovered.filename)
+            self.setWindowTitle(f"Aether Editor - {os.path.basename(recovered.filename)}")
+            self.filename_changed.emit(recovered.filename)
+        self.save_status.setText("texto recuperado")
+        self.preview_scheduler.render_now()
+
+    def is_untouched(self) -> bool:
+        """
+        Returns:
+            bool: True if the document has no file and no edits, so opening a file may replace it.
+        """
+        return (
+            not self.current_filename
+            and not self.editor.document().isModified()
+            and not self.file_loader.is_loading()
+        )
+
+    @Slot(str)
+    def show_journal_error(self, message: str):
+        """
+        Reports a failed write of the recovery journal.
+
+        Args:
+            message (str): the error message.
+        """
+        self.save_status.setText(f"falha no diário de recuperação: {message}")
+
+    def close_session(self, keep_unsaved: bool = True) -> None:
+        """
+        Ends the recovery journal when the editor is closed.
+
+        The journal is kept only if there are unsaved changes, to be offered on the next start.
+        A file being opened and a PDF export still running are canceled.
+
+        Args:
+            keep_unsaved (bool): False discards the journal even with unsaved changes, when the user chose so.
+        """
+        self.edit_journal.close(keep=keep_unsaved and self.editor.document().isModified())
+        self.file_loader.cancel()
+        self.pdf_exporter.cancel()
 
     @Slot()
     def export_to_pdf(self):
         """
-        Exports the rendered preview content to a PDF file.
+        Exports the current Markdown text to a PDF file, in the background.
 
         Opens a QFileDialog for the user to select the file location and name.
-        Uses QPrinter in high-resolution mode to convert the displayed HTML document to PDF.
+        The text is rendered again from a snapshot of the source, so the PDF matches
+        the editor even while the preview is not up to date, and laid out page by page
+        by the pdf_exporter, which shows its progress and can be canceled. Relative
+        image paths are resolved from the directory of the current file.
         """
         filename, _ = QFileDialog.getSaveFileName(
             self, "Salvar Documento PDF", "documento_markdown.pdf", "Arquivos PDF (*.pdf);;Todos os Arquivos (*)"
         )
         if filename:
-            printer = QPrinter(QPrinter.PrinterMode.HighResolution)
-            printer.setOutputFormat(QPrinter.OutputFormat.PdfFormat)
-            printer.setOutputFileName(filename)
-            self.preview.document().print_(printer)
+            base_dir = os.path.dirname(os.path.abspath(self.current_filename)) if self.current_filename else None
+            self.pdf_exporter.export(self.editor.toPlainText(), filename, get_css_style(), base_dir)
+            self.save_status.setText(f"exportando {os.path.basename(filename)}...")
+            # busy indicator until the page count is known.
+            self.export_progress.setRange(0, 0)
+            self.export_progress_action.setVisible(True)
+            self.cancel_export_action.setVisible(True)
+
+    @Slot()
+    def show_phase_stats(self):
+        """Shows the rolling p50/p95 of the main phases, and of every phase in the tooltip."""
+        def describe(name: str) -> str:
+            # a decimal only below 10 ms, so the text fits the fixed width of the label.
+            p50, p95 = (f"{value:.1f}" if value < 10 else f"{value:.0f}" for value in phase_recorder.percentiles(name))
+            return f"{name} {p50}/{p95}"
+
+        shown = [describe(name) for name in self.STATUS_PHASES if phase_recorder.percentiles(name)]
+        self.phase_status.setText(" · ".join(shown) + " ms" if shown else "sem medições")
+        self.phase_status.setToolTip(
+            "p50/p95 (ms) das últimas medições:\n" + "\n".join(describe(name) for name in phase_recorder.phase_names())
+        )
+
+    @Slot()
+    def export_trace(self):
+        """Writes the recorded phases to a Chrome trace JSON file (chrome://tracing, Perfetto)."""
+        filename, _ = QFileDialog.getSaveFileName(
+            self, "Exportar Trace", "aether_trace.json", "Arquivos JSON (*.json);;Todos os Arquivos (*)"
+        )
+        if not filename:
+            return
+        try:
+            count = phase_recorder.export_chrome_trace(filename)
+        except OSError as e:
+            self.save_status.setText(f"falha ao exportar o trace: {e}")
+        else:
+            self.save_status.setText(f"trace exportado ({count} fases)")
+
+    @Slot()
+    def cancel_export(self):
+        """Cancels the PDF export; no file is written."""
+        self.pdf_exporter.cancel()
+
+    @Slot(int, int)
+    def show_export_progress(self, page: int, page_count: int):
+        """
+        Shows the pages of the PDF written so far.
+
+        Args:
+            page (int): the number of pages written.
+            page_count (int): the page count of the document.
+        """
+        self.export_progress.setRange(0, page_count)
+        self.export_progress.setValue(page)
+
+    @Slot(str, int)
+    def show_exported(self, filename: str, page_count: int):
+        """
+        Reports a finished PDF export.
+
+        Args:
+            filename (str): the path of the PDF file.
+            page_count (int): the page count of the file.
+        """
+        self._hide_export_progress()
+        self.save_status.setText(f"{os.path.basename(filename)} exportado ({page_count} páginas)")
+
+    @Slot(str, str)
+    def show_export_error(self, filename: str, message: str):
+        """
+        Reports a failed PDF export.
+
+        Args:
+            filename (str): the path of the PDF file.
+            message (str): the error message.
+        """
+        self._hide_export_progress()
+        self.save_status.setText(f"falha ao exportar {os.path.basename(filename)}: {message}")
+
+    @Slot(str)
+    def show_export_canceled(self, filename: str):
+        """
+        Reports a canceled PDF export.
+
+        Args:
+            filename (str): the path of the PDF file.
+        """
+        # an export replaced by a new one stops after the new one started.
+        if self.pdf_exporter.is_exporting():
+            return
+        self._hide_export_progress()
+        self.save_status.setText(f"exportação de {os.path.basename(filename)} cancelada")
+
+    def _hide_export_progress(self) -> None:
+        """Hides the progress bar and the cancel button of the PDF export."""
+        self.export_progress_action.setVisible(False)
+        self.cancel_export_action.setVisible(False)
 
     @Slot()
     def debounce_preview(self):
         """
         Schedules the execution of the preview update.
 
-        Cancels any pending execution and starts the QTimer. The timer only triggers the heavy code if 
-        it is not restarted (i.e., if the user stops typing).
+        Restarts the debounce of the preview scheduler. The render only starts if 
+        the timer is not restarted (i.e., if the user stops typing), and never while 
+        another render of this document is still running. The interval adapts to the 
+        cost of the recent renders and is shown in the status label.
+        """
+        self.preview_scheduler.schedule()
+        self.save_status.setText(f"atualizando texto... ({self.preview_scheduler.policy.describe()})")
+
+    @Slot()
+    def start_preview(self):
         """
+        Renders the first preview without waiting for the debounce.
+
+        Called once the window is painted: the first render imports markdown and
+        Pygments in the worker, and the window does not wait for it.
+        """
+        self.preview_scheduler.render_now()
         self.save_status.setText("atualizando texto...")
-        self.preview_timer.start()
+
+    @Slot(object)
+    def update_preview(self, rendered_blocks: list):
+        """
+        Updates the preview with the blocks rendered in the background.
+
+        The conversion is done in a worker by the MarkdownRenderer, which uses the
+        markdown module with the extensions 'fenced_code', 'tables', and 'codehilite'
+        for code block support and syntax highlighting. Only the most recent result
+        reaches this slot, which runs on the GUI thread and patches the preview
+        document in place: only the ranges of the changed blocks are replaced, so the
+        rest of the layout and the scroll position are kept. The style comes from
+        get_css_style(), which reads the theme again if its file was modified; a new
+        style is applied like a new theme (see apply_theme).
+
+        An empty preview is filled RESTYLE_STEP blocks at a time, from the top, while
+        the application is idle; the renders that arrive meanwhile only change the
+        blocks still to be inserted. A released preview is left empty.
+
+        Args:
+            rendered_blocks (list[RenderedBlock]): the rendered blocks of the document.
+        """
+        self.save_status.setText(f"texto atualizado ({self.preview_scheduler.policy.describe()})")
+        self.source_map = SourceMap(rendered_blocks)
+        if self.preview_released:
+            return
+        self._set_preview_style(get_css_style())
+        if self.fill_timer.isActive() or (
+            not self.preview_patcher.block_count() and len(rendered_blocks) > self.RESTYLE_STEP
+        ):
+            self._fill_blocks = rendered_blocks
+            self._fill_next_preview_blocks()
+        else:
+            with span("layout"):
+                self.preview_patcher.apply(rendered_blocks)
+        self.preview.refresh_images()
+        self.sync_preview_to_editor()
+
+    @Slot()
+    def _fill_next_preview_blocks(self):
+        """Inserts the next blocks of an empty preview, for RESTYLE_SLICE_MS."""
+        blocks = self._fill_blocks
+        deadline = time.perf_counter() + self.RESTYLE_SLICE_MS / 1000
+        count = self.preview_patcher.block_count()
+        while True:
+            # apply() of a longer prefix replaces the changed blocks and adds the next ones at the end.
+            count = min(len(blocks), count + self.RESTYLE_STEP)
+            with span("layout"):
+                self.preview_patcher.apply(blocks[:count])
+            if count == len(blocks) or time.perf_counter() >= deadline:
+                break
+        if count == len(blocks):
+            self.fill_timer.stop()
+            self._fill_blocks = None
+        elif not self.fill_timer.isActive():
+            self.fill_timer.start(0)
 
     @Slot()
-    def update_preview(self):
+    def sync_preview_to_editor(self):
         """
-        Converts Markdown text from the editor to styled HTML and updates the preview.
+        Scrolls the preview to the part of the document shown in the editor.
 
-        The conversion process uses the markdown module with the extensions
-        'fenced_code', 'tables', and 'codehilite' for code block support
-        and syntax highlighting. The style is injected with get_css_style().
+        The line of the cursor is the anchor while it is on screen, and is put at the
+        same height in the preview; otherwise the top line of the editor is put at the
+        top of the preview.
         """
-        markdown_text = self.editor.toPlainText()
-        
-        html_content = markdown.markdown(
-            markdown_text, 
-            extensions=['fenced_code', 'tables', 'codehilite']
+        if self._syncing_scroll or not self.preview_patcher.block_count():
+            return
+        cursor_rect = self.editor.cursorRect()
+        if 0 <= cursor_rect.top() < self.editor.viewport().height():
+            cursor = self.editor.textCursor()
+            block = cursor.block()
+            line_in_block = block.layout().lineForTextPosition(cursor.positionInBlock()).lineNumber()
+            line = block.blockNumber() + max(0, line_in_block) / max(1, block.lineCount())
+            anchor = cursor_rect.top()
+        else:
+            block = self.editor.firstVisibleBlock()
+            offset = self.editor.verticalScrollBar().value() - block.firstLineNumber()
+            line = block.blockNumber() + offset / max(1, block.lineCount())
+            anchor = 0
+
+        index, fraction = self.source_map.block_at_line(line)
+        if index < 0:
+            return
+        index = min(index, self.preview_patcher.block_count() - 1)
+        top, bottom = self._preview_block_span(index)
+        self._syncing_scroll = True
+        self.preview.verticalScrollBar().setValue(int(top + fraction * (bottom - top)) - anchor)
+        self._syncing_scroll = False
+
+    @Slot()
+    def sync_editor_to_preview(self):
+        """Scrolls the editor so its top line is the source of the top of the preview."""
+        if self._syncing_scroll or not self.preview_patcher.block_count():
+            return
+        index = self.preview_patcher.find_block(self.preview.cursorForPosition(QPoint(0, 0)).position())
+        if not 0 <= index < len(self.source_map):
+            return
+        top, bottom = self._preview_block_span(index)
+        fraction = min(1.0, max(0.0, (self.preview.verticalScrollBar().value() - top) / max(1, bottom - top)))
+        line = self.source_map.line_at_block(index, fraction)
+
+        document = self.editor.document()
+        number = min(int(line), document.blockCount() - 1)
+        block = document.findBlockByNumber(number)
+        self._syncing_scroll = True
+        self.editor.verticalScrollBar().setValue(block.firstLineNumber() + int((line - number) * block.lineCount()))
+        self._syncing_scroll = False
+
+    def _preview_block_span(self, index: int) -> tuple:
+        """
+        Finds the vertical extent of a rendered block in the preview document.
+
+        Args:
+            index (int): the index of the rendered block.
+
+        Returns:
+            tuple[int, int]: the top of the block and the top of the next one (or the bottom
+                of the document), in document coordinates.
+        """
+        scroll = self.preview.verticalScrollBar().value()
+        cursor = QTextCursor(self.preview.document())
+        cursor.setPosition(self.preview_patcher.block_range(index)[0])
+        top = self.preview.cursorRect(cursor).top() + scroll
+        if index + 1 < self.preview_patcher.block_count():
+            cursor.setPosition(self.preview_patcher.block_range(index + 1)[0])
+            bottom = self.preview.cursorRect(cursor).top() + scroll
+        else:
+            bottom = int(self.preview.document().size().height())
+        return top, max(top, bottom)
+
+    def release_preview(self) -> None:
+        """
+        Empties the preview document to free its memory, while the document is not on screen.
+
+        The rendered HTML stays in the cache of the renderer, so restore_preview()
+        does not convert the Markdown again.
+        """
+        if self.preview_released:
+            return
+        self.preview_released = True
+        self.fill_timer.stop()
+        self.restyle_timer.stop()
+        self._fill_blocks = None
+        self.preview_patcher.clear()
+
+    def restore_preview(self) -> None:
+        """Fills again a preview emptied by release_preview()."""
+        if not self.preview_released:
+            return
+        self.preview_released = False
+        self.preview_scheduler.render_now()
+
+    def preview_memory(self) -> int:
+        """
+        Returns:
+            int: an estimate of the memory used by the preview document, in bytes.
+        """
+        return self.preview_patcher.memory_size()
+
+    @Slot()
+    def apply_theme(self):
+        """
+        Restyles the preview with the current theme, without rendering the Markdown again.
+
+        The HTML of the preview blocks carries no style, so the new theme only needs
+        them to be inserted again: the visible blocks are restyled at once and the
+        others while the application is idle, a few at a time.
+        """
+        self._set_preview_style(get_css_style())
+
+    def _set_preview_style(self, css_style: str) -> None:
+        """
+        Gives the preview a new style sheet, restyling the visible blocks at once.
+
+        Args:
+            css_style (str): the content of the CSS file.
+        """
+        if css_style == self.preview_patcher.style_sheet:
+            return
+        self.preview_patcher.set_style_sheet(css_style)
+        background = self.preview_patcher.body_background
+        if background.style() == Qt.BrushStyle.NoBrush:
+            self.preview.setStyleSheet("")
+        else:
+            self.preview.setStyleSheet(f"QTextEdit {{ background-color: {background.color().name()}; }}")
+        self._restyle_visible_preview_blocks()
+        if self.preview_patcher.unstyled_count():
+            self.restyle_timer.start(0)
+
+    def _restyle_visible_preview_blocks(self) -> None:
+        """Restyles the preview blocks on screen, and a few around them."""
+        viewport = self.preview.viewport()
+        first = self.preview_patcher.find_block(self.preview.cursorForPosition(QPoint(0, 0)).position())
+        last = self.preview_patcher.find_block(
+            self.preview.cursorForPosition(QPoint(viewport.width(), viewport.height())).position()
         )
-        
-        styled_html = f"""
-        <html>
-        <head>
-            <style>
-                {get_css_style()}
-            </style>
-        </head>
-        <body>
-            {html_content}
-        </body>
-        </html>
-        """
-        self.preview.setHtml(styled_html)
-        self.save_status.setText("texto atualizado")
+        if first >= 0:
+            self.preview_patcher.restyle(first - self.RESTYLE_MARGIN, last + 1 + self.RESTYLE_MARGIN)
+
+    @Slot()
+    def _restyle_next_preview_blocks(self):
+        """
+        Restyles the preview blocks left with the previous theme, for RESTYLE_SLICE_MS.
 
-        cursor = self.preview.textCursor()
-        cursor.movePosition(QTextCursor.MoveOperation.End) 
-        self.preview.setTextCursor(cursor)
\ No newline at end of file
+        The visible blocks go first, in case the preview was scrolled. The blocks
+        above the screen change height when restyled, so the preview is scrolled by
+        the same amount to keep the same text on screen.
+        """
+        self._restyle_visible_preview_blocks()
+        deadline = time.perf_counter() + self.RESTYLE_SLICE_MS / 1000
+        scroll_bar = self.preview.verticalScrollBar()
+        while self.preview_patcher.unstyled_count() and time.perf_counter() < deadline:
+            anchor = self.preview.cursorForPosition(QPoint(0, 0))
+            anchor_index = self.preview_patcher.find_block(anchor.position())
+            offset = anchor.position() - self.preview_patcher.block_range(anchor_index)[0]
+            top = self.preview.cursorRect(anchor).top()
+
+            self.preview_patcher.restyle(limit=self.RESTYLE_STEP)
+
+            anchor.setPosition(self.preview_patcher.block_range(anchor_index)[0] + offset)
+            scroll_bar.setValue(scroll_bar.value() + self.preview.cursorRect(anchor).top() - top)
+        if not self.preview_patcher.unstyled_count():
+            self.restyle_timer.stop()
+
+    @Slot(str)
+    def show_preview_error(self, message: str):
+        """
+        Reports a failed render in the status label, keeping the last preview.
+
+        Args:
+            message (str): the error message of the render.
+        """
+        self.save_status.setText(f"falha ao atualizar: {message}")
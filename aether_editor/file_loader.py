@@ -0,0 +1,274 @@
+"""
+Module containing the chunked loader of Markdown files.
+
+Large files are read and decoded in chunks by a QThreadPool worker and inserted
+little by little in a new QTextDocument on the GUI thread, so opening a file of
+hundreds of megabytes never freezes the window. The document only replaces the
+one in the editor when the load finishes, which keeps the syntax highlighting
+and the preview out of the way until then and makes cancellation free: the
+partial document is simply discarded.
+
+The reader waits for the GUI thread to consume its chunks before decoding new
+ones, so besides the document itself, only a couple of chunks are in memory.
+
+Example:
+    loader = MarkdownFileLoader(parent=self)
+    loader.progress.connect(progress_bar.setValue)
+    loader.finished.connect(self.editor.set_loaded_document)
+    loader.load(filename)
+"""
+import codecs
+import io
+import mmap
+import os
+import threading
+
+from PySide6.QtCore import (
+    QObject,
+    QRunnable,
+    QThreadPool,
+    Signal,
+    Slot
+)
+from PySide6.QtGui import (
+    QTextCursor,
+    QTextDocument
+)
+from PySide6.QtWidgets import QPlainTextDocumentLayout
+
+from .instrumentation import span
+
+CHUNK_SIZE = 1024 * 1024
+MAX_PENDING_CHUNKS = 2
+
+
+class FileReadSignals(QObject):
+    """
+    Signals emitted by a ChunkedFileReader, delivered in the thread of the receiver.
+
+    Attributes:
+        chunk_ready (Signal(object, int)): decoded text of a chunk and number of bytes read so far.
+        finished (Signal()): the whole file was read.
+        failed (Signal(str)): error message of a failed read.
+    """
+    chunk_ready = Signal(object, int)
+    finished = Signal()
+    failed = Signal(str)
+
+
+class ChunkedFileReader(QRunnable):
+    """
+    Worker that reads and decodes a text file in chunks.
+
+    Line endings are translated to '\\n' like in text mode, including '\\r\\n'
+    pairs split between two chunks. The reader blocks when MAX_PENDING_CHUNKS
+    chunks were emitted and not yet released by the consumer.
+
+    Attributes:
+        filename (str): the path of the file.
+        encoding (str): the text encoding of the file.
+        use_mmap (bool): maps the file in memory instead of reading it with read().
+        signals (FileReadSignals): signals used to report the chunks and the result.
+    """
+    def __init__(self, filename: str, encoding: str = "utf-8", use_mmap: bool = False):
+        super().__init__()
+        self.filename = filename
+        self.encoding = encoding
+        self.use_mmap = use_mmap
+        self.signals = FileReadSignals()
+        self._pending_chunks = threading.Semaphore(MAX_PENDING_CHUNKS)
+        self._canceled = threading.Event()
+
+    def cancel(self) -> None:
+        """Asks the reader to stop as soon as possible."""
+        self._canceled.set()
+        self._pending_chunks.release()
+
+    def release_chunk(self) -> None:
+        """Informs the reader that a chunk was consumed, allowing it to decode another one."""
+        self._pending_chunks.release()
+
+    def run(self):
+        """Reads the file, emitting each decoded chunk."""
+        try:
+            decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(self.encoding)(), translate=True)
+            bytes_read = 0
+            for data in self._read_chunks():
+                bytes_read += len(data)
+                with span("file decode"):
+                    text = decoder.decode(data)
+                if not self._emit_chunk(text, bytes_read):
+                    return
+            text = decoder.decode(b"", final=True)
+            if text and not self._emit_chunk(text, bytes_read):
+                return
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit()
+
+    def _read_chunks(self):
+        """
+        Yields the raw content of the file in chunks of CHUNK_SIZE bytes.
+
+        Yields:
+            bytes: the next chunk of the file.
+        """
+        with open(self.filename, "rb") as file:
+            if self.use_mmap and os.fstat(file.fileno()).st_size > 0:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    for offset in range(0, len(mapped), CHUNK_SIZE):
+                        with span("file read"):
+                            data = mapped[offset:offset + CHUNK_SIZE]
+                        yield data
+                return
+
+            while True:
+                with span("file read"):
+                    data = file.read(CHUNK_SIZE)
+                if not data:
+                    return
+                yield data
+
+    def _emit_chunk(self, text: str, bytes_read: int) -> bool:
+        """
+        Waits for room in the pending chunks and emits a decoded chunk.
+
+        Args:
+            text (str): the decoded text.
+            bytes_read (int): the number of bytes read so far.
+
+        Returns:
+            bool: False if the read was canceled.
+        """
+        self._pending_chunks.acquire()
+        if self._canceled.is_set():
+            return False
+        self.signals.chunk_ready.emit(text, bytes_read)
+        return True
+
+
+class MarkdownFileLoader(QObject):
+    """
+    Loads a file into a new QTextDocument in chunks, reporting the progress.
+
+    Only one load runs at a time; starting a new one cancels the previous.
+
+    Attributes:
+        progress (Signal(int)): percentage of the file already inserted in the document.
+        finished (Signal(QTextDocument, str)): the loaded document and the file name.
+        failed (Signal(str, str)): the file name and the error message.
+        canceled (Signal(str)): the file name of a canceled load.
+    """
+    progress = Signal(int)
+    finished = Signal(QTextDocument, str)
+    failed = Signal(str, str)
+    canceled = Signal(str)
+
+    def __init__(self, parent: QObject = None, thread_pool: QThreadPool = None, use_mmap: bool = False):
+        """
+        Initializes the loader.
+
+        Args:
+            parent (QObject): the parent object.
+            thread_pool (QThreadPool): the pool that runs the readers, the global pool by default.
+            use_mmap (bool): maps the files in memory instead of reading them with read().
+        """
+        super().__init__(parent)
+        self.thread_pool = thread_pool or QThreadPool.globalInstance()
+        self.use_mmap = use_mmap
+        self._reader = None
+        self._document = None
+        self._cursor = None
+        self._filename = None
+        self._size = 0
+
+    def is_loading(self) -> bool:
+        """
+        Returns:
+            bool: True while a file is being loaded.
+        """
+        return self._reader is not None
+
+    def load(self, filename: str) -> None:
+        """
+        Starts loading a file, canceling the current load if there is one.
+
+        Args:
+            filename (str): the path of the file.
+        """
+        self.cancel()
+        self._filename = filename
+        self._size = max(1, os.path.getsize(filename))
+
+        self._document = QTextDocument()
+        self._document.setDocumentLayout(QPlainTextDocumentLayout(self._document))
+        # the undo history would keep a copy of every inserted chunk.
+        self._document.setUndoRedoEnabled(False)
+        self._cursor = QTextCursor(self._document)
+
+        self._reader = ChunkedFileReader(filename, use_mmap=self.use_mmap)
+        self._reader.signals.chunk_ready.connect(self._insert_chunk)
+        self._reader.signals.finished.connect(self._on_read_finished)
+        self._reader.signals.failed.connect(self._on_read_failed)
+        self.progress.emit(0)
+        self.thread_pool.start(self._reader)
+
+    @Slot()
+    def cancel(self) -> None:
+        """Stops the current load and discards the partial document."""
+        if self._reader is None:
+            return
+        filename = self._filename
+        self._reader.cancel()
+        self._discard()
+        self.canceled.emit(filename)
+
+    @Slot(object, int)
+    def _insert_chunk(self, text: str, bytes_read: int):
+        """
+        Appends a decoded chunk to the document being loaded.
+
+        Args:
+            text (str): the decoded text.
+            bytes_read (int): the number of bytes read so far.
+        """
+        if self._reader is None or self.sender() is not self._reader.signals:
+            return
+        with span("file insert"):
+            self._cursor.insertText(text)
+        self._reader.release_chunk()
+        self.progress.emit(min(100, bytes_read * 100 // self._size))
+
+    @Slot()
+    def _on_read_finished(self):
+        """Hands the loaded document over, with undo enabled and marked as unmodified."""
+        if self._reader is None or self.sender() is not self._reader.signals:
+            return
+        document, filename = self._document, self._filename
+        self._discard()
+        document.setUndoRedoEnabled(True)
+        document.setModified(False)
+        self.progress.emit(100)
+        self.finished.emit(document, filename)
+
+    @Slot(str)
+    def _on_read_failed(self, message: str):
+        """
+        Discards the partial document and reports the error.
+
+        Args:
+            message (str): the error message.
+        """
+        if self._reader is None or self.sender() is not self._reader.signals:
+            return
+        filename = self._filename
+        self._discard()
+        self.failed.emit(filename, message)
+
+    def _discard(self) -> None:
+        """Forgets the state of the current load."""
+        self._reader = None
+        self._cursor = None
+        self._document = None
+        self._filename = None
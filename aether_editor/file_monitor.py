@@ -0,0 +1,337 @@
+"""
+Module containing the detection of changes made to the open file by other programs, and their reload.
+
+FileChangeMonitor watches the file with a QFileSystemWatcher (and its directory,
+since an atomic save replaces the file). When another program writes it, the
+new content is read in a QThreadPool worker and compared line by line with a
+snapshot of the editor, and only the changed hunks are applied to the document,
+as one undo step. The cost of a reload follows the size of the change: the
+undo history is kept, and the highlighter and the preview only process the
+changed blocks, as for any edit.
+
+Example:
+    monitor = FileChangeMonitor(parent=self)
+    monitor.changed.connect(lambda filename: monitor.reload(editor.document()))
+    monitor.watch(filename)
+"""
+import difflib
+import os
+
+from PySide6.QtCore import (
+    QFileSystemWatcher,
+    QObject,
+    QRunnable,
+    QThreadPool,
+    QTimer,
+    Signal,
+    Slot
+)
+from PySide6.QtGui import QTextCursor, QTextDocument
+from shiboken6 import isValid
+
+from .instrumentation import span
+
+
+def file_signature(filename: str) -> tuple:
+    """
+    Identifies a version of a file.
+
+    Args:
+        filename (str): the path of the file.
+
+    Returns:
+        tuple[int, int] or None: the modification time in nanoseconds and the size, None if the file does not exist.
+    """
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def diff_lines(old_lines: list, new_lines: list) -> list:
+    """
+    Finds the hunks that turn a list of lines into another.
+
+    The common prefix and suffix are skipped first, so a change in a large file
+    only compares the lines around it.
+
+    Args:
+        old_lines (list[str]): the current lines.
+        new_lines (list[str]): the new lines.
+
+    Returns:
+        list[tuple[int, int, list[str]]]: for each hunk, in order, the first line and the end
+            (exclusive) of the replaced range of old_lines, and the lines that replace it.
+    """
+    common = min(len(old_lines), len(new_lines))
+    prefix = 0
+    while prefix < common and old_lines[prefix] == new_lines[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < common - prefix and old_lines[-1 - suffix] == new_lines[-1 - suffix]:
+        suffix += 1
+
+    old_middle = old_lines[prefix:len(old_lines) - suffix]
+    new_middle = new_lines[prefix:len(new_lines) - suffix]
+    if not old_middle or not new_middle:
+        return [(prefix, prefix + len(old_middle), new_middle)] if old_middle or new_middle else []
+    matcher = difflib.SequenceMatcher(None, old_middle, new_middle)
+    return [
+        (prefix + old_start, prefix + old_end, new_middle[new_start:new_end])
+        for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+
+def apply_line_hunks(document: QTextDocument, hunks: list) -> None:
+    """
+    Replaces ranges of lines of a document, as a single undo step.
+
+    The hunks are applied from the last one, so the line numbers of the others
+    stay valid; each one is a cursor edit of its own lines.
+
+    Args:
+        document (QTextDocument): the document, whose lines are the old lines of the hunks.
+        hunks (list[tuple[int, int, list[str]]]): the hunks found by diff_lines.
+    """
+    cursor = QTextCursor(document)
+    cursor.beginEditBlock()
+    line_count = document.blockCount()
+    for start, end, lines in reversed(hunks):
+        end_of_text = document.characterCount() - 1
+        if end < line_count:
+            first = document.findBlockByNumber(start).position()
+            last = document.findBlockByNumber(end).position()
+            text = "".join(line + "\n" for line in lines)
+        elif lines:
+            # the hunk reaches the last line, which has no line break after it.
+            first = document.findBlockByNumber(start).position() if start < line_count else end_of_text
+            last = end_of_text
+            text = "\n".join(lines) if start < line_count else "".join("\n" + line for line in lines)
+        elif start > 0:
+            # the last lines are removed with the line break before them.
+            previous = document.findBlockByNumber(start - 1)
+            first, last, text = previous.position() + previous.length() - 1, end_of_text, ""
+        else:
+            first, last, text = 0, end_of_text, ""
+        cursor.setPosition(first)
+        cursor.setPosition(last, QTextCursor.MoveMode.KeepAnchor)
+        cursor.insertText(text)
+    cursor.endEditBlock()
+
+
+class FileDiffSignals(QObject):
+    """
+    Signals emitted by a FileDiffTask, delivered in the thread of the receiver.
+
+    Attributes:
+        finished (Signal(object, object)): the hunks and the signature of the version of the file that was read.
+        failed (Signal(str)): error message of a failed read.
+    """
+    finished = Signal(object, object)
+    failed = Signal(str)
+
+
+class FileDiffTask(QRunnable):
+    """
+    Worker that reads a file and finds the hunks that turn a text into its content.
+
+    Attributes:
+        filename (str): the path of the file.
+        text (str): the snapshot of the document.
+        encoding (str): the text encoding of the file.
+        signals (FileDiffSignals): signals used to report the result.
+    """
+    def __init__(self, filename: str, text: str, encoding: str = "utf-8"):
+        super().__init__()
+        self.filename = filename
+        self.text = text
+        self.encoding = encoding
+        self.signals = FileDiffSignals()
+
+    def run(self):
+        """Reads the file and compares it with the snapshot, emitting the hunks (or the error)."""
+        try:
+            # the signature is taken first: a write during the read is noticed as a new change.
+            signature = file_signature(self.filename)
+            # line breaks are translated to \n, as by the file loader.
+            with span("file read"), open(self.filename, encoding=self.encoding) as file:
+                new_text = file.read()
+            with span("file diff"):
+                hunks = diff_lines(self.text.split("\n"), new_text.split("\n"))
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(hunks, signature)
+
+
+class FileChangeMonitor(QObject):
+    """
+    Watches the file of a document and reloads the changes made by other programs.
+
+    The notifications of a write are grouped by check_timer, and a version of the
+    file is reported once by changed. The versions written by the editor itself
+    are marked as known by watch(), after each load and save, and not reported.
+
+    Attributes:
+        changed (Signal(str)): the file name, when another program modified the file.
+        reloaded (Signal(str, int)): the file name and the number of changed hunks of a finished reload.
+        failed (Signal(str, str)): the file name and the error message of a failed reload.
+        filename (str or None): the watched file.
+        watcher (QFileSystemWatcher): watches the file and its directory.
+        check_timer (QTimer): single shot timer that compares the file with the known version once the writes pause.
+    """
+    changed = Signal(str)
+    reloaded = Signal(str, int)
+    failed = Signal(str, str)
+
+    CHECK_DELAY_MS = 100
+
+    def __init__(self, parent: QObject = None, thread_pool: QThreadPool = None):
+        """
+        Initializes a monitor that watches no file.
+
+        Args:
+            parent (QObject): the parent object.
+            thread_pool (QThreadPool): the pool that reads the modified files, the global pool by default.
+        """
+        super().__init__(parent)
+        self.thread_pool = thread_pool or QThreadPool.globalInstance()
+        self.filename = None
+        self._known = None
+        self._reported = None
+        self._task = None
+        self._document = None
+        self._revision = None
+        self._reload_again = False
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self._on_path_changed)
+        self.watcher.directoryChanged.connect(self._on_path_changed)
+        self.check_timer = QTimer(self)
+        self.check_timer.setSingleShot(True)
+        self.check_timer.setInterval(self.CHECK_DELAY_MS)
+        self.check_timer.timeout.connect(self._check)
+
+    def watch(self, filename: str) -> None:
+        """
+        Watches a file, whose current version is known (just loaded or saved by the editor).
+
+        Args:
+            filename (str): the path of the file.
+        """
+        filename = os.path.abspath(filename)
+        if filename != self.filename:
+            self.unwatch()
+            self.filename = filename
+            self.watcher.addPath(os.path.dirname(filename))
+        if filename not in self.watcher.files() and os.path.exists(filename):
+            self.watcher.addPath(filename)
+        self.ignore_current_version()
+
+    def unwatch(self) -> None:
+        """Stops watching the file, and drops the reload in progress."""
+        paths = self.watcher.files() + self.watcher.directories()
+        if paths:
+            self.watcher.removePaths(paths)
+        self.filename = None
+        self._task = None
+        self._reload_again = False
+        self.check_timer.stop()
+
+    def ignore_current_version(self) -> None:
+        """Marks the current version of the file as known, so it is not reported or reloaded."""
+        if self.filename is not None:
+            self._known = self._reported = file_signature(self.filename)
+
+    def is_reloading(self) -> bool:
+        """
+        Returns:
+            bool: True while the modified file is read and compared.
+        """
+        return self._task is not None
+
+    def reload(self, document: QTextDocument) -> None:
+        """
+        Applies the changes of the file to a document, in the background.
+
+        Args:
+            document (QTextDocument): the document of the file.
+        """
+        self._document = document
+        if self._task is not None:
+            self._reload_again = True
+            return
+        self._revision = document.revision()
+        task = FileDiffTask(self.filename, document.toPlainText())
+        task.signals.finished.connect(self._on_diff_finished)
+        task.signals.failed.connect(self._on_diff_failed)
+        self._task = task
+        self.thread_pool.start(task)
+
+    @Slot(str)
+    def _on_path_changed(self, path: str):
+        """
+        Schedules a check of the file, watching it again if it was replaced.
+
+        Args:
+            path (str): the modified file or directory.
+        """
+        if self.filename is None:
+            return
+        # an atomic save renames another file over the watched one, which stops being watched.
+        if self.filename not in self.watcher.files() and os.path.exists(self.filename):
+            self.watcher.addPath(self.filename)
+        self.check_timer.start()
+
+    @Slot()
+    def _check(self):
+        """Reports the file once if its version is not the known one."""
+        if self.filename is None:
+            return
+        signature = file_signature(self.filename)
+        # a removed file keeps the text of the editor, until a new version is written.
+        if signature is None or signature == self._known or signature == self._reported:
+            return
+        self._reported = signature
+        self.changed.emit(self.filename)
+
+    @Slot(object, object)
+    def _on_diff_finished(self, hunks: list, signature: tuple):
+        """
+        Applies the hunks found in the background, unless the document changed meanwhile.
+
+        Args:
+            hunks (list[tuple[int, int, list[str]]]): the changed hunks.
+            signature (tuple[int, int] or None): the version of the file that was read.
+        """
+        if self._task is None or self.sender() is not self._task.signals:
+            return
+        self._task = None
+        document = self._document
+        if not isValid(document):
+            return
+        if self._reload_again or document.revision() != self._revision:
+            # the hunks were found for an older text.
+            self._reload_again = False
+            self.reload(document)
+            return
+        with span("file reload"):
+            apply_line_hunks(document, hunks)
+        document.setModified(False)
+        self._known = self._reported = signature
+        self.reloaded.emit(self.filename, len(hunks))
+
+    @Slot(str)
+    def _on_diff_failed(self, message: str):
+        """
+        Reports a failed reload.
+
+        Args:
+            message (str): the error message.
+        """
+        if self._task is None or self.sender() is not self._task.signals:
+            return
+        self._task = None
+        self._reload_again = False
+        self.failed.emit(self.filename, message)
@@ -0,0 +1,240 @@
+"""
+Module containing the background, atomic saving of Markdown files.
+
+The text of the document is copied on the GUI thread, which is cheap, and
+encoded and written by a QThreadPool worker, so saving a large file never
+stalls typing. The worker writes to a temporary file in the same directory and
+renames it over the destination with os.replace(), optionally after an fsync,
+so a crash in the middle of a save leaves either the old or the new file on
+disk, never a truncated one.
+
+Saves of an unmodified document to the file it came from are skipped, and the
+document is only marked as unmodified when no edit happened while it was being
+written.
+
+Example:
+    saver = MarkdownFileSaver(parent=self)
+    saver.saved.connect(lambda filename: status.setText("salvo"))
+    saver.save(editor.document(), filename)
+"""
+import os
+import tempfile
+
+from PySide6.QtCore import (
+    QObject,
+    QRunnable,
+    QThreadPool,
+    Signal,
+    Slot
+)
+from PySide6.QtGui import QTextDocument
+from shiboken6 import isValid
+
+from .instrumentation import traced
+
+
+def _read_umask() -> int:
+    """
+    Returns:
+        int: the umask of the process, which can only be read by setting it.
+    """
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# read once, when the module is imported on the GUI thread: setting it from a worker would
+# briefly give the files created by the other threads the permissions of a umask of 0.
+PROCESS_UMASK = _read_umask()
+
+
+@traced("file write")
+def atomic_write_text(filename: str, text: str, encoding: str = "utf-8", fsync: bool = True) -> None:
+    """
+    Writes a text file atomically: a temporary file is written and renamed over it.
+
+    The permissions of an existing file are kept, and a symbolic link is kept
+    pointing to the file it links to, which is the one replaced. On failure the
+    temporary file is removed and the destination is left untouched.
+
+    Args:
+        filename (str): the path of the file.
+        text (str): the content of the file.
+        encoding (str): the text encoding.
+        fsync (bool): flushes the file (and the directory entry) to the disk before returning.
+    """
+    filename = os.path.realpath(filename)
+    directory = os.path.dirname(filename)
+    fd, temp_name = tempfile.mkstemp(prefix=f".{os.path.basename(filename)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding=encoding) as file:
+            file.write(text)
+            file.flush()
+            if fsync:
+                os.fsync(file.fileno())
+        try:
+            os.chmod(temp_name, os.stat(filename).st_mode & 0o7777)
+        except FileNotFoundError:
+            # new files get the permissions they would get from open(), not the private ones of mkstemp.
+            os.chmod(temp_name, 0o666 & ~PROCESS_UMASK)
+        os.replace(temp_name, filename)
+    except BaseException:
+        try:
+            os.remove(temp_name)
+        except OSError:
+            pass
+        raise
+
+    if fsync and hasattr(os, "O_DIRECTORY"):
+        directory_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(directory_fd)
+        finally:
+            os.close(directory_fd)
+
+
+class FileWriteSignals(QObject):
+    """
+    Signals emitted by a FileWriteTask, delivered in the thread of the receiver.
+
+    Attributes:
+        finished (Signal()): the file was written.
+        failed (Signal(str)): error message of a failed write.
+    """
+    finished = Signal()
+    failed = Signal(str)
+
+
+class FileWriteTask(QRunnable):
+    """
+    Worker that writes a snapshot of the text with atomic_write_text().
+
+    Attributes:
+        filename (str): the path of the file.
+        text (str): snapshot of the text taken on the GUI thread.
+        fsync (bool): flushes the file to the disk before the rename.
+        signals (FileWriteSignals): signals used to report the result.
+    """
+    def __init__(self, filename: str, text: str, fsync: bool = True):
+        super().__init__()
+        self.filename = filename
+        self.text = text
+        self.fsync = fsync
+        self.signals = FileWriteSignals()
+
+    def run(self):
+        """Writes the file and emits the result (or the error)."""
+        try:
+            atomic_write_text(self.filename, self.text, fsync=self.fsync)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit()
+
+
+class MarkdownFileSaver(QObject):
+    """
+    Saves documents in the background, one write at a time.
+
+    A save requested while another one is running waits for it and replaces any
+    save that was already waiting, so the writes reach the disk in order and only
+    the most recent snapshot is written.
+
+    Attributes:
+        saved (Signal(str)): the file name of a finished save.
+        failed (Signal(str, str)): the file name and the error message of a failed save.
+        skipped (Signal(str)): the file name of a save skipped because nothing changed.
+        fsync (bool): flushes every file to the disk before renaming it.
+    """
+    saved = Signal(str)
+    failed = Signal(str, str)
+    skipped = Signal(str)
+
+    def __init__(self, parent: QObject = None, thread_pool: QThreadPool = None, fsync: bool = True):
+        """
+        Initializes the saver.
+
+        Args:
+            parent (QObject): the parent object.
+            thread_pool (QThreadPool): the pool that runs the writes, the global pool by default.
+            fsync (bool): flushes every file to the disk before renaming it.
+        """
+        super().__init__(parent)
+        self.thread_pool = thread_pool or QThreadPool.globalInstance()
+        self.fsync = fsync
+        self._in_flight = None
+        self._pending = None
+
+    def is_saving(self) -> bool:
+        """
+        Returns:
+            bool: True while a save is running or waiting.
+        """
+        return self._in_flight is not None
+
+    def save(self, document: QTextDocument, filename: str, last_filename: str = None) -> bool:
+        """
+        Saves the text of a document, unless it is unmodified and already in that file.
+
+        Args:
+            document (QTextDocument): the document to save.
+            filename (str): the path of the file.
+            last_filename (str or None): the file the document was loaded from or last saved to.
+
+        Returns:
+            bool: False if the save was skipped.
+        """
+        if filename == last_filename and not document.isModified() and not self.is_saving():
+            self.skipped.emit(filename)
+            return False
+
+        request = (document, document.revision(), filename, document.toPlainText())
+        if self._in_flight is not None:
+            self._pending = request
+        else:
+            self._start(request)
+        return True
+
+    def _start(self, request: tuple) -> None:
+        """
+        Sends a save request to the pool.
+
+        Args:
+            request (tuple): the document, its revision, the file name and the text snapshot.
+        """
+        document, revision, filename, text = request
+        task = FileWriteTask(filename, text, self.fsync)
+        task.signals.finished.connect(self._on_write_finished)
+        task.signals.failed.connect(self._on_write_failed)
+        self._in_flight = (task, document, revision, filename)
+        self.thread_pool.start(task)
+
+    @Slot()
+    def _on_write_finished(self):
+        """Marks the document as unmodified if it was not edited during the write."""
+        _, document, revision, filename = self._in_flight
+        superseded = self._pending is not None
+        self._start_pending()
+        # the document may have been replaced (and deleted) by a file opened meanwhile.
+        if not superseded and isValid(document) and document.revision() == revision:
+            document.setModified(False)
+        self.saved.emit(filename)
+
+    @Slot(str)
+    def _on_write_failed(self, message: str):
+        """
+        Reports the error of a failed write.
+
+        Args:
+            message (str): the error message.
+        """
+        _, _, _, filename = self._in_flight
+        self._start_pending()
+        self.failed.emit(filename, message)
+
+    def _start_pending(self) -> None:
+        """Starts the save waiting for the finished one, if there is one."""
+        self._in_flight = None
+        if self._pending is not None:
+            request, self._pending = self._pending, None
+            self._start(request)
@@ -0,0 +1,226 @@
+"""
+Module containing the FindBar class, the find and replace bar of the editor.
+
+The bar only drives the TextSearch of the editor: the query is searched in the
+background as it is typed (after QUERY_DELAY_MS without typing), the number of
+matches grows while the search goes on, and the editor highlights the matches in
+view. Replacing every match is a single undo step.
+
+Example:
+    find_bar = FindBar(editor)
+    layout.addWidget(find_bar)
+    find_bar.open_bar()
+"""
+from PySide6.QtCore import Qt, QTimer, Slot
+from PySide6.QtGui import QKeyEvent, QTextCursor
+from PySide6.QtWidgets import (
+    QCheckBox,
+    QHBoxLayout,
+    QLabel,
+    QLineEdit,
+    QPushButton,
+    QSizePolicy,
+    QWidget
+)
+
+from .code_editor import CodeEditor
+
+
+class FindBar(QWidget):
+    """
+    Find and replace bar, hidden until opened (Ctrl+F).
+
+    Enter goes to the next match and Shift+Enter to the previous one; in the
+    replace field, Enter replaces the selected match. Escape closes the bar.
+
+    Attributes:
+        editor (CodeEditor): the searched editor.
+        find_field (QLineEdit): the text or the regular expression to find.
+        replace_field (QLineEdit): the replacement, with the groups of a regular expression (\\1, \\g<name>).
+        regex_box (QCheckBox): the query is a regular expression.
+        case_box (QCheckBox): upper and lower case letters are different.
+        status (QLabel): the number of matches or the error of the query.
+        query_timer (QTimer): single shot timer that searches the query once the typing pauses.
+    """
+    QUERY_DELAY_MS = 150
+
+    def __init__(self, editor: CodeEditor, parent: QWidget = None):
+        """
+        Initializes the hidden bar.
+
+        Args:
+            editor (CodeEditor): the searched editor.
+            parent (QWidget): the parent widget.
+        """
+        super().__init__(parent)
+        self.editor = editor
+        self.find_field = QLineEdit()
+        self.find_field.setPlaceholderText("Buscar")
+        self.replace_field = QLineEdit()
+        self.replace_field.setPlaceholderText("Substituir por")
+        self.regex_box = QCheckBox("Regex")
+        self.case_box = QCheckBox("Aa")
+        self.case_box.setToolTip("Diferenciar maiúsculas de minúsculas")
+        self.status = QLabel()
+        # a label of fixed size does not lay the window out again each time the count changes.
+        self.status.setFixedSize(self.status.fontMetrics().horizontalAdvance("buscando... 0000000") + 8, self.status.sizeHint().height())
+
+        layout = QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.find_field)
+        layout.addWidget(self.regex_box)
+        layout.addWidget(self.case_box)
+        layout.addWidget(self._button("↑", "Anterior (Shift+Enter)", self.find_previous))
+        layout.addWidget(self._button("↓", "Próximo (Enter)", self.find_next))
+        layout.addWidget(self.replace_field)
+        layout.addWidget(self._button("Substituir", "Substituir o resultado selecionado", self.replace_current))
+        layout.addWidget(self._button("Substituir tudo", "Substituir todos os resultados", self.replace_all))
+        layout.addWidget(self.status)
+        layout.addWidget(self._button("✕", "Fechar (Esc)", self.close_bar))
+        # showing the bar must not widen the editor column, which would lay out the editor and the preview again.
+        self.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Fixed)
+
+        self.query_timer = QTimer(self)
+        self.query_timer.setSingleShot(True)
+        self.query_timer.setInterval(self.QUERY_DELAY_MS)
+        self.query_timer.timeout.connect(self.run_search)
+        self.find_field.textChanged.connect(self.query_timer.start)
+        self.regex_box.toggled.connect(self.run_search)
+        self.case_box.toggled.connect(self.run_search)
+        self.editor.search.changed.connect(self.show_count)
+        self.editor.search.failed.connect(self.show_error)
+        self.hide()
+
+    def _button(self, text: str, tooltip: str, function) -> QPushButton:
+        """
+        Creates a flat button of the bar.
+
+        Args:
+            text (str): the text of the button.
+            tooltip (str): the description of the action.
+            function (Callable[..., Any]): the slot executed when the button is clicked.
+
+        Returns:
+            QPushButton: the button.
+        """
+        button = QPushButton(text)
+        button.setToolTip(tooltip)
+        button.setFlat(True)
+        button.clicked.connect(function)
+        return button
+
+    @Slot()
+    def open_bar(self) -> None:
+        """Shows the bar with the selected text as the query, and searches it."""
+        selected = self.editor.textCursor().selectedText()
+        if selected and "\u2029" not in selected:
+            self.find_field.setText(selected)
+        self.show()
+        self.find_field.selectAll()
+        self.find_field.setFocus()
+        self.run_search()
+
+    @Slot()
+    def close_bar(self) -> None:
+        """Hides the bar and clears the highlighted matches."""
+        self.query_timer.stop()
+        self.editor.search.clear()
+        self.hide()
+        self.editor.setFocus()
+
+    @Slot()
+    def run_search(self) -> None:
+        """Searches the query of the find field in the whole document."""
+        self.query_timer.stop()
+        if self.isVisible():
+            self.editor.search.search(self.find_field.text(), self.regex_box.isChecked(), self.case_box.isChecked())
+
+    @Slot()
+    def show_count(self) -> None:
+        """Shows the number of matches found so far."""
+        if self.editor.search.pattern is None:
+            return
+        count = len(self.editor.search)
+        self.status.setToolTip("")
+        if self.editor.search.is_searching():
+            self.status.setText(f"buscando... {count}")
+        else:
+            self.status.setText("1 resultado" if count == 1 else f"{count} resultados")
+
+    @Slot(str)
+    def show_error(self, message: str) -> None:
+        """
+        Shows why the regular expression is invalid.
+
+        Args:
+            message (str): the error of the re module.
+        """
+        self.status.setText("expressão inválida")
+        self.status.setToolTip(message)
+
+    @Slot()
+    def find_next(self) -> None:
+        """Selects the match after the selection."""
+        self._select(self.editor.search.next_match(self.editor.textCursor().selectionEnd()))
+
+    @Slot()
+    def find_previous(self) -> None:
+        """Selects the match before the selection."""
+        self._select(self.editor.search.previous_match(self.editor.textCursor().selectionStart()))
+
+    @Slot()
+    def replace_current(self) -> None:
+        """Replaces the selected match, if the selection is one, and selects the next match."""
+        if self.query_timer.isActive():
+            self.run_search()
+        if self.editor.search.pattern is None:
+            return
+        cursor = self.editor.textCursor()
+        if cursor.hasSelection():
+            replacement = self.editor.search.replacement(cursor.selectionStart(), cursor.selectionEnd(), self.replace_field.text())
+            if replacement is not None:
+                cursor.insertText(replacement)
+                self.editor.setTextCursor(cursor)
+        self.find_next()
+
+    @Slot()
+    def replace_all(self) -> None:
+        """Replaces every match of the query, as a single undo step."""
+        if self.query_timer.isActive():
+            self.run_search()
+        count = self.editor.search.replace_all(self.replace_field.text())
+        self.status.setText("1 substituição" if count == 1 else f"{count} substituições")
+
+    def _select(self, match: tuple) -> None:
+        """
+        Selects a match in the editor and scrolls to it.
+
+        Args:
+            match (tuple[int, int] or None): the start and the end of the match.
+        """
+        if match is None:
+            return
+        cursor = QTextCursor(self.editor.document())
+        cursor.setPosition(match[0])
+        cursor.setPosition(match[1], QTextCursor.MoveMode.KeepAnchor)
+        self.editor.setTextCursor(cursor)
+        self.editor.ensureCursorVisible()
+
+    def keyPressEvent(self, event: QKeyEvent):
+        """
+        Handles Enter and Escape in the fields of the bar.
+
+        Args:
+            event (QKeyEvent): the key pressed.
+        """
+        if event.key() == Qt.Key.Key_Escape:
+            self.close_bar()
+        elif event.key() in (Qt.Key.Key_Return, Qt.Key.Key_Enter):
+            if self.replace_field.hasFocus():
+                self.replace_current()
+            elif event.modifiers() & Qt.KeyboardModifier.ShiftModifier:
+                self.find_previous()
+            else:
+                self.find_next()
+        else:
+            super().keyPressEvent(event)
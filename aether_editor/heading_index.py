@@ -0,0 +1,160 @@
+"""
+Module containing the index of the headings of the editor document, kept up to date by the highlighter.
+
+The highlighter already scans every line it highlights and recognizes the
+headings (the HEADER span), so it reports each highlighted line to a
+HeadingIndex instead of the outline parsing the whole document again. Only
+the lines highlighted again after an edit change the index.
+
+Each heading is kept as a QTextCursor at the start of its line, in document
+order. Qt moves the cursors with the edits, so the lines inserted or removed
+above a heading cost nothing, and the index stays sorted by position: finding
+the heading of a line or the section around a position is a binary search.
+The highlighter goes down the document one line at a time, so the search
+first tries the answer of the previous one.
+The cursor of a removed heading falls into the line where the text was
+removed, which is always highlighted again and then corrected.
+
+Example:
+    index = HeadingIndex()
+    index.update_block(block, (2, "Instalação"))
+    section = index.section_at(editor.textCursor().position())
+"""
+from typing import NamedTuple
+
+from PySide6.QtCore import QObject, Signal
+from PySide6.QtGui import QTextBlock, QTextCursor
+
+
+class Heading(NamedTuple):
+    """
+    A heading of the document.
+
+    Attributes:
+        level (int): the number of '#' of the heading.
+        title (str): the text of the heading.
+        block_number (int): the number of the line of the heading.
+    """
+    level: int
+    title: str
+    block_number: int
+
+
+class HeadingIndex(QObject):
+    """
+    Headings of a document, sorted by position, updated one line at a time.
+
+    Attributes:
+        changed (Signal()): emitted when a heading is added, removed or renamed.
+    """
+    changed = Signal()
+
+    def __init__(self, parent: QObject = None):
+        super().__init__(parent)
+        self._cursors = []
+        self._levels = []
+        self._titles = []
+        # the result of the last search, which the next line usually shares.
+        self._hint = 0
+
+    def __len__(self) -> int:
+        return len(self._cursors)
+
+    def clear(self) -> None:
+        """Forgets every heading, as when the document is replaced."""
+        if self._cursors:
+            self._cursors, self._levels, self._titles = [], [], []
+            self._hint = 0
+            self.changed.emit()
+
+    def update_block(self, block: QTextBlock, heading: tuple) -> None:
+        """
+        Records what a highlighted line is: a heading or not.
+
+        Any other heading found inside the line (the cursor of a removed heading) is dropped.
+
+        Args:
+            block (QTextBlock): the highlighted line.
+            heading (tuple[int, str] or None): the level and the title, None if the line is not a heading.
+        """
+        start = block.position()
+        end = start + block.length()
+        first = self._lower_bound(start)
+        if first == len(self._cursors) or self._cursors[first].position() >= end:
+            last = first
+        else:
+            last = self._lower_bound(end)
+        if first == last and heading is None:
+            return
+
+        if first < last and heading is not None and last - first == 1 and self._cursors[first].position() == start:
+            if (self._levels[first], self._titles[first]) != heading:
+                self._levels[first], self._titles[first] = heading
+                self.changed.emit()
+            return
+
+        del self._cursors[first:last], self._levels[first:last], self._titles[first:last]
+        if heading is not None:
+            self._cursors.insert(first, QTextCursor(block))
+            self._levels.insert(first, heading[0])
+            self._titles.insert(first, heading[1])
+        self._hint = first + (heading is not None)
+        self.changed.emit()
+
+    def headings(self) -> list:
+        """
+        Returns:
+            list[Heading]: the headings, in document order.
+        """
+        return [
+            Heading(level, title, cursor.blockNumber())
+            for cursor, level, title in zip(self._cursors, self._levels, self._titles)
+        ]
+
+    def position(self, index: int) -> int:
+        """
+        Args:
+            index (int): the index of the heading.
+
+        Returns:
+            int: the position of the start of the heading line in the document.
+        """
+        return self._cursors[index].position()
+
+    def section_at(self, position: int) -> int:
+        """
+        Finds the section of a position: the last heading at or before it.
+
+        Args:
+            position (int): the position in the document.
+
+        Returns:
+            int: the index of the heading, -1 if the position comes before the first one.
+        """
+        return self._lower_bound(position + 1) - 1
+
+    def _lower_bound(self, position: int) -> int:
+        """
+        Finds the first heading at or after a position.
+
+        Args:
+            position (int): the position in the document.
+
+        Returns:
+            int: the index of the heading, len(self) if there is none.
+        """
+        cursors = self._cursors
+        hint = self._hint
+        if hint <= len(cursors) and (hint == 0 or cursors[hint - 1].position() < position) \
+                and (hint == len(cursors) or cursors[hint].position() >= position):
+            return hint
+
+        low, high = 0, len(cursors)
+        while low < high:
+            middle = (low + high) // 2
+            if cursors[middle].position() < position:
+                low = middle + 1
+            else:
+                high = middle
+        self._hint = low
+        return low
@@ -0,0 +1,118 @@
+"""
+Module containing the memoized Pygments highlighting used by the preview.
+
+Highlighting fenced code is the most expensive part of a render, and code blocks
+are rarely the part of the document being edited. CodeHighlightCache keeps the
+HTML produced by codehilite for each (language, code, style) in an LRU cache
+bounded by an approximate memory budget, so a code block is only lexed again
+when its text, language or style changes.
+
+Example:
+    cache = CodeHighlightCache(max_bytes=16 * 1024 * 1024)
+    html = cache.highlight("python", "print('hello')\\n", "default")
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+from .constants import CODE_HIGHLIGHT_CACHE_BYTES
+from .instrumentation import span
+
+
+class CodeHighlightCache:
+    """
+    Thread-safe LRU cache of highlighted code fragments.
+
+    The size of an entry is estimated from the memory used by its code and HTML
+    strings; the least recently used entries are discarded when the total goes
+    over max_bytes.
+
+    Attributes:
+        max_bytes (int): the memory budget of the cache, in bytes.
+        hits (int): number of lookups answered by the cache.
+        misses (int): number of fragments that had to be highlighted.
+    """
+    def __init__(self, max_bytes: int = CODE_HIGHLIGHT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        """int: the estimated memory used by the cached fragments, in bytes."""
+        return self._size
+
+    def highlight(self, lang: str, code: str, style: str, **options) -> str:
+        """
+        Returns the codehilite HTML of the code, highlighting it only on a cache miss.
+
+        Args:
+            lang (str or None): the language of the fence; None lets Pygments guess it.
+            code (str): the code inside the fence.
+            style (str): the Pygments style name.
+            **options: other CodeHilite options (css_class, linenums, guess_lang...).
+
+        Returns:
+            str: the highlighted HTML fragment.
+        """
+        key = (lang, code, style, tuple(sorted(options.items())))
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return html
+
+        # imported here so the preview worker, not the startup, pays for markdown and Pygments.
+        from markdown.extensions.codehilite import CodeHilite
+
+        with span("pygments"):
+            html = CodeHilite(code, lang=lang, style=style, **options).hilite(shebang=False)
+
+        with self._lock:
+            self.misses += 1
+            if key not in self._entries:
+                self._entries[key] = html
+                self._size += self._entry_size(key, html)
+                self._evict()
+        return html
+
+    def set_max_bytes(self, max_bytes: int) -> None:
+        """
+        Changes the memory budget, discarding entries if needed.
+
+        Args:
+            max_bytes (int): the new budget, in bytes.
+        """
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self) -> None:
+        """Discards every cached fragment."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _evict(self) -> None:
+        """Removes the least recently used entries until the cache fits in the budget."""
+        while self._entries and self._size > self.max_bytes:
+            key, html = self._entries.popitem(last=False)
+            self._size -= self._entry_size(key, html)
+
+    @staticmethod
+    def _entry_size(key: tuple, html: str) -> int:
+        """
+        Estimates the memory used by an entry.
+
+        Args:
+            key (tuple): the cache key, which holds the code string.
+            html (str): the highlighted fragment.
+
+        Returns:
+            int: the estimated size in bytes.
+        """
+        return sys.getsizeof(key[1]) + sys.getsizeof(html)
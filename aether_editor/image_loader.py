@@ -0,0 +1,253 @@
+"""
+Module containing the background loading of the images shown by the preview.
+
+QTextEdit reads and decodes an image on the GUI thread the first time its
+layout needs it, and again after every setHtml. ImageLoader decodes the images
+in a QThreadPool worker instead, scaled down to at most the width of the
+screen, and keeps them in an LRU cache bounded by an approximate memory budget
+and keyed by path and modification time: an image is decoded once, and again
+only when its file changes.
+
+Example:
+    loader = ImageLoader(parent=self)
+    loader.loaded.connect(self.show_image)
+    key, image = loader.request("/home/user/docs/screenshot.png", max_width=1920)
+    if image is None:
+        ...  # a placeholder, until loaded emits the key.
+"""
+import os
+from collections import OrderedDict
+
+from PySide6.QtCore import (
+    QObject,
+    QRunnable,
+    QSize,
+    Qt,
+    QThreadPool,
+    Signal,
+    Slot
+)
+from PySide6.QtGui import QImage, QImageReader
+
+from .constants import PREVIEW_IMAGE_CACHE_BYTES
+
+# cost of an image that could not be decoded, so the failures are also bounded
+FAILED_IMAGE_BYTES = 1024
+
+
+def image_key(path: str) -> tuple:
+    """
+    Identifies a version of an image file.
+
+    Args:
+        path (str): the path of the image.
+
+    Returns:
+        tuple[str, int] or None: the absolute path and the modification time in nanoseconds,
+            None if the file does not exist.
+    """
+    try:
+        return os.path.abspath(path), os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def decode_image(path: str, max_width: int) -> QImage:
+    """
+    Reads an image, scaled down to a maximum width, in a format that is fast to paint.
+
+    Only the scaled image is decoded when the format allows it (JPEG), and the
+    orientation stored in the file is applied.
+
+    Args:
+        path (str): the path of the image.
+        max_width (int): the maximum width of the result, in pixels.
+
+    Returns:
+        QImage: the image.
+
+    Raises:
+        OSError: the file is not a readable image.
+    """
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if size.isValid() and size.width() > max_width:
+        reader.setScaledSize(size.scaled(QSize(max_width, size.height()), Qt.AspectRatioMode.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        raise OSError(f"{os.path.basename(path)}: {reader.errorString()}")
+    if image.width() > max_width:
+        # formats that cannot decode a scaled image are scaled after the decoding.
+        image = image.scaledToWidth(max_width, Qt.TransformationMode.SmoothTransformation)
+    if image.hasAlphaChannel():
+        return image.convertToFormat(QImage.Format.Format_ARGB32_Premultiplied)
+    return image.convertToFormat(QImage.Format.Format_RGB32)
+
+
+class ImageLoadSignals(QObject):
+    """
+    Signals emitted by an ImageLoadTask, delivered in the thread of the receiver.
+
+    Attributes:
+        finished (Signal(object, object)): the key and the decoded QImage.
+        failed (Signal(object, str)): the key and the error message.
+    """
+    finished = Signal(object, object)
+    failed = Signal(object, str)
+
+
+class ImageLoadTask(QRunnable):
+    """
+    Worker that decodes an image with decode_image().
+
+    Attributes:
+        key (tuple[str, int]): the path and the modification time of the image.
+        max_width (int): the maximum width of the decoded image.
+        signals (ImageLoadSignals): signals used to report the result.
+    """
+    def __init__(self, key: tuple, max_width: int):
+        super().__init__()
+        self.key = key
+        self.max_width = max_width
+        self.signals = ImageLoadSignals()
+
+    def run(self):
+        """Decodes the image and emits it (or the error)."""
+        try:
+            image = decode_image(self.key[0], self.max_width)
+        except Exception as e:
+            self.signals.failed.emit(self.key, str(e))
+        else:
+            self.signals.finished.emit(self.key, image)
+
+
+class ImageLoader(QObject):
+    """
+    Decodes images in the background and caches them, shared by every preview.
+
+    The cache lives on the GUI thread; only the decoding runs in the pool. Each
+    version of a file is decoded at most once while it stays in the cache, even
+    if several previews ask for it at the same time.
+
+    Attributes:
+        loaded (Signal(object)): emitted with the key of an image once it is decoded, or once its decoding failed.
+        max_bytes (int): the memory budget of the cache, in bytes.
+        hits (int): number of requests answered by the cache.
+        misses (int): number of images that had to be decoded.
+    """
+    loaded = Signal(object)
+
+    def __init__(self, parent: QObject = None, thread_pool: QThreadPool = None, max_bytes: int = PREVIEW_IMAGE_CACHE_BYTES):
+        """
+        Initializes an empty cache.
+
+        Args:
+            parent (QObject): the parent object.
+            thread_pool (QThreadPool): the pool that decodes the images, the global pool by default.
+            max_bytes (int): the memory budget of the cache, in bytes.
+        """
+        super().__init__(parent)
+        self.thread_pool = thread_pool or QThreadPool.globalInstance()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._images = OrderedDict()
+        self._size = 0
+        self._tasks = {}
+
+    def __len__(self) -> int:
+        return len(self._images)
+
+    def memory_size(self) -> int:
+        """
+        Returns:
+            int: the approximate memory used by the cached images, in bytes.
+        """
+        return self._size
+
+    def request(self, path: str, max_width: int) -> tuple:
+        """
+        Returns the cached image of a file, or starts decoding it.
+
+        Args:
+            path (str): the path of the image.
+            max_width (int): the maximum width of the image, if it has to be decoded.
+
+        Returns:
+            tuple[tuple[str, int], QImage]: the key of the current version of the file and its image;
+                the image is None while it is decoded and a null QImage if it could not be.
+                The key is None if the file does not exist.
+        """
+        key = image_key(path)
+        if key is None:
+            return None, None
+        image = self.cached(key)
+        if image is not None:
+            self.hits += 1
+            return key, image
+        if key not in self._tasks:
+            self.misses += 1
+            task = ImageLoadTask(key, max_width)
+            task.signals.finished.connect(self._on_load_finished)
+            task.signals.failed.connect(self._on_load_failed)
+            self._tasks[key] = task
+            self.thread_pool.start(task)
+        return key, None
+
+    def cached(self, key: tuple) -> QImage:
+        """
+        Args:
+            key (tuple[str, int]): the path and the modification time of the image.
+
+        Returns:
+            QImage or None: the cached image, null if its decoding failed; None if it is not cached.
+        """
+        image = self._images.get(key)
+        if image is not None:
+            self._images.move_to_end(key)
+        return image
+
+    def clear(self) -> None:
+        """Discards every cached image."""
+        self._images.clear()
+        self._size = 0
+
+    @Slot(object, object)
+    def _on_load_finished(self, key: tuple, image: QImage):
+        """
+        Caches a decoded image.
+
+        Args:
+            key (tuple[str, int]): the path and the modification time of the image.
+            image (QImage): the decoded image.
+        """
+        self._store(key, image, image.sizeInBytes())
+
+    @Slot(object, str)
+    def _on_load_failed(self, key: tuple, message: str):
+        """
+        Caches a failed decoding as a null image, so the file is not read again until it changes.
+
+        Args:
+            key (tuple[str, int]): the path and the modification time of the image.
+            message (str): the error message.
+        """
+        self._store(key, QImage(), FAILED_IMAGE_BYTES)
+
+    def _store(self, key: tuple, image: QImage, size: int) -> None:
+        """
+        Adds an image to the cache, discarding the least recently used ones over the budget.
+
+        Args:
+            key (tuple[str, int]): the path and the modification time of the image.
+            image (QImage): the image.
+            size (int): its approximate memory size, in bytes.
+        """
+        self._tasks.pop(key, None)
+        self._images[key] = image
+        self._size += size
+        while self._size > self.max_bytes and len(self._images) > 1:
+            _, evicted = self._images.popitem(last=False)
+            self._size -= evicted.sizeInBytes() if not evicted.isNull() else FAILED_IMAGE_BYTES
+        self.loaded.emit(key)
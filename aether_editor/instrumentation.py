@@ -0,0 +1,206 @@
+"""
+Module containing the opt-in instrumentation of the render pipeline, the highlighter and the file I/O.
+
+When AETHER_TRACE is set, each phase wrapped by span() or traced() is timed and
+kept in a ring buffer of the last INSTRUMENTATION_EVENTS phases: reading the
+text of the editor (toPlainText), the render in the worker (render), with the
+Markdown conversion (markdown) and the Pygments highlighting (pygments) inside
+it, the patch of the preview document and its layout (layout), the highlighting
+of the editor (highlight) and the reading, insertion and writing of files. The
+frame shows the rolling p50/p95 of the main phases beside its status, and the
+buffer is exported in the Chrome trace format (chrome://tracing, Perfetto).
+
+Without AETHER_TRACE, span() returns one shared context manager that does nothing
+and traced() returns the function itself, so the instrumented code runs as before.
+
+Example:
+    with span("layout"):
+        patcher.apply(rendered_blocks)
+
+    @traced("highlight")
+    def _highlight_visible_blocks(self): ...
+
+    phase_recorder.export_chrome_trace("trace.json")
+"""
+import functools
+import json
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+from .constants import INSTRUMENTATION_ENABLED, INSTRUMENTATION_EVENTS, INSTRUMENTATION_WINDOW
+
+
+class PhaseRecorder:
+    """
+    Thread-safe ring buffer of the durations of the instrumented phases.
+
+    Attributes:
+        events (deque[tuple[str, float, float, int]]): the name, the start and the duration
+            (time.perf_counter() seconds) and the thread of the last phases.
+        window (int): the number of recent durations of each phase used by the percentiles.
+    """
+    def __init__(self, capacity: int = INSTRUMENTATION_EVENTS, window: int = INSTRUMENTATION_WINDOW):
+        """
+        Initializes an empty recorder.
+
+        Args:
+            capacity (int): the number of phases kept for the trace.
+            window (int): the number of recent durations of each phase used by the percentiles.
+        """
+        self.events = deque(maxlen=capacity)
+        self.window = window
+        self._recent = {}
+        self._origin = time.perf_counter()
+
+    def record(self, name: str, start: float, end: float) -> None:
+        """
+        Adds a finished phase; called from any thread.
+
+        Args:
+            name (str): the name of the phase.
+            start (float): the time.perf_counter() value at the start of the phase.
+            end (float): the time.perf_counter() value at its end.
+        """
+        # deque.append and dict.setdefault are atomic, so the worker threads need no lock.
+        self.events.append((name, start, end - start, threading.get_ident()))
+        recent = self._recent.get(name)
+        if recent is None:
+            recent = self._recent.setdefault(name, deque(maxlen=self.window))
+        recent.append(end - start)
+
+    def percentiles(self, name: str) -> tuple:
+        """
+        Computes the median and the 95th percentile of the recent durations of a phase.
+
+        Args:
+            name (str): the name of the phase.
+
+        Returns:
+            tuple[float, float] or None: p50 and p95 in milliseconds, None if the phase never ran.
+        """
+        durations = list(self._recent.get(name, ()))
+        if not durations:
+            return None
+        if len(durations) == 1:
+            return durations[0] * 1000, durations[0] * 1000
+        cuts = statistics.quantiles(durations, n=20, method="inclusive")
+        return cuts[9] * 1000, cuts[18] * 1000
+
+    def phase_names(self) -> list:
+        """
+        Returns:
+            list[str]: the names of the phases recorded so far, in order of first occurrence.
+        """
+        return list(self._recent)
+
+    def clear(self) -> None:
+        """Discards every recorded phase."""
+        self.events.clear()
+        self._recent.clear()
+
+    def chrome_trace(self) -> dict:
+        """
+        Converts the buffer to the Chrome trace event format.
+
+        Each phase is a complete event ("ph": "X") with its start and duration in
+        microseconds, on the row of its thread.
+
+        Returns:
+            dict: the trace, serializable with json.
+        """
+        pid = os.getpid()
+        main_thread = threading.main_thread().ident
+        trace_events = []
+        threads = {main_thread: "GUI"}
+        for name, start, duration, thread in list(self.events):
+            if thread not in threads:
+                threads[thread] = f"worker {len(threads)}"
+            trace_events.append({
+                "name": name,
+                "ph": "X",
+                "ts": round((start - self._origin) * 1e6, 1),
+                "dur": round(duration * 1e6, 1),
+                "pid": pid,
+                "tid": thread,
+            })
+        for thread, thread_name in threads.items():
+            trace_events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": thread, "args": {"name": thread_name}})
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, filename: str) -> int:
+        """
+        Writes the buffer to a Chrome trace JSON file.
+
+        Args:
+            filename (str): the path of the file.
+
+        Returns:
+            int: the number of phases written.
+        """
+        trace = self.chrome_trace()
+        with open(filename, "w", encoding="utf-8") as file:
+            json.dump(trace, file)
+        return sum(1 for event in trace["traceEvents"] if event["ph"] == "X")
+
+
+class _Span:
+    """Context manager that records the time spent inside it as a phase."""
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        phase_recorder.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+# the recorder of the process, None when the instrumentation is disabled.
+phase_recorder = PhaseRecorder() if INSTRUMENTATION_ENABLED else None
+_NO_SPAN = nullcontext()
+
+
+def span(name: str):
+    """
+    Times a phase with a with statement.
+
+    Args:
+        name (str): the name of the phase.
+
+    Returns:
+        a context manager; the shared one that does nothing when the instrumentation is disabled.
+    """
+    return _NO_SPAN if phase_recorder is None else _Span(name)
+
+
+def traced(name: str):
+    """
+    Decorator that times each call of a function as a phase.
+
+    Args:
+        name (str): the name of the phase.
+
+    Returns:
+        Callable: the decorator, which returns the function itself when the instrumentation is disabled.
+    """
+    def decorator(function):
+        if phase_recorder is None:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                phase_recorder.record(name, start, time.perf_counter())
+        return wrapper
+    return decorator
@@ -14,18 +14,24 @@ Example:
 
 import sys
 
+from PySide6.QtCore import Qt, QTimer, Signal
+from PySide6.QtGui import QKeySequence, QShortcut
 from PySide6.QtWidgets import (
     QMainWindow,
     QApplication,
     QWidget,
     QTabWidget,
-    QLabel
+    QLabel,
+    QDockWidget,
+    QToolButton
 )
 
+from .document_tabs import DocumentTabWidget
 from .editor_frame import MarkdownEditorFrame
 from .information_frame import InformationFrame
 from .config_frame import ConfigFrame
-from .constants import qss_style_sheet
+from .constants import get_qss_style, preload_css_styles
+from .workspace_panel import WorkspacePanel
 
 
 class AetherEditorApp(QMainWindow):
@@ -34,7 +40,15 @@ class AetherEditorApp(QMainWindow):
 
     The layout, the core widgets, and the overall state of the graphical user interface (GUI) deserve it.
     This class acts as the main container for all application components, such as the code editor and the configuration section.
+
+    The work that is not needed to show the window (the first preview, the reading of the
+    themes) waits for first_painted, so the window appears as soon as possible.
+
+    Attributes:
+        first_painted (Signal()): emitted once, after the first paint of the window has finished.
     """
+    first_painted = Signal()
+
     def __init__(self):
         """
         Initializes the main application window (QMainWindow).
@@ -45,7 +59,8 @@ class AetherEditorApp(QMainWindow):
         super().__init__()
         self.setWindowTitle("Aether Editor - Editor de Markdown")
         self.setGeometry(100, 100, 1000, 700) 
-        self.setStyleSheet(qss_style_sheet)
+        self.setStyleSheet(get_qss_style())
+        self._painted = False
 
         self.tab_view=QTabWidget(parent=self)
         self.setCentralWidget(self.tab_view)
@@ -55,12 +70,65 @@ class AetherEditorApp(QMainWindow):
         """
         Configures the user interface by creating and adding the main tabs.
 
-        Creates instances of MarkdownEditorFrame, ConfigFrame, and InformationFrame,
+        Creates instances of DocumentTabWidget (the tabs of the open documents), ConfigFrame, and InformationFrame,
         adding each as a new tab in the central widget (QTabWidget).
         """
-        self.editor=self.create_new_tab(MarkdownEditorFrame, "Editor")
+        self.documents=self.create_new_tab(DocumentTabWidget, "Editor")
         self.configure_frame=self.create_new_tab(ConfigFrame, "Configurações")
         self.information=self.create_new_tab(InformationFrame, "Informações")
+        self.configure_frame.theme_changed.connect(self.documents.apply_theme)
+        self.first_painted.connect(self.documents.start_preview)
+        self.first_painted.connect(preload_css_styles)
+        self._setup_workspace()
+
+    def _setup_workspace(self) -> None:
+        """
+        Creates the workspace panel, in a dock hidden until it is opened.
+
+        The button at the left of the document tabs shows or hides it, Ctrl+P opens
+        a document of the workspace by its name and Ctrl+Shift+F searches its documents.
+        """
+        self.workspace = WorkspacePanel()
+        self.workspace.open_requested.connect(self.open_workspace_document)
+        self.workspace_dock = QDockWidget("Pasta de trabalho", self)
+        self.workspace_dock.setObjectName("workspace_dock")
+        self.workspace_dock.setWidget(self.workspace)
+        self.addDockWidget(Qt.DockWidgetArea.LeftDockWidgetArea, self.workspace_dock)
+        self.workspace_dock.hide()
+
+        toggle_button = QToolButton()
+        toggle_button.setDefaultAction(self.workspace_dock.toggleViewAction())
+        self.documents.setCornerWidget(toggle_button, Qt.Corner.TopLeftCorner)
+        QShortcut(QKeySequence("Ctrl+P"), self).activated.connect(lambda: self.show_workspace(searching=False))
+        QShortcut(QKeySequence("Ctrl+Shift+F"), self).activated.connect(lambda: self.show_workspace(searching=True))
+
+    def show_workspace(self, searching: bool) -> None:
+        """
+        Shows the workspace panel with the focus on one of its fields.
+
+        Args:
+            searching (bool): selects the search field instead of the fuzzy open field.
+        """
+        self.workspace_dock.show()
+        if searching:
+            self.workspace.focus_search_field()
+        else:
+            self.workspace.focus_open_field()
+
+    def open_workspace_document(self, filename: str) -> None:
+        """
+        Opens a document chosen in the workspace panel, in the document tabs.
+
+        Args:
+            filename (str): the path of the document.
+        """
+        self.tab_view.setCurrentWidget(self.documents)
+        self.documents.open_file(filename)
+
+    @property
+    def editor(self) -> MarkdownEditorFrame:
+        """MarkdownEditorFrame: the document on screen."""
+        return self.documents.current_document()
 
     def create_new_tab(self, widget_class: QWidget, text: str) -> QWidget:
         """
@@ -80,4 +148,25 @@ class AetherEditorApp(QMainWindow):
         self.tab_view.addTab(new_page, text)  
         return new_page  
     
-    
\ No newline at end of file
+    
+    def paintEvent(self, event) -> None:
+        """
+        Emits first_painted after the first paint, once the children are painted too.
+
+        Args:
+            event (QPaintEvent): the paint event.
+        """
+        super().paintEvent(event)
+        if not self._painted:
+            self._painted = True
+            QTimer.singleShot(0, self.first_painted.emit)
+
+    def closeEvent(self, event) -> None:
+        """
+        Ends the session of every document before the window closes.
+
+        Args:
+            event (QCloseEvent): the close event.
+        """
+        self.documents.close_session()
+        super().closeEvent(event)
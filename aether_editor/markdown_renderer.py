@@ -0,0 +1,401 @@
+"""
+Module containing the incremental Markdown render engine used by the preview.
+
+The source text is split into top-level blocks (paragraphs, lists, tables,
+fenced code, raw HTML...) and each block is converted on its own. The rendered
+HTML is kept in a cache keyed by the hash of the block source, so after an edit
+only the blocks that actually changed go through the markdown module again and
+the cost of a render follows the size of the edit, not the size of the document.
+
+A single markdown.Markdown instance is kept for the whole life of the renderer
+and reused through reset(), and fenced code blocks are highlighted through a
+CodeHighlightCache, so untouched code is never lexed by Pygments twice. The
+markdown module is only imported by the first render, which the editor runs in
+a worker thread, so creating a renderer does not slow down the startup.
+
+Example:
+    renderer = MarkdownRenderer()
+    html_body = renderer.render_html(markdown_text)
+"""
+import hashlib
+import re
+from collections import OrderedDict
+from typing import NamedTuple
+
+from .highlight_cache import CodeHighlightCache
+from .instrumentation import span
+
+MARKDOWN_EXTENSIONS = ['fenced_code', 'tables', 'codehilite']
+
+FENCE_OPEN_EXP = re.compile(r"^(`{3,}|~{3,})")
+LIST_ITEM_EXP = re.compile(r"^[ ]{0,3}(?:[*+-]|\d+\.)[ \t]+")
+QUOTE_LINE_EXP = re.compile(r"^[ ]{0,3}>")
+HTML_BLOCK_OPEN_EXP = re.compile(r"^<([a-zA-Z][a-zA-Z0-9]*)[\s>]")
+REFERENCE_DEFINITION_EXP = re.compile(r"^[ ]{0,3}\[[^\]]+\]:", re.MULTILINE)
+BLANK_SPACES_LINE_EXP = re.compile(r"(?<=\n) +\n")
+
+
+class MarkdownBlock(NamedTuple):
+    """
+    A top-level block of the Markdown source.
+
+    Attributes:
+        text (str): the source of the block, without the surrounding blank lines.
+        first_line (int): index of the first source line of the block.
+        last_line (int): index of the last source line of the block (inclusive).
+    """
+    text: str
+    first_line: int
+    last_line: int
+
+
+class RenderedBlock(NamedTuple):
+    """
+    A source block together with the HTML produced for it.
+
+    Attributes:
+        source (MarkdownBlock): the block of Markdown source.
+        key (str): the content hash of the block, used as cache key.
+        html (str): the rendered HTML fragment.
+    """
+    source: MarkdownBlock
+    key: str
+    html: str
+
+
+def _fence_closes(line: str, fence: str) -> bool:
+    """
+    Checks if the line closes the fenced code block opened with "fence".
+
+    Args:
+        line (str): the source line.
+        fence (str): the opening fence (e.g. '```' or '~~~~').
+
+    Returns:
+        bool: True if the line is a closing fence for the block.
+    """
+    stripped = line.rstrip()
+    return (
+        len(stripped) >= len(fence)
+        and stripped.startswith(fence)
+        and stripped == fence[0] * len(stripped)
+    )
+
+
+def split_markdown_blocks(text: str) -> list:
+    """
+    Splits the Markdown source into top-level blocks.
+
+    Blocks are separated by blank lines, except where a blank line does not end
+    the construct: inside fenced code (``` or ~~~), inside raw HTML blocks, between
+    the items of a loose list, between the quote lines of a blockquote (which the
+    markdown module merges into one) and before indented continuation lines. Fenced code
+    blocks always become blocks of their own, since the fenced_code extension
+    handles them independently of the surrounding text.
+
+    Args:
+        text (str): the full Markdown source.
+
+    Returns:
+        list[MarkdownBlock]: the blocks in document order.
+    """
+    blocks = []
+    current = []
+    first_line = 0
+    blank_run = 0
+    fence = None
+    html_tag = None
+    in_list = False
+    in_quote = False
+
+    def close_block(last_line: int) -> None:
+        if current:
+            blocks.append(MarkdownBlock("\n".join(current), first_line, last_line))
+            current.clear()
+
+    for number, line in enumerate(text.split("\n")):
+        if fence:
+            current.append(line)
+            if _fence_closes(line, fence):
+                close_block(number)
+                fence = None
+            continue
+
+        if not line.strip():
+            if current:
+                blank_run += 1
+            continue
+
+        fence_match = FENCE_OPEN_EXP.match(line)
+        if fence_match and not html_tag:
+            close_block(number - blank_run - 1)
+            blank_run = 0
+            in_list = in_quote = False
+            fence = fence_match.group(1)
+            first_line = number
+            current.append(line)
+            continue
+
+        if current and blank_run:
+            continues_block = (
+                html_tag is not None
+                or line[0] in " \t"
+                or (in_list and LIST_ITEM_EXP.match(line) is not None)
+                or (in_quote and QUOTE_LINE_EXP.match(line) is not None)
+            )
+            if continues_block:
+                current.extend([""] * blank_run)
+            else:
+                close_block(number - blank_run - 1)
+                html_tag = None
+        blank_run = 0
+
+        if not current:
+            first_line = number
+            in_list = LIST_ITEM_EXP.match(line) is not None
+            in_quote = False
+            html_match = HTML_BLOCK_OPEN_EXP.match(line)
+            html_tag = html_match.group(1).lower() if html_match else None
+        current.append(line)
+        if not in_list and not html_tag and QUOTE_LINE_EXP.match(line):
+            # the lines after a quote line belong to the blockquote, which ends the block.
+            in_quote = True
+        if html_tag and f"</{html_tag}>" in line.lower():
+            html_tag = None
+
+    close_block(number - blank_run)
+    return blocks
+
+
+def build_html_document(html_body: str, css: str) -> str:
+    """
+    Wraps a rendered HTML body in a complete HTML document with the given style.
+
+    Args:
+        html_body (str): the rendered HTML of the Markdown source.
+        css (str): the content of the CSS file.
+
+    Returns:
+        str: the styled HTML document.
+    """
+    return (
+        "<html>\n<head>\n<meta charset=\"utf-8\">\n"
+        f"<style>\n{css}\n</style>\n"
+        "</head>\n<body>\n"
+        f"{html_body}\n"
+        "</body>\n</html>\n"
+    )
+
+
+class MarkdownRenderer:
+    """
+    Incremental Markdown to HTML converter with a per-block HTML cache.
+
+    Each call to render() splits the source in top-level blocks and looks up
+    the rendered HTML of every block by the hash of its content; only blocks
+    that are not in the cache are converted. Reference-style link definitions
+    are collected from the whole document before the conversion, so a link in
+    one block can still use a definition that lives in another block.
+
+    Blocks made of a single fenced code block skip the markdown pipeline and
+    go straight to the code cache, with the same options codehilite would use.
+
+    Attributes:
+        extensions (list[str]): the markdown extensions used in the conversion.
+        max_cached_blocks (int): maximum number of rendered blocks kept in the cache, besides
+            the blocks of the last document, which are always kept.
+        code_cache (CodeHighlightCache): the cache of highlighted code fragments.
+        last_rendered_count (int): number of blocks converted in the last render.
+    """
+    def __init__(
+        self,
+        extensions: list = None,
+        max_cached_blocks: int = 4096,
+        code_cache: CodeHighlightCache = None
+    ):
+        self.extensions = extensions if extensions is not None else MARKDOWN_EXTENSIONS
+        self.max_cached_blocks = max_cached_blocks
+        self.code_cache = code_cache if code_cache is not None else CodeHighlightCache()
+        self.last_rendered_count = 0
+        self._converter = None
+        self._codehilite_options = None
+        self._html_cache = OrderedDict()
+        self._block_references = {}
+        self._references = {}
+
+    @staticmethod
+    def block_key(block: MarkdownBlock) -> str:
+        """
+        Computes the cache key of a block from its content.
+
+        Args:
+            block (MarkdownBlock): the block of source.
+
+        Returns:
+            str: hexadecimal digest of the block text.
+        """
+        return hashlib.blake2b(block.text.encode("utf-8"), digest_size=16).hexdigest()
+
+    def render(self, text: str) -> list:
+        """
+        Converts the Markdown source, reusing cached HTML for unchanged blocks.
+
+        Args:
+            text (str): the full Markdown source.
+
+        Returns:
+            list[RenderedBlock]: rendered blocks in document order.
+        """
+        if self._converter is None:
+            self._load_converter()
+        blocks = split_markdown_blocks(text)
+        keys = [self.block_key(block) for block in blocks]
+
+        references = self._collect_references(blocks, keys)
+        if references != self._references:
+            # a definition changed: blocks using reference links may be stale.
+            self._html_cache.clear()
+            self._references = references
+
+        rendered = []
+        self.last_rendered_count = 0
+        for block, key in zip(blocks, keys):
+            html = self._html_cache.get(key)
+            if html is None:
+                with span("markdown"):
+                    html = self._convert_block(block.text, references)
+                self._html_cache[key] = html
+                self.last_rendered_count += 1
+            else:
+                self._html_cache.move_to_end(key)
+            rendered.append(RenderedBlock(block, key, html))
+
+        # a document with more blocks than the limit would evict its own blocks before the next render.
+        while len(self._html_cache) > max(self.max_cached_blocks, len(keys)):
+            self._html_cache.popitem(last=False)
+        return rendered
+
+    def render_html(self, text: str) -> str:
+        """
+        Converts the Markdown source to the HTML body of the document.
+
+        Args:
+            text (str): the full Markdown source.
+
+        Returns:
+            str: the concatenated HTML of every block.
+        """
+        return "\n".join(block.html for block in self.render(text))
+
+    def clear_cache(self) -> None:
+        """Discards every rendered block kept in the cache."""
+        self._html_cache.clear()
+        self._block_references.clear()
+        self._references = {}
+
+    def _load_converter(self) -> None:
+        """Creates the markdown converter, importing the markdown module on first use."""
+        import markdown
+
+        self._converter = markdown.Markdown(extensions=self.extensions)
+        self._codehilite_options = self._find_codehilite_options()
+
+    def _convert_block(self, text: str, references: dict) -> str:
+        """
+        Converts a single block of Markdown source to HTML.
+
+        Args:
+            text (str): the source of the block.
+            references (dict): the reference-style link definitions of the document.
+
+        Returns:
+            str: the HTML of the block.
+        """
+        html = self._highlight_fenced_block(text)
+        if html is not None:
+            return html
+
+        self._converter.reset()
+        self._converter.references.update(references)
+        return self._converter.convert(text)
+
+    def _highlight_fenced_block(self, text: str) -> str:
+        """
+        Highlights a block made only of a plain fenced code block using the code cache.
+
+        Fences with attributes ({...}) or hl_lines are left to the fenced_code
+        extension, as are blocks with anything besides the fence.
+
+        Args:
+            text (str): the source of the block.
+
+        Returns:
+            str or None: the highlighted HTML, or None if the block must go through markdown.
+        """
+        if self._codehilite_options is None or not FENCE_OPEN_EXP.match(text):
+            return None
+        from markdown.extensions.fenced_code import FencedBlockPreprocessor
+
+        # the same whitespace normalization the markdown preprocessors apply.
+        source = text.replace("\r\n", "\n").replace("\r", "\n") + "\n"
+        source = BLANK_SPACES_LINE_EXP.sub("\n", source.expandtabs(self._converter.tab_length))
+        match = FencedBlockPreprocessor.FENCED_BLOCK_RE.match(source)
+        if (
+            match is None
+            or source[match.end():].strip()
+            or match.group("attrs") is not None
+            or match.group("hl_lines") is not None
+        ):
+            return None
+
+        options = dict(self._codehilite_options)
+        style = options.pop("pygments_style", "default")
+        html = self.code_cache.highlight(match.group("lang") or None, match.group("code"), style, **options)
+        return html.strip()
+
+    def _find_codehilite_options(self) -> dict:
+        """
+        Reads the configuration of the codehilite extension of the converter.
+
+        Returns:
+            dict or None: the codehilite options, or None if fenced code is not highlighted.
+        """
+        from markdown.extensions.codehilite import CodeHiliteExtension
+
+        if "fenced_code_block" not in self._converter.preprocessors:
+            return None
+        for extension in self._converter.registeredExtensions:
+            if isinstance(extension, CodeHiliteExtension):
+                options = extension.getConfigs()
+                return options if options.get("use_pygments") else None
+        return None
+
+    def _collect_references(self, blocks: list, keys: list) -> dict:
+        """
+        Gathers the reference-style link definitions of the whole document.
+
+        Only blocks that look like they contain a definition are inspected, and
+        the definitions found in each block are remembered by its key, so the
+        work is not repeated for unchanged blocks.
+
+        Args:
+            blocks (list[MarkdownBlock]): the document blocks.
+            keys (list[str]): the cache keys of the blocks.
+
+        Returns:
+            dict: the definitions, in the format of markdown.Markdown.references.
+        """
+        references = {}
+        block_references = {}
+        for block, key in zip(blocks, keys):
+            if not REFERENCE_DEFINITION_EXP.search(block.text):
+                continue
+            found = self._block_references.get(key)
+            if found is None:
+                self._converter.reset()
+                self._converter.convert(block.text)
+                found = dict(self._converter.references)
+            block_references[key] = found
+            references.update(found)
+        self._block_references = block_references
+        return references
@@ -0,0 +1,197 @@
+"""
+Module containing the line scanner used by the syntax highlighter of the editor.
+
+scan_markdown_line() finds the highlighted spans of one line of Markdown in a
+single pass and is independent of Qt, so it can be measured and compared on its
+own. Fenced code lines are recognized first and skip the inline rules, whose
+spans would be painted over by the code format anyway. In the other lines, only
+the positions of the inline delimiters (*, _ and `) are visited; at each one
+the rules that may start there are tried, so every rule finds exactly the
+matches a separate finditer() over the line would find.
+
+The spans are returned in the order they must be applied: a later span replaces
+the format of an earlier one where they overlap.
+
+Example:
+    spans, state = scan_markdown_line("# Title with *emphasis*", STATE_NORMAL)
+    for start, length, kind in spans:
+        highlighter.setFormat(start, length, formats[kind])
+"""
+import re
+
+STATE_NORMAL = 0
+STATE_CODE = 1
+
+# kinds of span
+LIST = "list"
+HEADER = "header"
+BOLD = "bold"
+ITALIC = "italic"
+QUOTE = "quote"
+CODE_INLINE = "code_inline"
+CODE_BLOCK = "code_block"
+
+LIST_RE = re.compile(r"\s*(\*|\-|\+|\d+\.)\s+")
+HEADER_RE = re.compile(r"#+\s")
+QUOTE_RE = re.compile(r">\s")
+BOLD_RE = re.compile(r"(\*\*|__)(.+?)(\*\*|__)")
+ITALIC_RE = re.compile(r"(\*|_)(.+?)(\*|_)")
+CODE_INLINE_RE = re.compile(r"`[^`]+`")
+INLINE_DELIMITER_RE = re.compile(r"[*_`]")
+
+FENCE = "```"
+
+
+def scan_markdown_line(text: str, previous_state: int) -> tuple:
+    """
+    Finds the highlighted spans of a line and the state passed to the next line.
+
+    Args:
+        text (str): the text of the line, without the line break.
+        previous_state (int): the state of the previous line (-1 if there is none).
+
+    Returns:
+        tuple[list[tuple[int, int, str]], int]: the (start, length, kind) spans, in
+            the order they must be applied, and the state of the line.
+    """
+    if not text:
+        return [], previous_state
+
+    code_line, state = scan_code_fence(text, previous_state)
+    if code_line:
+        return [(0, len(text), CODE_BLOCK)], state
+    return _scan_inline(text), state
+
+
+def scan_code_fence(text: str, previous_state: int) -> tuple:
+    """
+    Tells if a line belongs to a fenced code block, without looking for the inline spans.
+
+    It gives the same state as scan_markdown_line(), at a fraction of the cost, so
+    the state of the lines that are not highlighted yet can be kept up to date.
+
+    Args:
+        text (str): the text of the line, without the line break.
+        previous_state (int): the state of the previous line (-1 if there is none).
+
+    Returns:
+        tuple[bool, int]: True if the whole line gets the code format, and the state of the line.
+    """
+    if not text:
+        return False, previous_state
+
+    if previous_state == STATE_CODE:
+        return True, STATE_NORMAL if text.rstrip().endswith(FENCE) else STATE_CODE
+
+    stripped = text.lstrip()
+    if stripped.startswith(FENCE):
+        # the closing fence must come after the opening one, as in "``` ```".
+        opening_end = len(text) - len(stripped) + len(FENCE)
+        closing = text.rstrip()
+        closed = closing.endswith(FENCE) and len(closing) - len(FENCE) >= opening_end
+        return True, STATE_NORMAL if closed else STATE_CODE
+
+    return False, previous_state
+
+
+def _scan_inline(text: str) -> list:
+    """
+    Finds the spans of the line and inline rules in a line outside code blocks.
+
+    Args:
+        text (str): the text of the line (not empty).
+
+    Returns:
+        list[tuple[int, int, str]]: the (start, length, kind) spans, in the order they must be applied.
+    """
+    # the quote format covers the whole line after the bold and italic spans, which are not searched.
+    quote = text[0] == ">" and QUOTE_RE.match(text) is not None
+    line_spans = []
+    if not quote:
+        if LIST_RE.match(text):
+            line_spans.append((0, len(text), LIST))
+        elif text[0] == "#" and HEADER_RE.match(text):
+            line_spans.append((0, len(text), HEADER))
+
+    if "*" not in text and "_" not in text and "`" not in text:
+        if quote:
+            line_spans.append((0, len(text), QUOTE))
+        return line_spans
+
+    bold_spans = []
+    italic_spans = []
+    code_spans = []
+    # the position where each rule may match again, like consecutive finditer() matches.
+    bold_next = italic_next = code_next = 0
+    for delimiter in INLINE_DELIMITER_RE.finditer(text):
+        position = delimiter.start()
+        if text[position] == "`":
+            if position >= code_next:
+                match = CODE_INLINE_RE.match(text, position)
+                if match:
+                    code_spans.append((position, match.end() - position, CODE_INLINE))
+                    code_next = match.end()
+            continue
+        if quote:
+            continue
+        if position >= bold_next and text.startswith(text[position] * 2, position):
+            match = BOLD_RE.match(text, position)
+            if match:
+                bold_spans.append((position, match.end() - position, BOLD))
+                bold_next = match.end()
+        if position >= italic_next:
+            match = ITALIC_RE.match(text, position)
+            if match:
+                italic_spans.append((position, match.end() - position, ITALIC))
+                italic_next = match.end()
+
+    if quote:
+        line_spans.append((0, len(text), QUOTE))
+    return line_spans + bold_spans + italic_spans + code_spans
+
+
+def parse_heading(text: str) -> tuple:
+    """
+    Reads the level and the title of a heading line, one that gets the HEADER span.
+
+    Args:
+        text (str): the text of the line.
+
+    Returns:
+        tuple[int, str]: the number of '#' and the title, without the '#' around it.
+    """
+    level = len(text) - len(text.lstrip("#"))
+    return level, text[level:].strip().rstrip("#").rstrip()
+
+
+def flatten_spans(spans: list) -> list:
+    """
+    Turns overlapping spans into consecutive ones, where the last span applied wins.
+
+    QTextLayout merges the properties of overlapping format ranges, while the
+    spans must replace each other, like consecutive setFormat() calls.
+
+    Args:
+        spans (list[tuple[int, int, str]]): the (start, length, kind) spans, in the order they are applied.
+
+    Returns:
+        list[tuple[int, int, str]]: non-overlapping spans sorted by position.
+    """
+    if len(spans) < 2:
+        return spans
+
+    boundaries = sorted({edge for start, length, _ in spans for edge in (start, start + length)})
+    flat = []
+    for start, end in zip(boundaries, boundaries[1:]):
+        kind = None
+        for span_start, span_length, span_kind in reversed(spans):
+            if span_start <= start < span_start + span_length:
+                kind = span_kind
+                break
+        if kind is None:
+            continue
+        if flat and flat[-1][2] == kind and flat[-1][0] + flat[-1][1] == start:
+            flat[-1] = (flat[-1][0], end - flat[-1][0], kind)
+        else:
+            flat.append((start, end - start, kind))
+    return flat
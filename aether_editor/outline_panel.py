@@ -0,0 +1,89 @@
+"""
+Module containing the OutlinePanel class, the list of the headings of the editor document.
+
+The headings come from the HeadingIndex kept by the highlighter of the editor,
+so the panel never parses the document: it lists them again, at most every
+REFRESH_MS, when the index changes. Jumping to a heading and finding the
+section of the cursor are lookups in the index.
+
+Example:
+    outline = OutlinePanel(editor)
+    layout.addWidget(outline)
+"""
+from PySide6.QtCore import QSignalBlocker, QTimer, Slot
+from PySide6.QtGui import QTextCursor
+from PySide6.QtWidgets import QListWidget, QListWidgetItem, QWidget
+
+from .code_editor import CodeEditor
+
+
+class OutlinePanel(QListWidget):
+    """
+    Headings of the editor document, indented by level, with the section of the cursor selected.
+
+    Clicking a heading puts it at the top of the editor.
+
+    Attributes:
+        editor (CodeEditor): the editor whose headings are listed.
+        refresh_timer (QTimer): single shot timer that lists the headings again after the index changes.
+    """
+    REFRESH_MS = 150
+    INDENT = "    "
+
+    def __init__(self, editor: CodeEditor, parent: QWidget = None):
+        """
+        Initializes the panel and follows the headings and the cursor of the editor.
+
+        Args:
+            editor (CodeEditor): the editor whose headings are listed.
+            parent (QWidget): the parent widget.
+        """
+        super().__init__(parent)
+        self.editor = editor
+        self._entries = []
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.setInterval(self.REFRESH_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+        self.editor.highlighter.headings.changed.connect(self.refresh_timer.start)
+        self.editor.cursorPositionChanged.connect(self.show_current_section)
+        self.itemClicked.connect(self.jump_to_heading)
+
+    @Slot()
+    def refresh(self):
+        """Lists the headings of the index again, if their levels or titles changed."""
+        entries = [(heading.level, heading.title) for heading in self.editor.highlighter.headings.headings()]
+        if entries != self._entries:
+            self._entries = entries
+            with QSignalBlocker(self):
+                self.clear()
+                for level, title in entries:
+                    QListWidgetItem(self.INDENT * (level - 1) + title, self)
+        self.show_current_section()
+
+    @Slot()
+    def show_current_section(self):
+        """Selects the heading of the section where the cursor of the editor is."""
+        if self.count() != len(self.editor.highlighter.headings):
+            return
+        index = self.editor.highlighter.headings.section_at(self.editor.textCursor().position())
+        with QSignalBlocker(self):
+            if index < 0:
+                self.clearSelection()
+            else:
+                self.setCurrentRow(index)
+
+    @Slot(QListWidgetItem)
+    def jump_to_heading(self, item: QListWidgetItem):
+        """
+        Moves the cursor of the editor to a heading and scrolls it to the top.
+
+        Args:
+            item (QListWidgetItem): the item of the heading.
+        """
+        cursor = QTextCursor(self.editor.document())
+        cursor.setPosition(self.editor.highlighter.headings.position(self.row(item)))
+        self.editor.setTextCursor(cursor)
+        self.editor.verticalScrollBar().setValue(cursor.block().firstLineNumber())
+        self.editor.setFocus()
@@ -0,0 +1,423 @@
+"""
+Module containing the background PDF export of Markdown documents.
+
+The export does not print the preview: a QThreadPool worker renders a snapshot
+of the source taken when the export starts, so the PDF never lags behind the
+text while the preview debounce is pending. The worker builds a QTextDocument
+of its own like the preview document, lays it out in steps and paints it page
+by page into a QPdfWriter, like QTextDocument.print_() does, reporting the
+progress after each page and checking for cancellation between the steps.
+PySide holds the GIL during each Qt call, so the work is split in calls short
+enough to keep the window responsive however long the document is.
+
+The PDF is written to a temporary file in the same directory, renamed over the
+destination at the end; a canceled or failed export leaves no partial file.
+
+Example:
+    exporter = MarkdownPdfExporter(parent=self)
+    exporter.progress.connect(lambda page, pages: progress_bar.setValue(page * 100 // pages))
+    exporter.export(editor.toPlainText(), "documento.pdf", get_css_style())
+"""
+import os
+import tempfile
+import threading
+from typing import Callable
+
+from PySide6.QtCore import (
+    QObject,
+    QPointF,
+    QRectF,
+    QRunnable,
+    QSizeF,
+    QThreadPool,
+    QUrl,
+    Qt,
+    Signal,
+    Slot
+)
+from PySide6.QtGui import (
+    QAbstractTextDocumentLayout,
+    QFontMetrics,
+    QGuiApplication,
+    QPageSize,
+    QPainter,
+    QPalette,
+    QPdfWriter,
+    QTextDocument
+)
+
+from .file_saver import PROCESS_UMASK
+from .highlight_cache import CodeHighlightCache
+from .markdown_renderer import MarkdownRenderer
+from .preview_patcher import PreviewDocumentPatcher
+
+PDF_RESOLUTION = 300
+PAGE_MARGIN_CM = 2
+# blocks laid out at a time; the GIL is held during each step.
+LAYOUT_STEP = 200
+
+
+def paginate_pdf_document(document: QTextDocument, writer: QPdfWriter) -> None:
+    """
+    Sets up a filled QTextDocument to be laid out in the pages of a PDF writer.
+
+    The pages get the margins of QTextDocument.print_(): PAGE_MARGIN_CM, given in
+    screen pixels, which the layout scales to the resolution of the writer.
+
+    Args:
+        document (QTextDocument): the document, with its content.
+        writer (QPdfWriter): the writer the pages are laid out for.
+    """
+    document.documentLayout().setPaintDevice(writer)
+    screen = QGuiApplication.primaryScreen()
+    screen_dpi = screen.logicalDotsPerInchY() if screen else 96
+    frame_format = document.rootFrame().frameFormat()
+    frame_format.setMargin(PAGE_MARGIN_CM / 2.54 * screen_dpi)
+    document.rootFrame().setFrameFormat(frame_format)
+    document.setPageSize(QSizeF(writer.width(), writer.height()))
+
+
+def paint_pdf_page(painter: QPainter, document: QTextDocument, index: int) -> None:
+    """
+    Paints one page of a paginated document, with its number at the bottom right.
+
+    Args:
+        painter (QPainter): the painter of the PDF writer.
+        document (QTextDocument): the document set up by paginate_pdf_document().
+        index (int): the index of the page, from 0.
+    """
+    device_dpi = painter.device().logicalDpiY()
+    margin = PAGE_MARGIN_CM / 2.54 * device_dpi
+    page = document.pageSize()
+    view = QRectF(0, index * page.height(), page.width(), page.height())
+
+    painter.save()
+    painter.translate(0, -view.top())
+    painter.setClipRect(view)
+    context = QAbstractTextDocumentLayout.PaintContext()
+    context.clip = view
+    palette = QPalette(context.palette)
+    palette.setColor(QPalette.ColorRole.Text, Qt.GlobalColor.black)
+    context.palette = palette
+    document.documentLayout().draw(painter, context)
+
+    painter.setClipping(False)
+    painter.setFont(document.defaultFont())
+    metrics = QFontMetrics(document.defaultFont(), painter.device())
+    number = str(index + 1)
+    painter.drawText(QPointF(
+        page.width() - margin - metrics.horizontalAdvance(number),
+        view.bottom() - margin + metrics.ascent() + 5 * device_dpi / 72
+    ), number)
+    painter.restore()
+
+
+def write_pdf_document(
+    document: QTextDocument,
+    filename: str,
+    on_page: Callable[[int, int], None] = None,
+    is_canceled: Callable[[], bool] = None
+) -> bool:
+    """
+    Writes a QTextDocument as an A4 PDF file, one page at a time.
+
+    The document is laid out LAYOUT_STEP blocks at a time, then painted page by page
+    into a temporary file, which only replaces the destination when every page is
+    done. Needs a QGuiApplication (the offscreen platform is enough), but not the
+    GUI thread.
+
+    Args:
+        document (QTextDocument): the document; its layout is changed to the pages of the PDF.
+        filename (str): the path of the PDF file.
+        on_page (Callable[[int, int], None] or None): called with the number of pages
+            written and the page count, once the layout is done and after each page.
+        is_canceled (Callable[[], bool] or None): polled between the steps; True stops the export.
+
+    Returns:
+        bool: False if the export was canceled, in which case no file is written.
+    """
+    is_canceled = is_canceled or (lambda: False)
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, temp_name = tempfile.mkstemp(prefix=f".{os.path.basename(filename)}.", suffix=".tmp", dir=directory)
+    os.close(fd)
+    painter = QPainter()
+    try:
+        writer = QPdfWriter(temp_name)
+        writer.setPageSize(QPageSize(QPageSize.PageSizeId.A4))
+        writer.setResolution(PDF_RESOLUTION)
+        paginate_pdf_document(document, writer)
+
+        # pageCount() would lay out the whole document at once.
+        layout = document.documentLayout()
+        for number in range(0, document.blockCount(), LAYOUT_STEP):
+            if is_canceled():
+                return False
+            layout.blockBoundingRect(document.findBlockByNumber(number))
+
+        page_count = document.pageCount()
+        if on_page:
+            on_page(0, page_count)
+        if not painter.begin(writer):
+            raise OSError(f"não foi possível escrever em {filename}")
+        for index in range(page_count):
+            if is_canceled():
+                return False
+            if index:
+                writer.newPage()
+            paint_pdf_page(painter, document, index)
+            if on_page:
+                on_page(index + 1, page_count)
+        painter.end()
+        # a cancel during the last page must not leave the file behind.
+        if is_canceled():
+            return False
+
+        # new files get the permissions they would get from open(), not the private ones of mkstemp.
+        os.chmod(temp_name, 0o666 & ~PROCESS_UMASK)
+        os.replace(temp_name, filename)
+        return True
+    finally:
+        if painter.isActive():
+            painter.end()
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+
+
+def write_pdf(html_document: str, filename: str, base_dir: str = None) -> None:
+    """
+    Lays out an HTML document with QTextDocument and writes it as a PDF file.
+
+    Needs a QGuiApplication (the offscreen platform is enough).
+
+    Args:
+        html_document (str): the styled HTML document.
+        filename (str): the path of the PDF file.
+        base_dir (str or None): the directory used to resolve relative image paths.
+    """
+    document = QTextDocument()
+    if base_dir:
+        document.setBaseUrl(QUrl.fromLocalFile(base_dir + os.sep))
+    document.setHtml(html_document)
+    write_pdf_document(document, filename)
+
+
+class PdfExportSignals(QObject):
+    """
+    Signals emitted by a PdfExportTask, delivered in the thread of the receiver.
+
+    Attributes:
+        progress (Signal(int, int)): number of pages written and page count.
+        finished (Signal(int)): page count of the written file.
+        failed (Signal(str)): error message of a failed export.
+        canceled (Signal()): the worker stopped after a cancel, without writing the file.
+    """
+    progress = Signal(int, int)
+    finished = Signal(int)
+    failed = Signal(str)
+    canceled = Signal()
+
+
+class PdfExportTask(QRunnable):
+    """
+    Worker that renders a snapshot of the Markdown source and writes it as a PDF.
+
+    Attributes:
+        text (str): snapshot of the source taken on the GUI thread.
+        filename (str): the path of the PDF file.
+        css (str): the content of the CSS file of the theme.
+        base_dir (str or None): the directory used to resolve relative image paths.
+        code_cache (CodeHighlightCache or None): the highlighted code shared with the preview.
+        signals (PdfExportSignals): signals used to report the progress and the result.
+    """
+    def __init__(self, text: str, filename: str, css: str, base_dir: str = None, code_cache: CodeHighlightCache = None):
+        super().__init__()
+        self.text = text
+        self.filename = filename
+        self.css = css
+        self.base_dir = base_dir
+        self.code_cache = code_cache
+        self.signals = PdfExportSignals()
+        self._canceled = threading.Event()
+        self._page_count = 0
+
+    def cancel(self) -> None:
+        """Asks the worker to stop at the next page."""
+        self._canceled.set()
+
+    def run(self):
+        """Renders the snapshot, writes the PDF and emits the result (or the error)."""
+        try:
+            rendered_blocks = MarkdownRenderer(code_cache=self.code_cache).render(self.text)
+            if self._canceled.is_set():
+                self.signals.canceled.emit()
+                return
+            document = self._build_document(rendered_blocks)
+            written = write_pdf_document(
+                document, self.filename, on_page=self._report_page, is_canceled=self._canceled.is_set
+            )
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            if written:
+                self.signals.finished.emit(self._page_count)
+            else:
+                self.signals.canceled.emit()
+
+    def _build_document(self, rendered_blocks: list) -> QTextDocument:
+        """
+        Puts the rendered blocks in a new document, the way the preview does.
+
+        Each block is inserted on its own, so the GIL is released between blocks,
+        while setHtml() would hold it for the whole document.
+
+        Args:
+            rendered_blocks (list[RenderedBlock]): the rendered blocks of the document.
+
+        Returns:
+            QTextDocument: the document, owned by the worker thread.
+        """
+        document = QTextDocument()
+        if self.base_dir:
+            document.setBaseUrl(QUrl.fromLocalFile(self.base_dir + os.sep))
+        patcher = PreviewDocumentPatcher(document)
+        patcher.set_style_sheet(self.css)
+        patcher.rebuild(rendered_blocks)
+        return document
+
+    def _report_page(self, page: int, page_count: int) -> None:
+        """
+        Emits the progress of the export.
+
+        Args:
+            page (int): the number of pages written.
+            page_count (int): the page count of the document.
+        """
+        self._page_count = page_count
+        self.signals.progress.emit(page, page_count)
+
+
+class MarkdownPdfExporter(QObject):
+    """
+    Exports Markdown documents to PDF in the background, one export at a time.
+
+    Starting an export cancels the running one. A canceled export is reported by
+    canceled once its worker stopped; one whose file was already written when
+    the cancel was seen is reported by finished instead.
+
+    Attributes:
+        progress (Signal(int, int)): number of pages written and page count; the page
+            count is only known once the layout is done, before the first page.
+        finished (Signal(str, int)): the file name and the page count of a finished export.
+        failed (Signal(str, str)): the file name and the error message of a failed export.
+        canceled (Signal(str)): the file name of a canceled export, once no file will be written.
+        code_cache (CodeHighlightCache or None): the highlighted code shared with the preview.
+    """
+    progress = Signal(int, int)
+    finished = Signal(str, int)
+    failed = Signal(str, str)
+    canceled = Signal(str)
+
+    def __init__(self, parent: QObject = None, thread_pool: QThreadPool = None, code_cache: CodeHighlightCache = None):
+        """
+        Initializes the exporter.
+
+        Args:
+            parent (QObject): the parent object.
+            thread_pool (QThreadPool): the pool that runs the exports, the global pool by default.
+            code_cache (CodeHighlightCache or None): the highlighted code shared with the preview; each export uses a cache of its own if None.
+        """
+        super().__init__(parent)
+        self.thread_pool = thread_pool or QThreadPool.globalInstance()
+        self.code_cache = code_cache
+        self._task = None
+        # the canceled tasks that are still running, by their signals.
+        self._canceled_tasks = {}
+
+    def is_exporting(self) -> bool:
+        """
+        Returns:
+            bool: True while an export is running.
+        """
+        return self._task is not None
+
+    def export(self, text: str, filename: str, css: str, base_dir: str = None) -> None:
+        """
+        Starts exporting a Markdown source, canceling the current export if there is one.
+
+        Args:
+            text (str): the Markdown source, copied on the GUI thread.
+            filename (str): the path of the PDF file.
+            css (str): the content of the CSS file of the theme.
+            base_dir (str or None): the directory used to resolve relative image paths.
+        """
+        self.cancel()
+        self._task = PdfExportTask(text, filename, css, base_dir, self.code_cache)
+        self._task.signals.progress.connect(self._on_progress)
+        self._task.signals.finished.connect(self._on_export_finished)
+        self._task.signals.failed.connect(self._on_export_failed)
+        self._task.signals.canceled.connect(self._on_export_canceled)
+        self.thread_pool.start(self._task)
+
+    @Slot()
+    def cancel(self) -> None:
+        """Stops the current export; the worker removes the partial file, then canceled is emitted."""
+        if self._task is None:
+            return
+        task, self._task = self._task, None
+        task.cancel()
+        self._canceled_tasks[task.signals] = task
+
+    @Slot(int, int)
+    def _on_progress(self, page: int, page_count: int):
+        """
+        Forwards the progress of the current export.
+
+        Args:
+            page (int): the number of pages written.
+            page_count (int): the page count of the document.
+        """
+        if self._task is not None and self.sender() is self._task.signals:
+            self.progress.emit(page, page_count)
+
+    @Slot(int)
+    def _on_export_finished(self, page_count: int):
+        """
+        Reports a finished export.
+
+        Args:
+            page_count (int): the page count of the written file.
+        """
+        canceled_task = self._canceled_tasks.pop(self.sender(), None)
+        if canceled_task is not None:
+            # the file was written before the worker saw the cancel.
+            self.finished.emit(canceled_task.filename, page_count)
+            return
+        if self._task is None or self.sender() is not self._task.signals:
+            return
+        filename, self._task = self._task.filename, None
+        self.finished.emit(filename, page_count)
+
+    @Slot(str)
+    def _on_export_failed(self, message: str):
+        """
+        Reports a failed export.
+
+        Args:
+            message (str): the error message.
+        """
+        canceled_task = self._canceled_tasks.pop(self.sender(), None)
+        if canceled_task is not None:
+            # no file was written, as asked by the cancel.
+            self.canceled.emit(canceled_task.filename)
+            return
+        if self._task is None or self.sender() is not self._task.signals:
+            return
+        filename, self._task = self._task.filename, None
+        self.failed.emit(filename, message)
+
+    @Slot()
+    def _on_export_canceled(self):
+        """Reports a canceled export, once its worker stopped."""
+        canceled_task = self._canceled_tasks.pop(self.sender(), None)
+        if canceled_task is not None:
+            self.canceled.emit(canceled_task.filename)
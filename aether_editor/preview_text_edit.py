@@ -0,0 +1,165 @@
+"""
+Module containing the PreviewTextEdit class, the view of the rendered preview.
+
+The images of the preview are not read by the layout on the GUI thread:
+loadResource() asks the shared ImageLoader for them and answers with a
+placeholder while they are decoded in the background. Once an image is ready it
+is added to the document and only the characters showing it are laid out again.
+
+Example:
+    preview = PreviewTextEdit(image_loader)
+    preview.set_base_dir(os.path.dirname(filename))
+"""
+import os
+
+from PySide6.QtCore import QTimer, QUrl, Slot
+from PySide6.QtGui import QColor, QImage, QTextDocument
+from PySide6.QtWidgets import QTextEdit, QWidget
+
+from .image_loader import ImageLoader, image_key
+
+# the character that stands for an image in the text of a QTextDocument
+OBJECT_REPLACEMENT_CHARACTER = "\ufffc"
+
+
+class PreviewTextEdit(QTextEdit):
+    """
+    Read-only preview whose images are decoded in the background.
+
+    Attributes:
+        image_loader (ImageLoader): decodes and caches the images, shared with the other previews.
+        relayout_timer (QTimer): single shot timer that lays out the images that became ready, together.
+    """
+    PLACEHOLDER_SIZE = (160, 90)
+    RELAYOUT_DELAY_MS = 30
+
+    def __init__(self, image_loader: ImageLoader = None, parent: QWidget = None):
+        """
+        Initializes an empty read-only preview.
+
+        Args:
+            image_loader (ImageLoader or None): the loader shared with the other previews; a new one if None.
+            parent (QWidget): the parent widget.
+        """
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.image_loader = image_loader or ImageLoader(self)
+        self.image_loader.loaded.connect(self._on_image_loaded)
+        self._placeholder = QImage(*self.PLACEHOLDER_SIZE, QImage.Format.Format_ARGB32_Premultiplied)
+        self._placeholder.fill(QColor(128, 128, 128, 60))
+        # the version of the file shown for each image URL, and the URLs waiting for each version.
+        self._image_keys = {}
+        self._waiting = {}
+        self._ready = set()
+        self.relayout_timer = QTimer(self)
+        self.relayout_timer.setSingleShot(True)
+        self.relayout_timer.setInterval(self.RELAYOUT_DELAY_MS)
+        self.relayout_timer.timeout.connect(self._relayout_images)
+
+    def set_base_dir(self, directory: str) -> None:
+        """
+        Sets the directory the relative paths of the images are resolved from.
+
+        Args:
+            directory (str or None): the directory of the document; None for the working directory.
+        """
+        self.document().setBaseUrl(QUrl.fromLocalFile(directory + os.sep) if directory else QUrl())
+
+    def loadResource(self, type: int, name: QUrl):
+        """
+        Answers the images of local files from the cache of the ImageLoader, or with a placeholder.
+
+        Called by the layout of the document, on the GUI thread, the first time an
+        image is needed; the other resources are loaded by QTextEdit.
+
+        Args:
+            type (int): the QTextDocument.ResourceType of the resource.
+            name (QUrl): the URL of the resource, resolved from the base URL of the document.
+
+        Returns:
+            the QImage of an image; what QTextEdit.loadResource returns otherwise.
+        """
+        if type != QTextDocument.ResourceType.ImageResource:
+            return super().loadResource(type, name)
+        if name.isLocalFile():
+            path = name.toLocalFile()
+        elif not name.scheme():
+            path = name.path()
+        else:
+            return super().loadResource(type, name)
+
+        key, image = self.image_loader.request(path, self._max_image_width())
+        if key is None:
+            return super().loadResource(type, name)
+        url = name.toString()
+        self._image_keys[url] = key
+        if image is None:
+            self._waiting.setdefault(key, set()).add(url)
+            return self._placeholder
+        # an image that could not be decoded keeps the placeholder.
+        return self._placeholder if image.isNull() else image
+
+    @Slot()
+    def refresh_images(self) -> None:
+        """Loads again the images whose files were modified since they were shown."""
+        for url, key in list(self._image_keys.items()):
+            current = image_key(key[0])
+            if current is None or current == key:
+                continue
+            current, image = self.image_loader.request(key[0], self._max_image_width())
+            self._image_keys[url] = current
+            if image is None:
+                self._waiting.setdefault(current, set()).add(url)
+            elif not image.isNull():
+                self._show_image(url, image)
+
+    def _max_image_width(self) -> int:
+        """
+        Returns:
+            int: the width the images are scaled down to, the width of the screen, so they are decoded once.
+        """
+        return self.screen().availableGeometry().width()
+
+    @Slot(object)
+    def _on_image_loaded(self, key: tuple):
+        """
+        Shows a decoded image in place of its placeholder.
+
+        Args:
+            key (tuple[str, int]): the path and the modification time of the image.
+        """
+        urls = self._waiting.pop(key, None)
+        if not urls:
+            return
+        image = self.image_loader.cached(key)
+        if image is None or image.isNull():
+            return
+        for url in urls:
+            # the file may have changed again while it was decoded.
+            if self._image_keys.get(url) == key:
+                self._show_image(url, image)
+
+    def _show_image(self, url: str, image: QImage) -> None:
+        """
+        Replaces the image of a URL in the document, and schedules the layout of its characters.
+
+        Args:
+            url (str): the resolved URL of the image.
+            image (QImage): the image.
+        """
+        self.document().addResource(QTextDocument.ResourceType.ImageResource, QUrl(url), image)
+        self._ready.add(url)
+        self.relayout_timer.start()
+
+    @Slot()
+    def _relayout_images(self):
+        """Lays out again the characters of the images that became ready."""
+        document = self.document()
+        base_url = document.baseUrl()
+        ready, self._ready = self._ready, set()
+        cursor = document.find(OBJECT_REPLACEMENT_CHARACTER)
+        while not cursor.isNull():
+            char_format = cursor.charFormat()
+            if char_format.isImageFormat() and base_url.resolved(QUrl(char_format.toImageFormat().name())).toString() in ready:
+                document.markContentsDirty(cursor.selectionStart(), 1)
+            cursor = document.find(OBJECT_REPLACEMENT_CHARACTER, cursor)
@@ -0,0 +1,325 @@
+"""
+Module containing the background render pipeline of the Markdown preview.
+
+The Markdown conversion (and the Pygments highlighting done by codehilite) runs
+in a QThreadPool worker, so typing never waits for the preview. Every request
+receives a generation number; results of superseded requests are dropped and
+only the most recent one is handed back to the GUI thread, where the preview
+document is patched.
+
+The debounce interval is not fixed: AdaptiveDebouncePolicy chooses it from the
+measured duration of recent renders, the size of the document and the typing
+rate, and a maximum staleness guarantees the preview is updated from time to
+time even while the user types without pause.
+
+Example:
+    scheduler = PreviewRenderScheduler(renderer, editor.toPlainText, parent=self)
+    scheduler.rendered.connect(self.update_preview)
+    editor.textChanged.connect(scheduler.schedule)
+"""
+import time
+from typing import Callable
+
+from PySide6.QtCore import (
+    QObject,
+    QRunnable,
+    QThreadPool,
+    QTimer,
+    Signal,
+    Slot
+)
+
+from .instrumentation import span
+from .markdown_renderer import MarkdownRenderer
+
+
+class RenderSignals(QObject):
+    """
+    Signals emitted by a PreviewRenderTask, delivered in the thread of the receiver.
+
+    Attributes:
+        finished (Signal(int, object)): generation of the request and the list of RenderedBlock.
+        failed (Signal(int, str)): generation of the request and the error message.
+    """
+    finished = Signal(int, object)
+    failed = Signal(int, str)
+
+
+class PreviewRenderTask(QRunnable):
+    """
+    Worker that converts a snapshot of the Markdown source into HTML.
+
+    Attributes:
+        renderer (MarkdownRenderer): the render engine of the document.
+        text (str): snapshot of the source taken on the GUI thread.
+        generation (int): generation number of the request.
+        signals (RenderSignals): signals used to report the result.
+    """
+    def __init__(self, renderer: MarkdownRenderer, text: str, generation: int):
+        super().__init__()
+        self.renderer = renderer
+        self.text = text
+        self.generation = generation
+        self.signals = RenderSignals()
+
+    def run(self):
+        """Renders the snapshot and emits the result (or the error)."""
+        try:
+            with span("render"):
+                rendered_blocks = self.renderer.render(self.text)
+        except Exception as e:
+            self.signals.failed.emit(self.generation, str(e))
+        else:
+            self.signals.finished.emit(self.generation, rendered_blocks)
+
+
+class AdaptiveDebouncePolicy:
+    """
+    Chooses the debounce interval of the preview from measured costs.
+
+    Cheap renders are started almost immediately after an edit. Expensive ones
+    wait a little longer than the render itself takes (plus a penalty for large
+    documents) and at least a little longer than the usual gap between the
+    keystrokes of the user, so they are only started on real pauses. While the
+    user keeps typing, the preview is still refreshed once the oldest unrendered
+    edit reaches the maximum staleness.
+
+    Attributes:
+        min_interval (int): the shortest debounce interval, in milliseconds.
+        max_interval (int): the longest debounce interval, in milliseconds.
+        render_ms (float or None): moving average of the render durations, in milliseconds.
+        typing_gap_ms (float or None): moving average of the time between edits, in milliseconds.
+        document_size (int): number of characters of the last rendered snapshot.
+    """
+    CHEAP_RENDER_MS = 20
+    PAUSE_MS = 2000
+    SMOOTHING = 0.3
+
+    def __init__(self, initial_interval: int = 200, min_interval: int = 30, max_interval: int = 1000):
+        self.initial_interval = initial_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.render_ms = None
+        self.typing_gap_ms = None
+        self.document_size = 0
+        self._last_edit = None
+
+    def record_edit(self, now: float) -> None:
+        """
+        Registers an edit, updating the typing rate.
+
+        Args:
+            now (float): the time of the edit, from time.monotonic().
+        """
+        if self._last_edit is not None:
+            gap = (now - self._last_edit) * 1000
+            if gap < self.PAUSE_MS:
+                self.typing_gap_ms = self._smooth(self.typing_gap_ms, gap)
+        self._last_edit = now
+
+    def record_render(self, duration_ms: float, document_size: int) -> None:
+        """
+        Registers the duration of a finished render.
+
+        Args:
+            duration_ms (float): the time the render took, in milliseconds.
+            document_size (int): the number of characters of the rendered text.
+        """
+        self.render_ms = self._smooth(self.render_ms, duration_ms)
+        self.document_size = document_size
+
+    def interval(self) -> int:
+        """
+        Returns:
+            int: the debounce interval to use after an edit, in milliseconds.
+        """
+        if self.render_ms is None:
+            return self.initial_interval
+        if self.render_ms < self.CHEAP_RENDER_MS:
+            interval = self.min_interval + self.render_ms
+        else:
+            size_penalty = 20 * self.document_size / 100_000
+            interval = 1.5 * self.render_ms + size_penalty
+            if self.typing_gap_ms is not None:
+                interval = max(interval, 1.2 * self.typing_gap_ms)
+        return int(min(max(interval, self.min_interval), self.max_interval))
+
+    def max_staleness(self) -> int:
+        """
+        Returns:
+            int: the longest time an edit may wait for the preview, in milliseconds.
+        """
+        render_ms = self.render_ms or 0
+        return int(min(max(2 * self.interval(), 4 * render_ms, 500), 3000))
+
+    def describe(self) -> str:
+        """
+        Returns:
+            str: a short description of the current policy, for the status label.
+        """
+        if self.render_ms is None:
+            return f"espera {self.interval()} ms"
+        return (
+            f"espera {self.interval()} ms, render {self.render_ms:.0f} ms, "
+            f"máx. {self.max_staleness()} ms"
+        )
+
+    def _smooth(self, average: float, value: float) -> float:
+        """
+        Updates an exponential moving average.
+
+        Args:
+            average (float or None): the current average, None if there is no sample yet.
+            value (float): the new sample.
+
+        Returns:
+            float: the updated average.
+        """
+        if average is None:
+            return value
+        return average + self.SMOOTHING * (value - average)
+
+
+class PreviewRenderScheduler(QObject):
+    """
+    Debounced scheduler that keeps at most one render in flight per document.
+
+    schedule() restarts the debounce timer and advances the generation. When the
+    timer fires, a snapshot of the text is sent to the thread pool, unless a render
+    is already running; in that case the new request waits and is started as soon
+    as the running one finishes. Results whose generation is older than the latest
+    request are discarded, so the preview never goes back to an outdated state.
+
+    The debounce interval comes from an AdaptiveDebouncePolicy, fed with the
+    duration of each render and the time of each edit. The timer is never pushed
+    beyond the maximum staleness counted from the oldest edit not yet rendered.
+
+    Attributes:
+        rendered (Signal(object)): emitted on the GUI thread with the rendered blocks of the latest request.
+        failed (Signal(str)): emitted on the GUI thread with the error message of a failed render.
+        renderer (MarkdownRenderer): the render engine of the document.
+        generation (int): number of the most recent request.
+        debounce_timer (QTimer): single shot timer that delays the render while the user types.
+        policy (AdaptiveDebouncePolicy): chooses the debounce interval.
+    """
+    rendered = Signal(object)
+    failed = Signal(str)
+
+    def __init__(
+        self,
+        renderer: MarkdownRenderer,
+        text_source: Callable[[], str],
+        parent: QObject = None,
+        policy: AdaptiveDebouncePolicy = None,
+        thread_pool: QThreadPool = None
+    ):
+        """
+        Initializes the scheduler.
+
+        Args:
+            renderer (MarkdownRenderer): the render engine of the document.
+            text_source (Callable[[], str]): returns the current Markdown source (called on the GUI thread).
+            parent (QObject): the parent object.
+            policy (AdaptiveDebouncePolicy): the debounce policy, a default one if not given.
+            thread_pool (QThreadPool): the pool that runs the renders, the global pool by default.
+        """
+        super().__init__(parent)
+        self.renderer = renderer
+        self.text_source = text_source
+        self.thread_pool = thread_pool or QThreadPool.globalInstance()
+        self.policy = policy or AdaptiveDebouncePolicy()
+        self.generation = 0
+        self._in_flight = None
+        self._render_started = 0.0
+        self._snapshot_size = 0
+        self._oldest_pending_edit = None
+        self._first_render = True
+
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.timeout.connect(self._start_render)
+
+    def is_busy(self) -> bool:
+        """
+        Informs if there is a render running or waiting for the debounce.
+
+        Returns:
+            bool: True while the preview is not up to date with the last request.
+        """
+        return self._in_flight is not None or self.debounce_timer.isActive()
+
+    @Slot()
+    def schedule(self):
+        """
+        Registers a new request and (re)starts the debounce timer.
+
+        The timer gets the interval chosen by the policy, shortened if needed so the
+        oldest unrendered edit does not wait longer than the maximum staleness.
+        """
+        now = time.monotonic()
+        self.generation += 1
+        self.policy.record_edit(now)
+        if self._oldest_pending_edit is None:
+            self._oldest_pending_edit = now
+
+        waited = (now - self._oldest_pending_edit) * 1000
+        delay = min(self.policy.interval(), max(0, self.policy.max_staleness() - waited))
+        self.debounce_timer.start(int(delay))
+
+    @Slot()
+    def render_now(self):
+        """Registers a new request and starts it without waiting for the debounce."""
+        self.generation += 1
+        self.debounce_timer.stop()
+        self._start_render()
+
+    @Slot()
+    def _start_render(self):
+        """Sends a snapshot of the current text to the pool, if no render is running."""
+        if self._in_flight is not None:
+            return
+
+        with span("toPlainText"):
+            text = self.text_source()
+        self._snapshot_size = len(text)
+        self._oldest_pending_edit = None
+        self._render_started = time.monotonic()
+        task = PreviewRenderTask(self.renderer, text, self.generation)
+        task.signals.finished.connect(self._on_render_finished)
+        task.signals.failed.connect(self._on_render_failed)
+        self._in_flight = task
+        self.thread_pool.start(task)
+
+    @Slot(int, object)
+    def _on_render_finished(self, generation: int, rendered_blocks: list):
+        """
+        Receives the result of a render on the GUI thread.
+
+        Args:
+            generation (int): the generation of the finished request.
+            rendered_blocks (list[RenderedBlock]): the rendered blocks of the document.
+        """
+        self._in_flight = None
+        # the first render also imports markdown and Pygments, which says nothing about the next ones.
+        if not self._first_render:
+            self.policy.record_render((time.monotonic() - self._render_started) * 1000, self._snapshot_size)
+        self._first_render = False
+        if generation == self.generation:
+            self.rendered.emit(rendered_blocks)
+        elif not self.debounce_timer.isActive():
+            self._start_render()
+
+    @Slot(int, str)
+    def _on_render_failed(self, generation: int, message: str):
+        """
+        Receives the error of a failed render on the GUI thread.
+
+        Args:
+            generation (int): the generation of the failed request.
+            message (str): the error message.
+        """
+        self._in_flight = None
+        if generation == self.generation:
+            self.failed.emit(message)
+        elif not self.debounce_timer.isActive():
+            self._start_render()
@@ -0,0 +1,75 @@
+"""
+Module containing the map between the source lines and the rendered blocks of the preview.
+
+The renderer already knows the source lines of each top-level block it converts
+(MarkdownBlock.first_line and last_line), and the blocks of the preview are the
+rendered blocks in the same order. SourceMap keeps those line numbers in two
+sorted lists, so going from a line of the editor to a block of the preview, or
+back, is a binary search that never scans the text or the preview document.
+
+Positions are fractional: a line inside a block of three lines is a third of
+the way through it, so the scroll of the editor and of the preview can follow
+each other smoothly inside a long block.
+
+Example:
+    source_map = SourceMap(renderer.render(text))
+    index, fraction = source_map.block_at_line(120.5)
+    line = source_map.line_at_block(index, fraction)
+"""
+import bisect
+
+
+class SourceMap:
+    """
+    Sorted line ranges of the rendered blocks of a document.
+
+    Attributes:
+        first_lines (list[int]): the first source line of each rendered block, in increasing order.
+        last_lines (list[int]): the last source line (inclusive) of each rendered block.
+    """
+    def __init__(self, rendered_blocks: list = ()):
+        """
+        Builds the map of a render.
+
+        Args:
+            rendered_blocks (list[RenderedBlock]): the result of MarkdownRenderer.render().
+        """
+        self.first_lines = [block.source.first_line for block in rendered_blocks]
+        self.last_lines = [block.source.last_line for block in rendered_blocks]
+
+    def __len__(self) -> int:
+        return len(self.first_lines)
+
+    def block_at_line(self, line: float) -> tuple:
+        """
+        Finds the rendered block of a source line.
+
+        The blank lines between two blocks belong to the end of the previous one.
+
+        Args:
+            line (float): the source line, from 0, with the fraction of the line.
+
+        Returns:
+            tuple[int, float]: the index of the block and how far into it the line is, from 0 to 1;
+                (-1, 0.0) if the map is empty.
+        """
+        if not self.first_lines:
+            return -1, 0.0
+        index = max(0, bisect.bisect_right(self.first_lines, line) - 1)
+        first = self.first_lines[index]
+        length = self.last_lines[index] - first + 1
+        return index, min(1.0, max(0.0, (line - first) / length))
+
+    def line_at_block(self, index: int, fraction: float) -> float:
+        """
+        Finds the source line at a point of a rendered block.
+
+        Args:
+            index (int): the index of the block.
+            fraction (float): how far into the block the point is, from 0 to 1.
+
+        Returns:
+            float: the source line, with the fraction of the line.
+        """
+        first = self.first_lines[index]
+        return first + fraction * (self.last_lines[index] - first + 1)
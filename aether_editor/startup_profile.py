@@ -0,0 +1,66 @@
+"""
+Module containing the timing report of the startup of the editor (main.py --profile-startup).
+
+StartupProfile records the moment each phase of the startup ends, counted from
+its creation at the top of main.py, and formats a table with the duration of
+each phase and the time elapsed until its end. Creating it and marking phases
+is cheap, so main.py always records them and only prints the report on demand.
+
+Example:
+    profile = StartupProfile()
+    from PySide6.QtWidgets import QApplication
+    profile.mark("importação do Qt")
+    print(profile.report())
+"""
+import time
+
+
+class StartupProfile:
+    """
+    Records the end of the phases of the startup.
+
+    Attributes:
+        start (float): the time the profile was created, from time.perf_counter().
+        phases (list[tuple[str, float]]): the name of each phase and the time it ended, in order.
+    """
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = []
+
+    def mark(self, name: str) -> None:
+        """
+        Ends a phase, which started at the end of the previous one.
+
+        Args:
+            name (str): the name of the phase.
+        """
+        self.phases.append((name, time.perf_counter()))
+
+    def elapsed(self, name: str) -> float:
+        """
+        Returns the time from the start of the profile to the end of a phase.
+
+        Args:
+            name (str): the name of the phase.
+
+        Returns:
+            float or None: the time in milliseconds, or None if the phase did not end.
+        """
+        for phase, end in self.phases:
+            if phase == name:
+                return (end - self.start) * 1000
+        return None
+
+    def report(self) -> str:
+        """
+        Formats the duration of each phase and the total time until its end.
+
+        Returns:
+            str: one line per phase, in milliseconds.
+        """
+        lines = [f"{'fase':<24}{'duração':>12}{'total':>12}"]
+        previous = self.start
+        for name, end in self.phases:
+            lines.append(f"{name:<24}{(end - previous) * 1000:>9.1f} ms{(end - self.start) * 1000:>9.1f} ms")
+            previous = end
+        return "\n".join(lines)
@@ -0,0 +1,596 @@
+"""
+Module containing the find and replace engine of the editor.
+
+The text is searched by a QThreadPool worker, a chunk of lines at a time, and
+the matches of each chunk are streamed back to the GUI thread, so searching a
+document of a hundred thousand lines never blocks typing. The matches are kept
+as two sorted lists of positions: the editor asks only for the ones in view.
+
+An edit truncates the matches at the edited line and, after SEARCH_DELAY_MS
+without edits, searches again from that line only. Until the new matches of a
+region arrive, the old ones below the edit stay on screen, moved by the length
+of the edit, so they do not flicker while typing.
+
+Patterns are matched with re.MULTILINE, one chunk of whole lines at a time: '^'
+and '$' match at each line, and a match never spans two chunks. The positions
+of Python strings count code points while the ones of QTextDocument count
+UTF-16 units, so the positions after a character outside the BMP are converted.
+
+The GIL is held by the worker while it runs Python code, and the GUI thread
+waits for it after each Qt call, so the worker collects the positions of the
+matches in C (map(re.Match.span)) and only falls back to Python loops for the
+rare chunks with empty matches or characters outside the BMP.
+
+Example:
+    search = TextSearch(editor.document(), parent=editor)
+    search.changed.connect(editor.update_search_selections)
+    search.search("TODO|FIXME", regex=True)
+"""
+import bisect
+import itertools
+import operator
+import re
+import threading
+
+from PySide6.QtCore import (
+    QObject,
+    QRunnable,
+    QThreadPool,
+    QTimer,
+    Signal,
+    Slot
+)
+from PySide6.QtGui import QTextCursor, QTextDocument
+from shiboken6 import isValid
+
+CHUNK_CHARS = 64 * 1024
+SEARCH_DELAY_MS = 200
+# the matches found by a running search are reported at most this often
+REPORT_INTERVAL_MS = 50
+
+# characters that take two UTF-16 units in QTextDocument
+_ASTRAL = re.compile("[\U00010000-\U0010FFFF]")
+_SPAN = re.Match.span
+
+
+def compile_query(query: str, regex: bool = False, case_sensitive: bool = False) -> re.Pattern:
+    """
+    Compiles the text typed in the find field.
+
+    Args:
+        query (str): the text or the regular expression.
+        regex (bool): the query is a regular expression; otherwise it is found literally.
+        case_sensitive (bool): upper and lower case letters are different.
+
+    Returns:
+        re.Pattern: the compiled pattern.
+
+    Raises:
+        re.error: the regular expression is invalid.
+    """
+    flags = re.MULTILINE if case_sensitive else re.MULTILINE | re.IGNORECASE
+    return re.compile(query if regex else re.escape(query), flags)
+
+
+def text_chunks(text: str):
+    """
+    Splits a text in chunks of whole lines, of about CHUNK_CHARS characters.
+
+    Args:
+        text (str): the text, with '\\n' between the lines.
+
+    Yields:
+        tuple[int, int]: the start and the end of each chunk.
+    """
+    start = 0
+    while start < len(text):
+        end = text.find("\n", start + CHUNK_CHARS)
+        end = len(text) if end < 0 else end + 1
+        yield start, end
+        start = end
+
+
+def find_matches(pattern: re.Pattern, text: str):
+    """
+    Finds the matches of a pattern, a chunk of whole lines at a time.
+
+    Empty matches are skipped, since they cannot be highlighted nor replaced visibly.
+
+    Args:
+        pattern (re.Pattern): the compiled pattern.
+        text (str): the text, with '\\n' between the lines.
+
+    Yields:
+        tuple[list[re.Match], int]: the matches of a chunk and the end of the chunk in the text.
+    """
+    for start, end in text_chunks(text):
+        yield [match for match in pattern.finditer(text, start, end) if match.end() > match.start()], end
+
+
+class Utf16Positions:
+    """
+    Converts the indexes of a Python string into positions of a QTextDocument.
+
+    Attributes:
+        base (int): the position in the document of the start of the string.
+        has_astral (bool): the string has characters outside the BMP, so its indexes drift from the positions.
+    """
+    def __init__(self, text: str, base: int = 0):
+        """
+        Args:
+            text (str): the text, as taken from the document.
+            base (int): the position in the document of the start of the text.
+        """
+        self.base = base
+        self._astral = [match.start() for match in _ASTRAL.finditer(text)] if not text.isascii() else []
+        self.has_astral = bool(self._astral)
+
+    def __call__(self, index: int) -> int:
+        """
+        Args:
+            index (int): the index in the string.
+
+        Returns:
+            int: the position in the document.
+        """
+        if not self._astral:
+            return self.base + index
+        return self.base + index + bisect.bisect_left(self._astral, index)
+
+
+def document_text(document: QTextDocument, position: int = 0) -> str:
+    """
+    Copies the text of a document from a position to the end.
+
+    Args:
+        document (QTextDocument): the document.
+        position (int): the first position copied.
+
+    Returns:
+        str: the text, with '\\n' between the lines.
+    """
+    if position == 0:
+        return document.toPlainText()
+    cursor = QTextCursor(document)
+    cursor.setPosition(position)
+    cursor.movePosition(QTextCursor.MoveOperation.End, QTextCursor.MoveMode.KeepAnchor)
+    return cursor.selectedText().replace("\u2029", "\n")
+
+
+class SearchSignals(QObject):
+    """
+    Signals emitted by a SearchTask, delivered in the thread of the receiver.
+
+    Attributes:
+        found (Signal(object, int)): the (start, end) positions of the matches of a chunk and the position searched up to,
+            from the start of the searched text.
+        finished (Signal()): the whole text was searched.
+    """
+    found = Signal(object, int)
+    finished = Signal()
+
+
+class SearchTask(QRunnable):
+    """
+    Worker that finds the matches of a pattern in a copy of the text.
+
+    Attributes:
+        pattern (re.Pattern): the compiled pattern.
+        text (str): the text searched.
+        base (int): the position in the document of the start of the text.
+        signals (SearchSignals): signals used to report the matches.
+    """
+    def __init__(self, pattern: re.Pattern, text: str, base: int = 0):
+        super().__init__()
+        self.pattern = pattern
+        self.text = text
+        self.base = base
+        self.signals = SearchSignals()
+        self._canceled = threading.Event()
+
+    def cancel(self) -> None:
+        """Asks the worker to stop after the current chunk."""
+        self._canceled.set()
+
+    def run(self):
+        """Searches the text, emitting the matches of each chunk that has any."""
+        position = Utf16Positions(self.text)
+        for start, end in text_chunks(self.text):
+            if self._canceled.is_set():
+                return
+            spans = list(map(_SPAN, self.pattern.finditer(self.text, start, end)))
+            if any(itertools.starmap(operator.eq, spans)):
+                spans = [span for span in spans if span[0] != span[1]]
+            if spans:
+                if position.has_astral:
+                    spans = [(position(start), position(end)) for start, end in spans]
+                self.signals.found.emit(spans, position(end))
+        if not self._canceled.is_set():
+            self.signals.finished.emit()
+
+
+class TextSearch(QObject):
+    """
+    Matches of the current query in a document, found in the background and kept up to date with the edits.
+
+    Attributes:
+        changed (Signal()): emitted when matches are found or dropped.
+        finished (Signal(int)): emitted with the number of matches when the whole document was searched.
+        failed (Signal(str)): emitted with the error of an invalid regular expression.
+        thread_pool (QThreadPool): the pool that runs the searches.
+        pattern (re.Pattern or None): the pattern of the current query, None when there is no query.
+        restart_timer (QTimer): single shot timer that searches the edited region again.
+        report_timer (QTimer): single shot timer that emits changed for the matches found since the last report.
+    """
+    changed = Signal()
+    finished = Signal(int)
+    failed = Signal(str)
+
+    def __init__(self, document: QTextDocument, parent: QObject = None, thread_pool: QThreadPool = None):
+        """
+        Initializes the search of a document, without a query.
+
+        Args:
+            document (QTextDocument): the searched document.
+            parent (QObject): the parent object.
+            thread_pool (QThreadPool): the pool that runs the searches, the global pool by default.
+        """
+        super().__init__(parent)
+        self.thread_pool = thread_pool or QThreadPool.globalInstance()
+        self.pattern = None
+        self._regex = False
+        self._document = None
+        self._task = None
+        # matches searched since the last edit, exact and sorted.
+        self._starts = []
+        self._ends = []
+        # the matches are known up to this position; None once the whole document was searched.
+        self._frontier = None
+        # matches found before an edit, beyond the frontier, drawn moved by _stale_delta.
+        self._stale_starts = []
+        self._stale_ends = []
+        self._stale_delta = 0
+        self._restart_from = None
+        self._replacing = False
+
+        self.restart_timer = QTimer(self)
+        self.restart_timer.setSingleShot(True)
+        self.restart_timer.setInterval(SEARCH_DELAY_MS)
+        self.restart_timer.timeout.connect(self._restart)
+        # the chunks come faster than the editor can draw them; their matches are reported together.
+        self.report_timer = QTimer(self)
+        self.report_timer.setSingleShot(True)
+        self.report_timer.setInterval(REPORT_INTERVAL_MS)
+        self.report_timer.timeout.connect(self.changed)
+        self.set_document(document)
+
+    def __len__(self) -> int:
+        return len(self._starts) + len(self._stale_starts)
+
+    def set_document(self, document: QTextDocument) -> None:
+        """
+        Searches another document with the current query, as after loading a file.
+
+        Args:
+            document (QTextDocument): the new document.
+        """
+        # the document created by the editor is deleted when it is replaced.
+        if self._document is not None and isValid(self._document):
+            self._document.contentsChange.disconnect(self._on_contents_change)
+        self._document = document
+        document.contentsChange.connect(self._on_contents_change)
+        if self.pattern is not None:
+            self._forget_matches()
+            self._start(0)
+
+    def is_searching(self) -> bool:
+        """
+        Returns:
+            bool: True while part of the document was not searched yet.
+        """
+        return self._frontier is not None
+
+    def search(self, query: str, regex: bool = False, case_sensitive: bool = False) -> bool:
+        """
+        Starts finding a query in the whole document, forgetting the previous matches.
+
+        Args:
+            query (str): the text or the regular expression; an empty query clears the search.
+            regex (bool): the query is a regular expression.
+            case_sensitive (bool): upper and lower case letters are different.
+
+        Returns:
+            bool: False if the regular expression is invalid (failed is emitted).
+        """
+        if not query:
+            self.clear()
+            return True
+        try:
+            pattern = compile_query(query, regex, case_sensitive)
+        except re.error as e:
+            self.clear()
+            self.failed.emit(str(e))
+            return False
+        self.pattern = pattern
+        self._regex = regex
+        self._forget_matches()
+        self._start(0)
+        return True
+
+    @Slot()
+    def clear(self) -> None:
+        """Cancels the search and forgets the query and the matches."""
+        self.pattern = None
+        self._cancel_task()
+        self.restart_timer.stop()
+        self._restart_from = self._frontier = None
+        self._forget_matches()
+        self.changed.emit()
+
+    def matches_between(self, first: int, last: int) -> list:
+        """
+        Finds the matches that overlap a range of the document, as the visible one.
+
+        Args:
+            first (int): the first position of the range.
+            last (int): the last position of the range.
+
+        Returns:
+            list[tuple[int, int]]: the start and the end of each match, in order.
+        """
+        begin = bisect.bisect_right(self._ends, first)
+        end = bisect.bisect_right(self._starts, last)
+        matches = list(zip(self._starts[begin:end], self._ends[begin:end]))
+        if self._stale_starts:
+            delta = self._stale_delta
+            begin = bisect.bisect_right(self._stale_ends, first - delta)
+            end = bisect.bisect_right(self._stale_starts, last - delta)
+            matches += [(start + delta, end + delta) for start, end in zip(self._stale_starts[begin:end], self._stale_ends[begin:end])]
+        return matches
+
+    def next_match(self, position: int) -> tuple:
+        """
+        Finds the first match that starts at or after a position, going back to the first one at the end.
+
+        Args:
+            position (int): the position in the document, as the end of the selection.
+
+        Returns:
+            tuple[int, int] or None: the start and the end of the match, None if there is no match.
+        """
+        if not len(self):
+            return None
+        index = bisect.bisect_left(self._starts, position)
+        if index == len(self._starts):
+            index += bisect.bisect_left(self._stale_starts, position - self._stale_delta)
+        return self._match(index % len(self))
+
+    def previous_match(self, position: int) -> tuple:
+        """
+        Finds the last match that ends at or before a position, going round to the last one at the start.
+
+        Args:
+            position (int): the position in the document, as the start of the selection.
+
+        Returns:
+            tuple[int, int] or None: the start and the end of the match, None if there is no match.
+        """
+        if not len(self):
+            return None
+        index = bisect.bisect_right(self._stale_ends, position - self._stale_delta)
+        if index:
+            index += len(self._starts)
+        else:
+            index = bisect.bisect_right(self._ends, position)
+        return self._match((index - 1) % len(self))
+
+    def replacement(self, start: int, end: int, template: str) -> str:
+        """
+        Expands the replacement of a match, with the groups of a regular expression (\\1, \\g<name>);
+        the replacement of a plain query is taken literally.
+
+        Args:
+            start (int): the start of the match in the document.
+            end (int): the end of the match in the document.
+            template (str): the replacement typed by the user.
+
+        Returns:
+            str or None: the text that replaces the match, None if the text there is no longer a match.
+        """
+        block = self._document.findBlock(start)
+        base = block.position()
+        line_end = self._document.findBlock(end)
+        cursor = QTextCursor(self._document)
+        cursor.setPosition(base)
+        cursor.setPosition(line_end.position() + line_end.length() - 1, QTextCursor.MoveMode.KeepAnchor)
+        text = cursor.selectedText().replace("\u2029", "\n")
+        position = Utf16Positions(text, base)
+        for match in self.pattern.finditer(text):
+            if position(match.start()) == start and position(match.end()) == end:
+                return self._expand(match, template)
+        return None
+
+    def replace_all(self, template: str) -> int:
+        """
+        Replaces every match of the query in the document, as a single undo step.
+
+        The document is searched again on the GUI thread, so the replacements
+        never use matches that are not up to date.
+
+        Args:
+            template (str): the replacement, with the groups of a regular expression.
+
+        Returns:
+            int: the number of replaced matches.
+        """
+        if self.pattern is None:
+            return 0
+        self._cancel_task()
+        text = self._document.toPlainText()
+        position = Utf16Positions(text)
+        replacements = [
+            (position(match.start()), position(match.end()), self._expand(match, template))
+            for matches, _ in find_matches(self.pattern, text) for match in matches
+        ]
+        cursor = QTextCursor(self._document)
+        self._replacing = True
+        cursor.beginEditBlock()
+        try:
+            for start, end, replacement in reversed(replacements):
+                cursor.setPosition(start)
+                cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+                cursor.insertText(replacement)
+        finally:
+            cursor.endEditBlock()
+            self._replacing = False
+        self._forget_matches()
+        self._start(0)
+        return len(replacements)
+
+    def _expand(self, match: re.Match, template: str) -> str:
+        """
+        Args:
+            match (re.Match): a match of the query.
+            template (str): the replacement typed by the user.
+
+        Returns:
+            str: the text that replaces the match.
+        """
+        return match.expand(template) if self._regex else template
+
+    def _match(self, index: int) -> tuple:
+        """
+        Args:
+            index (int): the index of a match, counting the exact ones and then the stale ones.
+
+        Returns:
+            tuple[int, int]: the start and the end of the match in the document.
+        """
+        if index < len(self._starts):
+            return self._starts[index], self._ends[index]
+        index -= len(self._starts)
+        return self._stale_starts[index] + self._stale_delta, self._stale_ends[index] + self._stale_delta
+
+    def _start(self, position: int) -> None:
+        """
+        Searches the document from a position to the end, keeping the matches before it.
+
+        Args:
+            position (int): the start of a line.
+        """
+        self._cancel_task()
+        self.restart_timer.stop()
+        self._restart_from = None
+        keep = bisect.bisect_right(self._ends, position)
+        del self._starts[keep:], self._ends[keep:]
+        self._frontier = position
+
+        self._task = SearchTask(self.pattern, document_text(self._document, position), position)
+        self._task.signals.found.connect(self._on_found)
+        self._task.signals.finished.connect(self._on_finished)
+        self.thread_pool.start(self._task)
+        self.changed.emit()
+
+    def _cancel_task(self) -> None:
+        """Stops the running search, whose results are then ignored."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _forget_matches(self) -> None:
+        """Forgets the exact and the stale matches."""
+        self._starts, self._ends = [], []
+        self._drop_stale()
+
+    def _drop_stale(self) -> None:
+        """Forgets the matches found before the last edits."""
+        self._stale_starts, self._stale_ends, self._stale_delta = [], [], 0
+
+    @Slot()
+    def _restart(self):
+        """Searches again from the first line edited since the last search."""
+        if self.pattern is not None and self._restart_from is not None:
+            self._start(self._restart_from)
+
+    @Slot(object, int)
+    def _on_found(self, matches: list, searched_until: int):
+        """
+        Adds the matches of a chunk and drops the old ones it replaces.
+
+        Args:
+            matches (list[tuple[int, int]]): the start and the end of each match, from the start of the searched text.
+            searched_until (int): the position the text was searched up to.
+        """
+        if self._task is None or self.sender() is not self._task.signals:
+            return
+        base = self._task.base
+        if base:
+            self._starts += [start + base for start, _ in matches]
+            self._ends += [end + base for _, end in matches]
+        else:
+            self._starts += map(operator.itemgetter(0), matches)
+            self._ends += map(operator.itemgetter(1), matches)
+        searched_until += base
+        self._frontier = searched_until
+        if self._stale_starts:
+            begin = bisect.bisect_left(self._stale_starts, searched_until - self._stale_delta)
+            del self._stale_starts[:begin], self._stale_ends[:begin]
+        if not self.report_timer.isActive():
+            self.report_timer.start()
+
+    @Slot()
+    def _on_finished(self):
+        """Ends the search, once the whole document was searched."""
+        if self._task is None or self.sender() is not self._task.signals:
+            return
+        self._task = None
+        self._frontier = None
+        self._drop_stale()
+        self.report_timer.stop()
+        self.changed.emit()
+        self.finished.emit(len(self._starts))
+
+    @Slot(int, int, int)
+    def _on_contents_change(self, position: int, removed: int, added: int):
+        """
+        Drops the matches from the edited line on and schedules a new search from there.
+
+        The matches after the edit become stale: they are drawn moved by the length
+        of the edit until the new search reaches them.
+
+        Args:
+            position (int): the position of the edit.
+            removed (int): the number of characters removed.
+            added (int): the number of characters added.
+        """
+        if self.pattern is None or self._replacing:
+            return
+        line_start = self._document.findBlock(position).position()
+        delta = added - removed
+
+        # the stale matches after the edit move with it, the ones on the edited line are dropped;
+        # an edit below some of them drops the ones after it, since they all move by the same length.
+        stale_begin = bisect.bisect_right(self._stale_ends, line_start - self._stale_delta)
+        if stale_begin > 0:
+            del self._stale_starts[stale_begin:], self._stale_ends[stale_begin:]
+        else:
+            stale_after = bisect.bisect_left(self._stale_starts, position + removed - self._stale_delta)
+            del self._stale_starts[:stale_after], self._stale_ends[:stale_after]
+            self._stale_delta += delta
+
+        # the exact matches after the edit become stale, the ones on the edited line are dropped.
+        after = bisect.bisect_left(self._starts, position + removed)
+        if after < len(self._starts):
+            offset = self._stale_delta - delta
+            self._stale_starts[:0] = [start - offset for start in self._starts[after:]]
+            self._stale_ends[:0] = [end - offset for end in self._ends[after:]]
+        keep = bisect.bisect_right(self._ends, line_start)
+        del self._starts[keep:], self._ends[keep:]
+
+        # the text between the frontier of the running search and the edit was not searched yet.
+        restart_from = line_start if self._frontier is None else min(self._frontier, line_start)
+        self._cancel_task()
+        self._restart_from = restart_from if self._restart_from is None else min(self._restart_from, restart_from)
+        self._frontier = self._restart_from
+        self.restart_timer.start()
+        self.changed.emit()
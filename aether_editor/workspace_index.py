@@ -0,0 +1,506 @@
+"""
+Module containing the index of the Markdown documents of a workspace folder.
+
+A WorkspaceIndex knows the title, the headings, the links and the words of every
+document under a folder, so the workspace panel opens and searches documents
+without reading them. The index is kept on disk, in WORKSPACE_INDEX_DIR, and
+updated by a QThreadPool worker: the folder is walked with os.scandir, and only
+the files whose modification time or size changed since the last scan are read
+again. Opening a workspace shows the stored index at once, while the scan runs.
+
+Example:
+    index = WorkspaceIndex(parent=self)
+    index.changed.connect(panel.update_results)
+    index.open("/home/user/docs")
+    documents = index.fuzzy_find("guia inst")
+"""
+import hashlib
+import heapq
+import json
+import os
+import re
+import threading
+import time
+from typing import NamedTuple
+
+from PySide6.QtCore import (
+    QObject,
+    QRunnable,
+    QThreadPool,
+    QTimer,
+    Signal,
+    Slot
+)
+
+from .constants import WORKSPACE_EXTENSIONS, WORKSPACE_INDEX_DIR, WORKSPACE_SKIPPED_DIRS
+from .file_saver import atomic_write_text
+from .markdown_tokenizer import HEADER_RE, STATE_NORMAL, parse_heading, scan_code_fence
+
+INDEX_VERSION = 1
+# changed documents sent to the GUI thread at a time, at least every SCAN_REPORT_INTERVAL seconds
+SCAN_BATCH_SIZE = 200
+SCAN_REPORT_INTERVAL = 0.1
+
+LINK_RE = re.compile(r"\]\(\s*<?([^)\s>]+)")
+REFERENCE_RE = re.compile(r"^ {0,3}\[[^\]]+\]:\s*<?([^\s>]+)", re.MULTILINE)
+WORD_RE = re.compile(r"\w{2,}")
+
+
+class IndexedDocument(NamedTuple):
+    """
+    What the index knows of a document.
+
+    Attributes:
+        path (str): the path relative to the workspace folder, with '/' separators.
+        mtime_ns (int): the modification time of the file when it was read, in nanoseconds.
+        size (int): the size of the file when it was read.
+        title (str): the first level 1 heading, or else the first heading, or else the file name.
+        headings (tuple[tuple[int, str, int], ...]): the level, the title and the line of each heading.
+        links (tuple[str, ...]): the targets of the links and images, without repetitions.
+        words (str): the distinct words in lower case, each one after a line break, so that
+            "\\n" + prefix is found in it when a word starts with the prefix.
+    """
+    path: str
+    mtime_ns: int
+    size: int
+    title: str
+    headings: tuple
+    links: tuple
+    words: str
+
+
+def index_document(path: str, text: str, mtime_ns: int, size: int) -> IndexedDocument:
+    """
+    Reads the title, the headings, the links and the words of a document.
+
+    The headings are the lines the editor highlights as headings, outside fenced code blocks.
+
+    Args:
+        path (str): the path relative to the workspace folder.
+        text (str): the Markdown source.
+        mtime_ns (int): the modification time of the file.
+        size (int): the size of the file.
+
+    Returns:
+        IndexedDocument: the entry of the document.
+    """
+    headings = []
+    state = STATE_NORMAL
+    for number, line in enumerate(text.split("\n")):
+        code_line, state = scan_code_fence(line, state)
+        if not code_line and HEADER_RE.match(line):
+            level, title = parse_heading(line)
+            headings.append((level, title, number))
+
+    name = os.path.splitext(path.rsplit("/", 1)[-1])[0]
+    title = next((title for level, title, _ in headings if level == 1), headings[0][1] if headings else name)
+    links = tuple(dict.fromkeys(LINK_RE.findall(text) + REFERENCE_RE.findall(text)))
+    words = "".join("\n" + word for word in sorted(set(WORD_RE.findall(text.lower()))))
+    return IndexedDocument(path, mtime_ns, size, title or name, tuple(headings), links, words)
+
+
+def walk_documents(root: str):
+    """
+    Finds the Markdown files under a folder, skipping the hidden folders and WORKSPACE_SKIPPED_DIRS.
+
+    Symbolic links to folders are not followed, so a link cannot make the walk loop.
+
+    Args:
+        root (str): the workspace folder.
+
+    Yields:
+        tuple[str, os.stat_result]: the path and the status of each file.
+    """
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                entries = list(entries)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in WORKSPACE_SKIPPED_DIRS:
+                        pending.append(entry.path)
+                elif entry.name.lower().endswith(WORKSPACE_EXTENSIONS) and entry.is_file():
+                    yield entry.path, entry.stat()
+            except OSError:
+                continue
+
+
+def index_path(root: str) -> str:
+    """
+    Args:
+        root (str): the workspace folder.
+
+    Returns:
+        str: the path of the stored index of the folder.
+    """
+    digest = hashlib.blake2b(os.path.abspath(root).encode("utf-8"), digest_size=8).hexdigest()
+    return os.path.join(WORKSPACE_INDEX_DIR, f"{digest}.json")
+
+
+def load_index(root: str) -> dict:
+    """
+    Reads the stored index of a folder.
+
+    Args:
+        root (str): the workspace folder.
+
+    Returns:
+        dict[str, IndexedDocument]: the documents by relative path; empty if there is no usable index.
+    """
+    try:
+        with open(index_path(root), encoding="utf-8") as file:
+            stored = json.load(file)
+        if stored.get("version") != INDEX_VERSION or stored.get("root") != os.path.abspath(root):
+            return {}
+        documents = {}
+        for path, mtime_ns, size, title, headings, links, words in stored["documents"]:
+            documents[path] = IndexedDocument(
+                path, mtime_ns, size, title, tuple(map(tuple, headings)), tuple(links), words
+            )
+        return documents
+    except (OSError, ValueError, KeyError, TypeError):
+        # a missing or damaged index is built again by the scan.
+        return {}
+
+
+def save_index(root: str, documents: dict) -> None:
+    """
+    Stores the index of a folder, replacing the previous one atomically.
+
+    Args:
+        root (str): the workspace folder.
+        documents (dict[str, IndexedDocument]): the documents by relative path.
+    """
+    os.makedirs(WORKSPACE_INDEX_DIR, exist_ok=True)
+    stored = {"version": INDEX_VERSION, "root": os.path.abspath(root), "documents": list(documents.values())}
+    atomic_write_text(index_path(root), json.dumps(stored, ensure_ascii=False), fsync=False)
+
+
+class WorkspaceScanSignals(QObject):
+    """
+    Signals emitted by a WorkspaceScanTask, delivered in the thread of the receiver.
+
+    Attributes:
+        loaded (Signal(object)): the stored index, before the scan (dict[str, IndexedDocument]).
+        updated (Signal(object)): the new and modified documents found so far (list[IndexedDocument]).
+        finished (Signal(object, int)): the relative paths of the removed documents and the number of documents.
+        failed (Signal(str)): the error message of a failed scan.
+    """
+    loaded = Signal(object)
+    updated = Signal(object)
+    finished = Signal(object, int)
+    failed = Signal(str)
+
+
+class WorkspaceScanTask(QRunnable):
+    """
+    Worker that walks the workspace folder and indexes the new and modified documents.
+
+    The index is stored at the end of a scan that changed it.
+
+    Attributes:
+        root (str): the workspace folder.
+        previous (dict[str, IndexedDocument] or None): the current index; None reads the stored one first.
+        signals (WorkspaceScanSignals): signals used to report the progress.
+    """
+    def __init__(self, root: str, previous: dict = None):
+        super().__init__()
+        self.root = root
+        self.previous = previous
+        self.signals = WorkspaceScanSignals()
+        self._canceled = threading.Event()
+
+    def cancel(self) -> None:
+        """Stops the scan; the index is not stored."""
+        self._canceled.set()
+
+    def run(self):
+        """Scans the folder, emitting the changed documents in batches."""
+        try:
+            previous = self.previous
+            if previous is None:
+                previous = load_index(self.root)
+                # the GUI thread updates the documents it receives, while this scan still reads previous.
+                self.signals.loaded.emit(dict(previous))
+            documents = {}
+            changed = []
+            modified = not os.path.exists(index_path(self.root))
+            last_report = time.monotonic()
+            for filename, stat in walk_documents(self.root):
+                if self._canceled.is_set():
+                    return
+                path = os.path.relpath(filename, self.root).replace(os.sep, "/")
+                known = previous.get(path)
+                if known is not None and known.mtime_ns == stat.st_mtime_ns and known.size == stat.st_size:
+                    documents[path] = known
+                    continue
+                try:
+                    with open(filename, encoding="utf-8", errors="replace") as file:
+                        text = file.read()
+                except OSError:
+                    continue
+                documents[path] = document = index_document(path, text, stat.st_mtime_ns, stat.st_size)
+                changed.append(document)
+                modified = True
+                if len(changed) >= SCAN_BATCH_SIZE or time.monotonic() - last_report >= SCAN_REPORT_INTERVAL:
+                    self.signals.updated.emit(changed)
+                    changed = []
+                    last_report = time.monotonic()
+            if changed:
+                self.signals.updated.emit(changed)
+
+            removed = [path for path in previous if path not in documents]
+            if self._canceled.is_set():
+                return
+            if modified or removed:
+                save_index(self.root, documents)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(removed, len(documents))
+
+
+class WorkspaceIndex(QObject):
+    """
+    Index of the Markdown documents of a workspace folder, kept up to date in the background.
+
+    The documents live on the GUI thread; the scans run in the pool, one at a
+    time, and the folder is scanned again every RESCAN_INTERVAL_MS, which only
+    reads the files modified since the last scan.
+
+    Attributes:
+        changed (Signal()): emitted when documents are added, modified or removed.
+        scan_finished (Signal(int)): emitted with the number of documents at the end of a scan.
+        failed (Signal(str)): emitted with the error message of a failed scan.
+        root (str or None): the workspace folder.
+        documents (dict[str, IndexedDocument]): the documents by path relative to root.
+        rescan_timer (QTimer): scans the folder again from time to time.
+    """
+    changed = Signal()
+    scan_finished = Signal(int)
+    failed = Signal(str)
+
+    RESCAN_INTERVAL_MS = 60000
+
+    def __init__(self, parent: QObject = None, thread_pool: QThreadPool = None):
+        """
+        Initializes an index without a folder.
+
+        Args:
+            parent (QObject): the parent object.
+            thread_pool (QThreadPool): the pool that runs the scans, the global pool by default.
+        """
+        super().__init__(parent)
+        self.thread_pool = thread_pool or QThreadPool.globalInstance()
+        self.root = None
+        self.documents = {}
+        self._task = None
+        self.rescan_timer = QTimer(self)
+        self.rescan_timer.setInterval(self.RESCAN_INTERVAL_MS)
+        self.rescan_timer.timeout.connect(self.rescan)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def open(self, root: str) -> None:
+        """
+        Shows the stored index of a folder and starts scanning it.
+
+        Args:
+            root (str): the workspace folder.
+        """
+        self.close()
+        self.root = os.path.abspath(root)
+        self._start(None)
+        self.rescan_timer.start()
+
+    def close(self) -> None:
+        """Forgets the folder, stopping its scan."""
+        self.rescan_timer.stop()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.root = None
+        self.documents = {}
+        self.changed.emit()
+
+    @Slot()
+    def rescan(self) -> None:
+        """Scans the folder again, unless a scan is running."""
+        if self.root is not None and self._task is None:
+            self._start(dict(self.documents))
+
+    def is_scanning(self) -> bool:
+        """
+        Returns:
+            bool: True while the folder is scanned.
+        """
+        return self._task is not None
+
+    def absolute_path(self, document: IndexedDocument) -> str:
+        """
+        Args:
+            document (IndexedDocument): a document of the index.
+
+        Returns:
+            str: the path of its file.
+        """
+        return os.path.join(self.root, *document.path.split("/"))
+
+    def fuzzy_find(self, query: str, limit: int = 100) -> list:
+        """
+        Finds the documents whose file name, title or path has the characters of the query, in order.
+
+        The tightest matches come first, those in the file name before those in the
+        title and in the folders; the spaces of the query are ignored.
+
+        Args:
+            query (str): the characters typed.
+            limit (int): the maximum number of documents.
+
+        Returns:
+            list[IndexedDocument]: the best documents; every document, by path, if the query is empty.
+        """
+        characters = query.replace(" ", "")
+        if not characters:
+            return heapq.nsmallest(limit, self.documents.values(), key=lambda document: document.path)
+        pattern = re.compile(".*?".join(map(re.escape, characters)), re.IGNORECASE)
+
+        scored = []
+        for document in self.documents.values():
+            scores = []
+            match = pattern.search(document.path)
+            if match is not None:
+                name_start = document.path.rfind("/") + 1
+                name_match = pattern.search(document.path, name_start)
+                if name_match is not None:
+                    scores.append(name_match.end() - name_match.start())
+                scores.append(match.end() - match.start() + 3)
+            match = pattern.search(document.title)
+            if match is not None:
+                scores.append(match.end() - match.start() + 1)
+            if scores:
+                scored.append((min(scores), len(document.path), document.path, document))
+        return [document for *_, document in heapq.nsmallest(limit, scored)]
+
+    def search(self, query: str, limit: int = 100) -> list:
+        """
+        Finds the documents with every word of the query, without reading the files.
+
+        A word of the query matches the words of the documents that start with it.
+        The documents with the words in their title, and then in their headings, come first.
+
+        Args:
+            query (str): the words searched.
+            limit (int): the maximum number of documents.
+
+        Returns:
+            list[IndexedDocument]: the documents found; none if the query has no word.
+        """
+        terms = WORD_RE.findall(query.lower())
+        if not terms:
+            return []
+        keys = ["\n" + term for term in terms]
+        scored = []
+        for document in self.documents.values():
+            if all(key in document.words for key in keys):
+                title = document.title.lower()
+                headings = "\n".join(heading for _, heading, _ in document.headings).lower()
+                score = sum(2 * (term in title) + (term in headings) for term in terms)
+                scored.append((-score, document.path, document))
+        return [document for *_, document in heapq.nsmallest(limit, scored)]
+
+    def matching_headings(self, document: IndexedDocument, query: str) -> list:
+        """
+        Args:
+            document (IndexedDocument): a document of the index.
+            query (str): the words searched.
+
+        Returns:
+            list[tuple[int, str, int]]: the headings of the document with a word of the query.
+        """
+        terms = WORD_RE.findall(query.lower())
+        return [heading for heading in document.headings if any(term in heading[1].lower() for term in terms)]
+
+    def _start(self, previous: dict) -> None:
+        """
+        Sends a scan of the folder to the pool.
+
+        Args:
+            previous (dict[str, IndexedDocument] or None): the current documents; None reads the stored index.
+        """
+        task = WorkspaceScanTask(self.root, previous)
+        task.signals.loaded.connect(self._on_scan_loaded)
+        task.signals.updated.connect(self._on_scan_updated)
+        task.signals.finished.connect(self._on_scan_finished)
+        task.signals.failed.connect(self._on_scan_failed)
+        self._task = task
+        self.thread_pool.start(task)
+
+    def _is_current(self) -> bool:
+        """
+        Returns:
+            bool: True if the signal being handled comes from the running scan.
+        """
+        return self._task is not None and self.sender() is self._task.signals
+
+    @Slot(object)
+    def _on_scan_loaded(self, documents: dict):
+        """
+        Shows the stored index while the folder is scanned.
+
+        Args:
+            documents (dict[str, IndexedDocument]): the stored documents.
+        """
+        if self._is_current():
+            self.documents = documents
+            self.changed.emit()
+
+    @Slot(object)
+    def _on_scan_updated(self, documents: list):
+        """
+        Adds the new and modified documents found by the scan.
+
+        Args:
+            documents (list[IndexedDocument]): the documents read again.
+        """
+        if self._is_current():
+            self.documents.update((document.path, document) for document in documents)
+            self.changed.emit()
+
+    @Slot(object, int)
+    def _on_scan_finished(self, removed: list, count: int):
+        """
+        Removes the documents whose files no longer exist.
+
+        Args:
+            removed (list[str]): the relative paths of the removed documents.
+            count (int): the number of documents.
+        """
+        if not self._is_current():
+            return
+        self._task = None
+        for path in removed:
+            self.documents.pop(path, None)
+        if removed:
+            self.changed.emit()
+        self.scan_finished.emit(count)
+
+    @Slot(str)
+    def _on_scan_failed(self, message: str):
+        """
+        Reports a failed scan; the documents found so far are kept.
+
+        Args:
+            message (str): the error message.
+        """
+        if self._is_current():
+            self._task = None
+            self.failed.emit(message)
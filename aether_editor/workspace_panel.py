@@ -0,0 +1,223 @@
+"""
+Module containing the WorkspacePanel class, the documents of a workspace folder.
+
+The panel lists the documents of the WorkspaceIndex of a folder: the first
+field finds a document by the characters of its file name, title or path
+(fuzzy open), and the second one finds the documents with some words anywhere
+in their text. Both only look at the index, which is scanned in the background,
+so every query is answered without reading the files.
+
+Example:
+    panel = WorkspacePanel()
+    panel.open_requested.connect(documents.open_file)
+    panel.open_folder("/home/user/docs")
+"""
+import os
+
+from PySide6.QtCore import QEvent, QObject, Qt, QTimer, Signal, Slot
+from PySide6.QtWidgets import (
+    QFileDialog,
+    QHBoxLayout,
+    QLabel,
+    QLineEdit,
+    QListWidget,
+    QListWidgetItem,
+    QPushButton,
+    QSizePolicy,
+    QVBoxLayout,
+    QWidget
+)
+
+from .workspace_index import WorkspaceIndex
+
+
+class WorkspacePanel(QWidget):
+    """
+    Fuzzy open and search of the documents of a workspace folder.
+
+    Enter opens the first result, or the selected one; Down moves from the fields to the results.
+
+    Attributes:
+        open_requested (Signal(str)): emitted with the path of a document chosen to be opened.
+        index (WorkspaceIndex): the index of the folder.
+        open_field (QLineEdit): the characters of the name, title or path of the document to open.
+        search_field (QLineEdit): the words searched in every document.
+        results (QListWidget): the documents found.
+        status (QLabel): the folder and the number of documents, or the progress of the scan.
+        query_timer (QTimer): single shot timer that lists the results once the typing or the scan pauses.
+    """
+    open_requested = Signal(str)
+
+    QUERY_DELAY_MS = 100
+    MAX_RESULTS = 200
+
+    def __init__(self, parent: QWidget = None):
+        """
+        Initializes the panel without a folder.
+
+        Args:
+            parent (QWidget): the parent widget.
+        """
+        super().__init__(parent)
+        self.index = WorkspaceIndex(self)
+        self._searching = False
+
+        folder_button = QPushButton("Abrir pasta")
+        folder_button.clicked.connect(self.choose_folder)
+        refresh_button = QPushButton("↻")
+        refresh_button.setToolTip("Procurar arquivos novos e modificados")
+        refresh_button.clicked.connect(self.index.rescan)
+        self.open_field = QLineEdit()
+        self.open_field.setPlaceholderText("Abrir arquivo (nome ou título)")
+        self.search_field = QLineEdit()
+        self.search_field.setPlaceholderText("Buscar nos documentos")
+        self.results = QListWidget()
+        self.status = QLabel("nenhuma pasta aberta")
+        # the status changes while the folder is scanned, and must not lay the window out again.
+        self.status.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Fixed)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(folder_button)
+        buttons.addWidget(refresh_button)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(4, 4, 4, 4)
+        layout.addLayout(buttons)
+        layout.addWidget(self.status)
+        layout.addWidget(self.open_field)
+        layout.addWidget(self.search_field)
+        layout.addWidget(self.results)
+
+        self.query_timer = QTimer(self)
+        self.query_timer.setSingleShot(True)
+        self.query_timer.setInterval(self.QUERY_DELAY_MS)
+        self.query_timer.timeout.connect(self.update_results)
+        self.open_field.textEdited.connect(lambda: self._set_mode(searching=False))
+        self.search_field.textEdited.connect(lambda: self._set_mode(searching=True))
+        self.open_field.returnPressed.connect(self.open_selected)
+        self.search_field.returnPressed.connect(self.open_selected)
+        self.open_field.installEventFilter(self)
+        self.search_field.installEventFilter(self)
+        self.results.itemActivated.connect(self.open_item)
+        self.index.changed.connect(self.query_timer.start)
+        self.index.changed.connect(self.show_status)
+        self.index.scan_finished.connect(self.show_status)
+        self.index.failed.connect(self.show_error)
+
+    @Slot()
+    def choose_folder(self) -> None:
+        """Prompts the user for a folder and opens it as the workspace."""
+        directory = QFileDialog.getExistingDirectory(self, "Abrir Pasta", self.index.root or "")
+        if directory:
+            self.open_folder(directory)
+
+    def open_folder(self, directory: str) -> None:
+        """
+        Opens a folder as the workspace, showing its stored index while it is scanned.
+
+        Args:
+            directory (str): the path of the folder.
+        """
+        self.index.open(directory)
+        self.show_status()
+        self.open_field.setFocus()
+
+    def focus_open_field(self) -> None:
+        """Selects the fuzzy open field, to type the name of a document."""
+        self._set_mode(searching=False)
+        self.open_field.setFocus()
+        self.open_field.selectAll()
+
+    def focus_search_field(self) -> None:
+        """Selects the search field, to type the words searched."""
+        self._set_mode(searching=True)
+        self.search_field.setFocus()
+        self.search_field.selectAll()
+
+    @Slot()
+    def update_results(self) -> None:
+        """Lists the documents found by the field typed last."""
+        self.query_timer.stop()
+        if self._searching:
+            query = self.search_field.text()
+            documents = self.index.search(query, self.MAX_RESULTS)
+        else:
+            query = self.open_field.text()
+            documents = self.index.fuzzy_find(query, self.MAX_RESULTS)
+
+        self.results.clear()
+        for document in documents:
+            item = QListWidgetItem(f"{document.title}\n{document.path}", self.results)
+            item.setData(Qt.ItemDataRole.UserRole, self.index.absolute_path(document))
+            headings = self.index.matching_headings(document, query) if self._searching else document.headings[:10]
+            item.setToolTip("\n".join("#" * level + " " + title for level, title, _ in headings) or document.path)
+        if self.results.count():
+            self.results.setCurrentRow(0)
+
+    @Slot()
+    def show_status(self) -> None:
+        """Shows the folder and the number of its documents."""
+        if self.index.root is None:
+            self.status.setText("nenhuma pasta aberta")
+            return
+        name = os.path.basename(self.index.root) or self.index.root
+        scanning = " (indexando...)" if self.index.is_scanning() else ""
+        self.status.setText(f"{name}: {len(self.index)} documentos{scanning}")
+        self.status.setToolTip(self.index.root)
+
+    @Slot(str)
+    def show_error(self, message: str) -> None:
+        """
+        Shows why the folder could not be scanned.
+
+        Args:
+            message (str): the error message.
+        """
+        self.status.setText("falha ao indexar a pasta")
+        self.status.setToolTip(message)
+
+    @Slot()
+    def open_selected(self) -> None:
+        """Opens the selected result, or the first one."""
+        if self.query_timer.isActive():
+            self.update_results()
+        item = self.results.currentItem() or self.results.item(0)
+        if item is not None:
+            self.open_item(item)
+
+    @Slot(QListWidgetItem)
+    def open_item(self, item: QListWidgetItem) -> None:
+        """
+        Asks to open the document of a result.
+
+        Args:
+            item (QListWidgetItem): the result.
+        """
+        self.open_requested.emit(item.data(Qt.ItemDataRole.UserRole))
+
+    def _set_mode(self, searching: bool) -> None:
+        """
+        Chooses the field whose query is listed, and lists it after a pause.
+
+        Args:
+            searching (bool): True for the search field, False for the fuzzy open field.
+        """
+        self._searching = searching
+        self.query_timer.start()
+
+    def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+        """
+        Moves from a field to the results with the Down key.
+
+        Args:
+            watched (QObject): the field.
+            event (QEvent): the event.
+
+        Returns:
+            bool: True if the event was handled.
+        """
+        if event.type() == QEvent.Type.KeyPress and event.key() == Qt.Key.Key_Down:
+            if self.results.count():
+                self.results.setFocus()
+                self.results.setCurrentRow(min(1, self.results.count() - 1))
+                return True
+        return super().eventFilter(watched, event)
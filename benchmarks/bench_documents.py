@@ -0,0 +1,117 @@
+"""
+Benchmark of the memory of several large documents open at once.
+
+Before the tabs, each document needed its own editor process. The same number
+of documents is opened in the tabs of one editor, showing each one in turn,
+and the resident memory of that process is compared with the memory of one
+editor with a single document times the number of documents. Each measurement
+runs in a new process, with the offscreen platform and an empty recovery
+directory.
+
+Usage:
+    python benchmarks/bench_documents.py --documents 10 --sections 300
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pdf_export import build_document  # noqa: E402
+
+
+def resident_memory() -> int:
+    """
+    Returns:
+        int: the resident memory of this process, in bytes (Linux only).
+    """
+    with open("/proc/self/status", encoding="utf-8") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    raise OSError("VmRSS not found in /proc/self/status")
+
+
+def open_documents(filenames: list) -> None:
+    """
+    Opens the files in the tabs of an editor, waits for each preview and prints the resident memory.
+
+    Args:
+        filenames (list[str]): the paths of the Markdown files.
+    """
+    from PySide6.QtWidgets import QApplication
+
+    from aether_editor.main_window import AetherEditorApp
+
+    app = QApplication.instance() or QApplication([])
+    window = AetherEditorApp()
+    window.show()
+
+    def wait_for_preview() -> None:
+        document = window.documents.current_document()
+        deadline = time.perf_counter() + 0.2
+        while (
+            time.perf_counter() < deadline
+            or document.file_loader.is_loading()
+            or document.preview_scheduler.is_busy()
+            or document.fill_timer.isActive()
+        ):
+            app.processEvents()
+
+    for filename in filenames:
+        window.documents.open_file(filename)
+        wait_for_preview()
+    print(resident_memory())
+    window.documents.close_session()
+
+
+def measure(filenames: list) -> int:
+    """
+    Opens the files in a new editor process.
+
+    Args:
+        filenames (list[str]): the paths of the Markdown files.
+
+    Returns:
+        int: the resident memory of the process with every file open, in bytes.
+    """
+    with tempfile.TemporaryDirectory() as recovery_dir:
+        environment = dict(os.environ, QT_QPA_PLATFORM="offscreen", AETHER_RECOVERY_DIR=recovery_dir)
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--open", *filenames],
+            env=environment, capture_output=True, text=True, check=True
+        ).stdout
+    return int(output.split()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--documents", type=int, default=10, help="number of documents")
+    parser.add_argument("--sections", type=int, default=300, help="number of sections of each document")
+    parser.add_argument("--open", nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.open:
+        open_documents(args.open)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        filenames = []
+        for number in range(args.documents):
+            filename = os.path.join(directory, f"documento_{number}.md")
+            with open(filename, "w", encoding="utf-8") as file:
+                file.write(build_document(args.sections + number))
+            filenames.append(filename)
+        single = measure(filenames[:1])
+        tabs = measure(filenames)
+
+    megabyte = 1024 * 1024
+    print(f"{args.documents} documents of {args.sections} sections")
+    print(f"one process per document: {args.documents} x {single / megabyte:6.1f} MB = {args.documents * single / megabyte:7.1f} MB")
+    print(f"tabs in one process:      {tabs / megabyte:22.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
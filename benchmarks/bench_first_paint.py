@@ -0,0 +1,77 @@
+"""
+Benchmark of the first paint of the editor after loading a large document.
+
+Times setPlainText() followed by the repaint of the viewport, which is what the
+user waits for, with the lazy highlighting of the editor and without any
+highlighter, which is the floor set by the layout of the text. The time the
+idle passes take to highlight the rest of the document is also reported.
+
+Usage:
+    python benchmarks/bench_first_paint.py --lines 10000 100000 300000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_highlighter import build_corpus  # noqa: E402
+
+
+def time_first_paint(app, text: str, highlight: bool) -> tuple:
+    """
+    Measures the first paint of a CodeEditor and the highlighting of the remaining blocks.
+
+    Args:
+        app (QApplication): the application, whose events are processed.
+        text (str): the text of the document.
+        highlight (bool): False removes the highlighter from the document.
+
+    Returns:
+        tuple[float, float]: the time to the first paint and the idle time, in seconds.
+    """
+    from aether_editor.code_editor import CodeEditor
+
+    editor = CodeEditor()
+    editor.resize(800, 600)
+    editor.show()
+    app.processEvents()
+    if not highlight:
+        editor.highlighter.setDocument(None)
+
+    start = time.perf_counter()
+    editor.setPlainText(text)
+    editor.viewport().repaint()
+    first_paint = time.perf_counter() - start
+
+    start = time.perf_counter()
+    while editor.highlighter.idle_timer.isActive():
+        app.processEvents()
+    idle = time.perf_counter() - start
+
+    editor.close()
+    editor.deleteLater()
+    app.processEvents()
+    return first_paint, idle
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, nargs="+", default=[10_000, 100_000], help="numbers of lines of the documents")
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication
+
+    app = QApplication.instance() or QApplication([])
+    for lines in args.lines:
+        text = "\n".join(build_corpus(lines))
+        floor, _ = time_first_paint(app, text, highlight=False)
+        lazy, idle = time_first_paint(app, text, highlight=True)
+        print(f"{lines:>8} lines  first paint: no highlighter {floor * 1000:8.1f} ms"
+              f"  lazy highlighting {lazy * 1000:8.1f} ms  (+{idle * 1000:.0f} ms idle)")
+
+
+if __name__ == "__main__":
+    main()
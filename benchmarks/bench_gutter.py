@@ -0,0 +1,136 @@
+"""
+Offscreen benchmark of the painting of the line number gutter of the editor.
+
+A CodeEditor with a large document is scrolled to positions spread over the
+document and the gutter is rendered into an image at each one, with the
+previous paint method (fontMetrics() and a new string per line, drawText with
+a rectangle), reproduced here, and with LineNumberRenderer. Every position is
+painted twice, like a scroll that comes back, so the second paints show the
+reuse of the prepared numbers. The time per frame is compared with the 16.7 ms
+of a 60 Hz display.
+
+Usage:
+    python benchmarks/bench_gutter.py --lines 100000 --frames 300
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FRAME_BUDGET_MS = 1000 / 60
+
+
+def legacy_paint_event(editor, event) -> None:
+    """
+    The previous CodeEditor.line_number_area_paint_event.
+
+    Args:
+        editor (CodeEditor): the editor.
+        event (QPaintEvent): the paint event of the gutter.
+    """
+    from PySide6.QtCore import Qt
+    from PySide6.QtGui import QPainter, QPalette
+
+    painter = QPainter(editor.line_number_area)
+    bg_color = editor.line_number_area.palette().color(QPalette.ColorRole.Window)
+    painter.fillRect(event.rect(), bg_color)
+    painter.setPen(editor.line_number_area.palette().color(QPalette.ColorRole.WindowText))
+    x_pos = editor.line_number_area.width() - 2
+    painter.drawLine(x_pos, event.rect().top(), x_pos, event.rect().bottom())
+
+    block = editor.firstVisibleBlock()
+    block_number = block.blockNumber()
+    top = editor.blockBoundingGeometry(block).translated(editor.contentOffset()).top()
+    bottom = top + editor.blockBoundingRect(block).height()
+    text_color = editor.line_number_area.palette().color(QPalette.ColorRole.WindowText)
+    while block.isValid() and top <= event.rect().bottom():
+        if block.isVisible() and bottom >= event.rect().top():
+            painter.setPen(text_color)
+            painter.drawText(
+                0, top, editor.line_number_area.width(), editor.fontMetrics().height(),
+                Qt.AlignmentFlag.AlignRight, str(block_number + 1) + " "
+            )
+        block = block.next()
+        top = bottom
+        bottom = top + editor.blockBoundingRect(block).height()
+        block_number += 1
+
+
+def time_frames(app, editor, positions: list) -> list:
+    """
+    Scrolls the editor to each position and renders its gutter into an image.
+
+    Args:
+        app (QApplication): the application, whose events are processed after each scroll.
+        editor (CodeEditor): the editor.
+        positions (list[int]): the values of the vertical scroll bar.
+
+    Returns:
+        list[float]: the time of each paint, in milliseconds.
+    """
+    from PySide6.QtGui import QImage
+
+    area = editor.line_number_area
+    image = QImage(area.size(), QImage.Format.Format_ARGB32_Premultiplied)
+    times = []
+    for position in positions:
+        editor.verticalScrollBar().setValue(position)
+        app.processEvents()
+        start = time.perf_counter()
+        area.render(image)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def report(name: str, times: list) -> None:
+    """
+    Prints the mean and the 95th percentile of the frame times.
+
+    Args:
+        name (str): the name of the measurement.
+        times (list[float]): the frame times, in milliseconds.
+    """
+    p95 = sorted(times)[int(len(times) * 0.95) - 1]
+    print(f"{name:<22} mean {statistics.mean(times):6.2f} ms  p95 {p95:6.2f} ms"
+          f"  ({statistics.mean(times) / FRAME_BUDGET_MS:6.1%} of a 60 Hz frame)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=100_000, help="number of lines of the document")
+    parser.add_argument("--frames", type=int, default=300, help="number of scroll positions")
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication
+
+    from aether_editor.code_editor import CodeEditor
+
+    app = QApplication.instance() or QApplication([])
+    editor = CodeEditor()
+    editor.resize(900, 1000)
+    editor.setPlainText("\n".join(f"line {number}" for number in range(args.lines)))
+    editor.show()
+    app.processEvents()
+
+    maximum = editor.verticalScrollBar().maximum()
+    positions = [maximum * index // args.frames for index in range(args.frames)] * 2
+    half = len(positions) // 2
+
+    current_paint = editor.line_number_area_paint_event
+    editor.line_number_area_paint_event = lambda event: legacy_paint_event(editor, event)
+    legacy = time_frames(app, editor, positions)
+    editor.line_number_area_paint_event = current_paint
+    current = time_frames(app, editor, positions)
+
+    print(f"{args.lines} lines, {editor.line_number_area.height()} px gutter, {args.frames} positions painted twice")
+    report("legacy", legacy)
+    report("renderer, first paint", current[:half])
+    report("renderer, repaint", current[half:])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Micro-benchmark of the line scanner of the editor highlighter.
+
+Compares scan_markdown_line() with the previous implementation of
+MarkdownHighlighter.highlightBlock (six separate regexes over every line plus
+the code fence search), reproduced here as a function that returns the same
+setFormat() calls. Before timing, both are run over the corpus and the format
+of every character is compared, so the benchmark fails if the spans differ.
+
+With --qt, the rehighlight of a whole QTextDocument is also timed with both
+versions of the highlighter.
+
+Usage:
+    python benchmarks/bench_highlighter.py --lines 100000 --qt
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aether_editor.markdown_tokenizer import (  # noqa: E402
+    BOLD,
+    CODE_BLOCK,
+    CODE_INLINE,
+    HEADER,
+    ITALIC,
+    LIST,
+    QUOTE,
+    STATE_CODE,
+    STATE_NORMAL,
+    scan_markdown_line
+)
+
+LEGACY_RULES = [
+    (re.compile(r"^\s*(\*|\-|\+|\d+\.)\s+.*"), LIST),
+    (re.compile(r'^#+\s.*'), HEADER),
+    (re.compile(r'(\*\*|__)(.+?)(\*\*|__)'), BOLD),
+    (re.compile(r'(\*|_)(.+?)(\*|_)'), ITALIC),
+    (re.compile(r'^>\s.*'), QUOTE),
+    (re.compile(r'`[^`]+`'), CODE_INLINE),
+]
+LEGACY_START_CODE_BLOCK = re.compile(r"^\s*`{3}")
+LEGACY_END_CODE_BLOCK = re.compile(r"`{3}\s*$")
+
+SAMPLE_LINES = [
+    "# Aether Editor - Por Anthony",
+    "## Sobre o **Código**",
+    "",
+    "Some plain text of a paragraph that goes on for a while without any markup at all.",
+    "A paragraph with *italic*, **bold**, `code` and a snake_case_name in it.",
+    "- a list item with **bold text** inside",
+    "1. numbered item",
+    "> a quote with *emphasis* and `code`",
+    "```python",
+    "def fibonacci(n):  # comment with * and _",
+    "    a, b = 0, 1",
+    "```",
+    "| Cabeçalho 1 | Cabeçalho 2 |",
+    "Text with __underscored bold__ and _underscored italic_ words.",
+    "``` inline fence ```",
+    "    ```",
+]
+
+
+def legacy_scan_line(text: str, previous_state: int) -> tuple:
+    """
+    The previous highlightBlock, returning its setFormat() calls instead of making them.
+
+    Args:
+        text (str): the text of the line.
+        previous_state (int): the state of the previous line.
+
+    Returns:
+        tuple[list[tuple[int, int, str]], int]: the (start, length, kind) spans and the state of the line.
+    """
+    spans = []
+    for expression, kind in LEGACY_RULES:
+        for match in expression.finditer(text):
+            spans.append((match.start(), match.end() - match.start(), kind))
+
+    current_state = previous_state
+    index = 0
+    while index < len(text):
+        if current_state == STATE_CODE:
+            end_match = LEGACY_END_CODE_BLOCK.search(text, index)
+            if end_match:
+                spans.append((0, end_match.end(), CODE_BLOCK))
+                current_state = STATE_NORMAL
+                index = end_match.end()
+                continue
+            spans.append((0, len(text), CODE_BLOCK))
+            break
+        start_match = LEGACY_START_CODE_BLOCK.search(text, index)
+        if not start_match:
+            break
+        start_pos = start_match.start()
+        index = start_match.end()
+        end_match = LEGACY_END_CODE_BLOCK.search(text, index)
+        if end_match:
+            spans.append((start_pos, end_match.end() - start_pos, CODE_BLOCK))
+            index = end_match.end()
+            current_state = STATE_NORMAL
+        else:
+            spans.append((start_pos, len(text) - start_pos, CODE_BLOCK))
+            current_state = STATE_CODE
+            break
+    return spans, current_state
+
+
+def paint(text: str, spans: list) -> list:
+    """
+    Applies the spans like consecutive setFormat() calls.
+
+    Args:
+        text (str): the text of the line.
+        spans (list[tuple[int, int, str]]): the spans, in the order they are applied.
+
+    Returns:
+        list[str or None]: the kind of span that formats each character.
+    """
+    kinds = [None] * len(text)
+    for start, length, kind in spans:
+        kinds[start:start + length] = [kind] * len(kinds[start:start + length])
+    return kinds
+
+
+def build_corpus(lines: int, seed: int = 0) -> list:
+    """
+    Builds a document from the sample lines plus random Markdown noise.
+
+    Args:
+        lines (int): the number of lines.
+        seed (int): the seed of the random generator.
+
+    Returns:
+        list[str]: the lines of the document.
+    """
+    generator = random.Random(seed)
+    pieces = ["*", "**", "_", "__", "`", "```", "# ", "> ", "- ", "1. ", " ", "word", "x_y", "  "]
+    corpus = []
+    for _ in range(lines):
+        if generator.random() < 0.8:
+            corpus.append(generator.choice(SAMPLE_LINES))
+        else:
+            corpus.append("".join(generator.choice(pieces) for _ in range(generator.randint(1, 12))))
+    return corpus
+
+
+def run_scanner(scanner, corpus: list) -> list:
+    """
+    Scans every line of the corpus, passing the state from line to line.
+
+    Args:
+        scanner (Callable[[str, int], tuple]): the line scanner.
+        corpus (list[str]): the lines of the document.
+
+    Returns:
+        list[tuple]: the result of the scanner for each line.
+    """
+    state = -1
+    results = []
+    for text in corpus:
+        spans, state = scanner(text, state)
+        results.append((spans, state))
+    return results
+
+
+def check_equivalence(corpus: list) -> None:
+    """
+    Verifies that both scanners format every character and carry every state alike.
+
+    Args:
+        corpus (list[str]): the lines of the document.
+
+    Raises:
+        AssertionError: if a line is formatted differently.
+    """
+    legacy = run_scanner(legacy_scan_line, corpus)
+    current = run_scanner(scan_markdown_line, corpus)
+    for number, (text, (legacy_spans, legacy_state), (spans, state)) in enumerate(zip(corpus, legacy, current)):
+        assert legacy_state == state, f"line {number} {text!r}: state {legacy_state} != {state}"
+        assert paint(text, legacy_spans) == paint(text, spans), f"line {number} {text!r}: different formats"
+
+
+def time_scanner(scanner, corpus: list, repeat: int) -> float:
+    """
+    Measures the best time to scan the corpus.
+
+    Args:
+        scanner (Callable[[str, int], tuple]): the line scanner.
+        corpus (list[str]): the lines of the document.
+        repeat (int): the number of measurements.
+
+    Returns:
+        float: the best time, in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run_scanner(scanner, corpus)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def time_rehighlight(corpus: list) -> tuple:
+    """
+    Measures the rehighlight of a QTextDocument with the previous and the current highlighter.
+
+    Args:
+        corpus (list[str]): the lines of the document.
+
+    Returns:
+        tuple[float, float]: the previous and the current time, in seconds.
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtGui import QGuiApplication, QSyntaxHighlighter, QTextDocument
+
+    from aether_editor.code_editor import MarkdownHighlighter
+
+    class LegacyHighlighter(QSyntaxHighlighter):
+        """The previous QSyntaxHighlighter subclass, with the formats of the current highlighter."""
+        def __init__(self, parent):
+            self.span_formats = MarkdownHighlighter(QTextDocument()).span_formats
+            super().__init__(parent)
+
+        def highlightBlock(self, text):
+            spans, state = legacy_scan_line(text, self.previousBlockState())
+            for start, length, kind in spans:
+                self.setFormat(start, length, self.span_formats[kind])
+            self.setCurrentBlockState(state)
+
+    app = QGuiApplication.instance() or QGuiApplication([])  # noqa: F841
+    document = QTextDocument()
+    document.setPlainText("\n".join(corpus))
+    times = []
+    for highlighter_class in (LegacyHighlighter, MarkdownHighlighter):
+        highlighter = highlighter_class(document)
+        start = time.perf_counter()
+        highlighter.rehighlight()
+        times.append(time.perf_counter() - start)
+        highlighter.setDocument(None)
+    return tuple(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=100_000, help="number of lines of the document")
+    parser.add_argument("--repeat", type=int, default=5, help="number of measurements")
+    parser.add_argument("--qt", action="store_true", help="also time the rehighlight of a QTextDocument")
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.lines)
+    check_equivalence(corpus)
+
+    legacy = time_scanner(legacy_scan_line, corpus, args.repeat)
+    current = time_scanner(scan_markdown_line, corpus, args.repeat)
+    print(f"{args.lines} lines, identical formats")
+    print(f"legacy scanner:  {legacy * 1000:8.1f} ms  {legacy / args.lines * 1e6:6.2f} us/line")
+    print(f"single pass:     {current * 1000:8.1f} ms  {current / args.lines * 1e6:6.2f} us/line")
+    print(f"speedup:         {legacy / current:8.2f}x")
+
+    if args.qt:
+        legacy, current = time_rehighlight(corpus)
+        print(f"rehighlight legacy:      {legacy * 1000:8.1f} ms")
+        print(f"rehighlight single pass: {current * 1000:8.1f} ms  ({legacy / current:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
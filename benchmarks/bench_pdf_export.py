@@ -0,0 +1,152 @@
+"""
+Benchmark of the responsiveness of the window during a PDF export.
+
+The previous export printed the preview document with QPrinter on the GUI
+thread, which froze the window until the last page was written; it is
+reproduced here and its duration is the length of the freeze. The current
+export runs in MarkdownPdfExporter while a 5 ms timer ticks on the GUI thread,
+and the longest gap between two ticks is reported, which is the longest time
+the window could not react.
+
+Usage:
+    python benchmarks/bench_pdf_export.py --sections 650
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SECTION = """## Seção {number}
+
+Um parágrafo com *itálico*, **negrito** e `código`, longo o bastante para ocupar
+várias linhas da página. Lorem ipsum dolor sit amet, consectetur adipiscing elit,
+sed do eiusmod tempor incididunt ut labore et dolore magna aliqua.
+
+- primeiro item da lista
+- segundo item, com **negrito**
+- terceiro item
+
+```python
+def fibonacci(n):
+    # Este é um comentário
+    a, b = 0, 1
+    for i in range(n):
+        a, b = b, a + b
+    return a
+```
+
+| Cabeçalho 1 | Cabeçalho 2 |
+| ----------- | ----------- |
+| Célula A | Célula B |
+| Célula C | Célula D |
+
+> uma citação com *ênfase*
+"""
+
+
+def build_document(sections: int) -> str:
+    """
+    Builds a Markdown document by repeating a section with every kind of block.
+
+    Args:
+        sections (int): the number of sections.
+
+    Returns:
+        str: the Markdown source.
+    """
+    return "# Documento\n\n" + "\n".join(SECTION.format(number=number) for number in range(sections))
+
+
+def time_legacy_export(text: str, filename: str) -> float:
+    """
+    Measures the previous export: print_() of the preview document on the GUI thread.
+
+    Args:
+        text (str): the Markdown source.
+        filename (str): the path of the PDF file.
+
+    Returns:
+        float: the time the GUI thread was blocked, in seconds.
+    """
+    from PySide6.QtPrintSupport import QPrinter
+    from PySide6.QtWidgets import QTextEdit
+
+    from aether_editor.constants import get_css_style
+    from aether_editor.markdown_renderer import MarkdownRenderer
+    from aether_editor.preview_patcher import PreviewDocumentPatcher
+
+    preview = QTextEdit()
+    patcher = PreviewDocumentPatcher(preview.document())
+    patcher.set_style_sheet(get_css_style())
+    patcher.rebuild(MarkdownRenderer().render(text))
+
+    start = time.perf_counter()
+    printer = QPrinter(QPrinter.PrinterMode.HighResolution)
+    printer.setOutputFormat(QPrinter.OutputFormat.PdfFormat)
+    printer.setOutputFileName(filename)
+    preview.document().print_(printer)
+    return time.perf_counter() - start
+
+
+def time_background_export(app, text: str, filename: str) -> tuple:
+    """
+    Measures the current export, ticking a timer on the GUI thread meanwhile.
+
+    Args:
+        app (QApplication): the application, whose events are processed.
+        text (str): the Markdown source.
+        filename (str): the path of the PDF file.
+
+    Returns:
+        tuple[float, float, int]: the duration of the export and the longest gap
+            between two ticks, in seconds, and the page count.
+    """
+    from PySide6.QtCore import QTimer
+
+    from aether_editor.constants import get_css_style
+    from aether_editor.pdf_exporter import MarkdownPdfExporter
+
+    exporter = MarkdownPdfExporter()
+    pages = []
+    exporter.finished.connect(lambda _, page_count: pages.append(page_count))
+    exporter.failed.connect(lambda _, message: sys.exit(message))
+    ticks = []
+    timer = QTimer()
+    timer.timeout.connect(lambda: ticks.append(time.perf_counter()))
+    timer.start(5)
+
+    start = time.perf_counter()
+    ticks.append(start)
+    exporter.export(text, filename, get_css_style())
+    while exporter.is_exporting():
+        app.processEvents()
+    duration = time.perf_counter() - start
+    timer.stop()
+    longest_gap = max(later - earlier for earlier, later in zip(ticks, ticks[1:]))
+    return duration, longest_gap, pages[0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sections", type=int, default=650, help="number of sections of the document")
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication
+
+    app = QApplication.instance() or QApplication([])
+    text = build_document(args.sections)
+    with tempfile.TemporaryDirectory() as directory:
+        legacy = time_legacy_export(text, os.path.join(directory, "legacy.pdf"))
+        duration, longest_gap, pages = time_background_export(app, text, os.path.join(directory, "current.pdf"))
+
+    print(f"{args.sections} sections, {pages} pages")
+    print(f"print_() on the GUI thread:  window frozen for {legacy * 1000:8.0f} ms")
+    print(f"background export:           {duration * 1000:8.0f} ms, longest stall {longest_gap * 1000:6.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark of the search of a large document while typing.
+
+A CodeEditor with a document of many lines searches a query in the background
+while keys are typed in it. The time to find every match, the longest time the
+event loop was blocked (measured by a 1 ms timer) and the time of each key press
+are reported, and the key presses are also timed without a search to compare.
+The keys are typed at the end of the document, below the part already searched,
+and the final number of matches is checked against a search of the whole text.
+
+Usage:
+    python benchmarks/bench_search.py --lines 100000 --query word
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+KEYS = "abcdefghij"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=100000, help="number of lines of the document")
+    parser.add_argument("--query", default="word", help="the searched text")
+    parser.add_argument("--regex", action="store_true", help="the query is a regular expression")
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtCore import QTimer
+    from PySide6.QtTest import QTest
+    from PySide6.QtWidgets import QApplication
+
+    from PySide6.QtGui import QTextCursor
+
+    from aether_editor.code_editor import CodeEditor
+    from aether_editor.text_search import compile_query
+
+    app = QApplication.instance() or QApplication([])
+    editor = CodeEditor()
+    editor.resize(800, 600)
+    editor.show()
+    editor.setPlainText("\n".join(f"Some plain text with a word and one more Word, line {number}" for number in range(args.lines)))
+    while editor.highlighter.idle_timer.isActive():
+        app.processEvents()
+
+    ticks = []
+    timer = QTimer()
+    timer.timeout.connect(lambda: ticks.append(time.perf_counter()))
+    timer.start(1)
+
+    def type_keys() -> list:
+        latencies = []
+        for key in KEYS:
+            start = time.perf_counter()
+            QTest.keyClick(editor, key)
+            latencies.append(time.perf_counter() - start)
+            deadline = time.perf_counter() + 0.02
+            while time.perf_counter() < deadline:
+                app.processEvents()
+        return latencies
+
+    idle_keys = type_keys()
+
+    # the edits land below the frontier of the search, which must still search the text before them.
+    editor.moveCursor(QTextCursor.MoveOperation.End)
+    ticks.clear()
+    start = time.perf_counter()
+    editor.search.search(args.query, regex=args.regex)
+    search_keys = type_keys()
+    while editor.search.is_searching() or editor.search.restart_timer.isActive():
+        app.processEvents()
+    search = time.perf_counter() - start
+    stall = max(later - earlier for earlier, later in zip([start] + ticks, ticks))
+    expected = len(compile_query(args.query, args.regex, False).findall(editor.toPlainText()))
+    assert len(editor.search) == expected, f"{len(editor.search)} matches found, {expected} expected"
+
+    print(f"{args.lines} lines, {len(editor.search)} matches of {args.query!r}")
+    print(f"search while typing:          {search * 1000:8.0f} ms")
+    print(f"longest event loop stall:     {stall * 1000:8.0f} ms")
+    print(f"key press, without search:    {max(idle_keys) * 1000:8.1f} ms max")
+    print(f"key press, while searching:   {max(search_keys) * 1000:8.1f} ms max")
+
+
+if __name__ == "__main__":
+    main()
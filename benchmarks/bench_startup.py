@@ -0,0 +1,78 @@
+"""
+Benchmark of the cold start of the editor, with a budget for the time to the window.
+
+Starts main.py --profile-startup in a new process several times, under the
+offscreen platform and with an empty recovery directory, and reads the report
+it prints once the first preview is shown. The median of each phase is
+printed, and the exit status is 1 if the median time to the first paint of the
+window is over the budget, so a regression in the startup fails the run.
+
+Usage:
+    python benchmarks/bench_startup.py --runs 5 --budget-ms 600
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIRST_PAINT = "primeira pintura"
+REPORT_END = "primeiro preview"
+PHASE_EXP = re.compile(r"^(.+?)\s+([\d.]+) ms\s+([\d.]+) ms$")
+
+
+def run_startup(timeout: float) -> dict:
+    """
+    Starts the editor in a new process and reads its startup report.
+
+    Args:
+        timeout (float): the longest time to wait for the report, in seconds.
+
+    Returns:
+        dict[str, float]: the total time until the end of each phase, in milliseconds, in order.
+    """
+    with tempfile.TemporaryDirectory() as recovery_dir:
+        environment = dict(os.environ, QT_QPA_PLATFORM="offscreen", AETHER_RECOVERY_DIR=recovery_dir)
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "main.py"), "--profile-startup"],
+            cwd=ROOT, env=environment, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        )
+        phases = {}
+        try:
+            for line in process.stdout:
+                match = PHASE_EXP.match(line.strip())
+                if match:
+                    phases[match.group(1)] = float(match.group(3))
+                    if match.group(1) == REPORT_END:
+                        break
+        finally:
+            process.kill()
+            process.wait(timeout)
+    return phases
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="number of starts")
+    parser.add_argument("--budget-ms", type=float, default=600, help="largest median time to the first paint")
+    parser.add_argument("--timeout", type=float, default=30, help="longest wait for each start, in seconds")
+    args = parser.parse_args()
+
+    runs = [run_startup(args.timeout) for _ in range(args.runs)]
+    if not all(REPORT_END in phases for phases in runs):
+        sys.exit("the editor did not print its startup report")
+
+    print(f"median of {args.runs} starts, time until the end of each phase")
+    for name in runs[0]:
+        print(f"{name:<24}{statistics.median(phases[name] for phases in runs):>9.1f} ms")
+    first_paint = statistics.median(phases[FIRST_PAINT] for phases in runs)
+    if first_paint > args.budget_ms:
+        sys.exit(f"time to the window {first_paint:.0f} ms is over the budget of {args.budget_ms:.0f} ms")
+    print(f"time to the window {first_paint:.0f} ms, within the budget of {args.budget_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark of the switch of the theme of the preview.
+
+The previous switch rendered the Markdown again and set the whole styled HTML
+in the preview, which is reproduced here with PreviewDocumentPatcher.rebuild().
+The current switch sets the new style sheet and restyles the visible blocks at
+once, leaving the rest of the document to idle time; both are timed, and the
+restyle of the whole document is reported as the total idle work.
+
+Usage:
+    python benchmarks/bench_theme_switch.py --sections 650
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pdf_export import build_document  # noqa: E402
+
+THEMES = ("main_style.css", "github_light_style.css")
+VISIBLE_BLOCKS = 60
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sections", type=int, default=650, help="number of sections of the document")
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication, QTextEdit
+
+    from aether_editor.constants import load_css_style
+    from aether_editor.markdown_renderer import MarkdownRenderer
+    from aether_editor.preview_patcher import PreviewDocumentPatcher
+
+    app = QApplication.instance() or QApplication([])
+    renderer = MarkdownRenderer()
+    text = build_document(args.sections)
+    dark, light = (load_css_style(theme) for theme in THEMES)
+
+    legacy_preview = QTextEdit()
+    legacy = PreviewDocumentPatcher(legacy_preview.document())
+    legacy.set_style_sheet(dark)
+    legacy.rebuild(renderer.render(text))
+    start = time.perf_counter()
+    legacy.set_style_sheet(light)
+    legacy.rebuild(renderer.render(text))
+    rebuild = time.perf_counter() - start
+
+    preview = QTextEdit()
+    patcher = PreviewDocumentPatcher(preview.document(), frame_background=False)
+    patcher.set_style_sheet(dark)
+    patcher.rebuild(renderer.render(text))
+    app.processEvents()
+    start = time.perf_counter()
+    patcher.set_style_sheet(light)
+    patcher.restyle(0, VISIBLE_BLOCKS)
+    switch = time.perf_counter() - start
+    start = time.perf_counter()
+    patcher.restyle()
+    idle = time.perf_counter() - start
+
+    print(f"{args.sections} sections, {patcher.block_count()} blocks")
+    print(f"render and rebuild:          {rebuild * 1000:8.0f} ms")
+    print(f"style sheet, visible blocks: {switch * 1000:8.0f} ms")
+    print(f"restyle of the rest (idle):  {idle * 1000:8.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
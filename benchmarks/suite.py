@@ -0,0 +1,315 @@
+"""
+Benchmark suite of the editor and of the render pipeline, compared with a stored baseline.
+
+Each case is a synthetic document of a kind (prose, code or table heavy) and a
+number of lines, generated from a fixed seed, so every run measures the same
+text. A case runs in a new process, with the offscreen platform, and reports:
+
+    open_ms                the load of the file into a document, as open_markdown does (MarkdownFileLoader)
+    render_ms              the first preview: MarkdownRenderer.render and PreviewDocumentPatcher.rebuild
+    edit_render_ms         the preview after a line in the middle is edited: render with the cache
+                           of the unchanged blocks and PreviewDocumentPatcher.apply, as update_preview does
+    highlight_us_per_line  MarkdownHighlighter over the whole document, per line
+    paint_ms               a frame of a CodeEditor, gutter included, at positions spread over the document
+    peak_rss_mb            the peak resident memory of the process
+
+Every metric is better when lower, and each time is the median of --repeat runs,
+after an untimed warm-up run. The results are compared with
+benchmarks/baseline.json: a metric more than --threshold above its baseline, and
+more than its ABSOLUTE_TOLERANCES above it, fails the run (exit status 1); the
+absolute tolerance keeps the noise of the metrics of a few milliseconds from
+failing it. Times depend on
+the machine, so the baseline is saved (--save-baseline) on the machine that
+runs the comparisons; the cases missing from the baseline are only reported.
+
+The cases of 200k lines take one or two minutes each, so they only run when asked
+for with --sizes; the baseline has them with a single run.
+
+Usage:
+    python benchmarks/suite.py
+    python benchmarks/suite.py --kinds prose --sizes 1000 200000 --repeat 1
+    python benchmarks/suite.py --save-baseline
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+KINDS = ("prose", "code", "table")
+SIZES = (1_000, 20_000)
+PAINT_FRAMES = 20
+# increases smaller than these are noise, whatever their ratio to the baseline.
+ABSOLUTE_TOLERANCES = {
+    "open_ms": 1.0,
+    "render_ms": 1.0,
+    "edit_render_ms": 1.0,
+    "highlight_us_per_line": 1.0,
+    "paint_ms": 1.0,
+    "peak_rss_mb": 5.0,
+}
+
+WORDS = (
+    "editor", "markdown", "preview", "texto", "bloco", "linha", "documento", "render",
+    "código", "tabela", "rápido", "lento", "cache", "layout", "fonte", "tema", "a", "de", "o", "e"
+)
+CODE_LANGUAGES = ("python", "javascript", "c", "bash")
+CODE_LINES = (
+    "def {name}(value):",
+    "    return [item * {number} for item in value if item]  # {name}",
+    "const {name} = (items) => items.map((item) => item + {number});",
+    "for (int i = 0; i < {number}; i++) {{ total += values[i]; }}",
+    "echo \"{name} $(( {number} + 1 ))\" | tee -a log.txt",
+)
+
+
+def build_document(kind: str, lines: int, seed: int = 0) -> str:
+    """
+    Builds a synthetic Markdown document of about a number of lines.
+
+    Args:
+        kind (str): 'prose' (paragraphs, lists and quotes), 'code' (mostly fenced code blocks)
+            or 'table' (mostly tables).
+        lines (int): the number of lines.
+        seed (int): the seed of the random generator.
+
+    Returns:
+        str: the Markdown source.
+    """
+    generator = random.Random(f"{kind}-{lines}-{seed}")
+
+    def sentence() -> str:
+        words = [generator.choice(WORDS) for _ in range(generator.randint(6, 16))]
+        if generator.random() < 0.3:
+            words[0] = f"**{words[0]}**"
+        if generator.random() < 0.3:
+            words[-1] = f"`{words[-1]}`"
+        return " ".join(words).capitalize() + "."
+
+    def prose_section() -> list:
+        section = [sentence() + " " + sentence() for _ in range(generator.randint(2, 5))]
+        section += ["", *(f"- {sentence()}" for _ in range(generator.randint(2, 4))), ""]
+        if generator.random() < 0.3:
+            section += [f"> {sentence()}", ""]
+        return section
+
+    def code_section() -> list:
+        body = [
+            generator.choice(CODE_LINES).format(name=generator.choice(WORDS), number=generator.randint(1, 999))
+            for _ in range(generator.randint(5, 20))
+        ]
+        return [sentence(), "", f"```{generator.choice(CODE_LANGUAGES)}", *body, "```", ""]
+
+    def table_section() -> list:
+        columns = generator.randint(3, 6)
+        rows = [
+            "| " + " | ".join(generator.choice(WORDS) + f" {generator.randint(0, 99)}" for _ in range(columns)) + " |"
+            for _ in range(generator.randint(5, 20))
+        ]
+        return [f"| {' | '.join(f'Coluna {column}' for column in range(columns))} |", "|" + "---|" * columns, *rows, ""]
+
+    main_section = {"prose": prose_section, "code": code_section, "table": table_section}[kind]
+    result = []
+    number = 0
+    while len(result) < lines:
+        result += [f"## Seção {number}", ""]
+        result += main_section() if generator.random() < 0.8 else prose_section()
+        number += 1
+    return "\n".join(result[:lines])
+
+
+def measure_case(kind: str, lines: int, repeat: int) -> dict:
+    """
+    Measures every metric of a document in this process.
+
+    Args:
+        kind (str): the kind of the document.
+        lines (int): the number of lines of the document.
+        repeat (int): the number of runs of each time.
+
+    Returns:
+        dict[str, float]: the value of each metric.
+    """
+    from PySide6.QtGui import QImage, QTextDocument
+    from PySide6.QtWidgets import QApplication, QPlainTextDocumentLayout, QTextEdit
+
+    from aether_editor.code_editor import CodeEditor, MarkdownHighlighter
+    from aether_editor.constants import get_css_style
+    from aether_editor.file_loader import MarkdownFileLoader
+    from aether_editor.markdown_renderer import MarkdownRenderer
+    from aether_editor.preview_patcher import PreviewDocumentPatcher
+
+    app = QApplication.instance() or QApplication([])
+    text = build_document(kind, lines)
+    text_lines = text.split("\n")
+    middle = len(text_lines) // 2
+    edited = "\n".join(text_lines[:middle] + [text_lines[middle] + " editado"] + text_lines[middle + 1:])
+    results = {}
+
+    def median_time(run) -> float:
+        # the first run pays for the imports, the caches and the allocations of the others.
+        run()
+        durations = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            durations.append(time.perf_counter() - start)
+        return statistics.median(durations) * 1000
+
+    with tempfile.NamedTemporaryFile("w", suffix=".md", encoding="utf-8", delete=False) as file:
+        file.write(text)
+    try:
+        loader = MarkdownFileLoader()
+
+        def open_file() -> None:
+            loaded = []
+            loader.finished.connect(lambda document, _: loaded.append(document))
+            loader.load(file.name)
+            while not loaded:
+                app.processEvents()
+            loader.finished.disconnect()
+
+        results["open_ms"] = median_time(open_file)
+    finally:
+        os.remove(file.name)
+
+    preview = QTextEdit()
+    patcher = PreviewDocumentPatcher(preview.document(), frame_background=False)
+    patcher.set_style_sheet(get_css_style())
+    renderer = MarkdownRenderer()
+
+    def first_render() -> None:
+        renderer.clear_cache()
+        patcher.rebuild(renderer.render(text))
+
+    def edit_render() -> None:
+        patcher.apply(renderer.render(edited))
+        patcher.apply(renderer.render(text))
+
+    results["render_ms"] = median_time(first_render)
+    # each run renders the edit and its undo, from a preview of the original text.
+    results["edit_render_ms"] = median_time(edit_render) / 2
+
+    document = QTextDocument()
+    document.setDocumentLayout(QPlainTextDocumentLayout(document))
+    document.setPlainText(text)
+    highlighter = MarkdownHighlighter(document)
+    results["highlight_us_per_line"] = median_time(highlighter.rehighlight) * 1000 / len(text_lines)
+    highlighter.setDocument(None)
+
+    editor = CodeEditor()
+    editor.resize(800, 600)
+    editor.show()
+    editor.setPlainText(text)
+    while editor.highlighter.idle_timer.isActive():
+        app.processEvents()
+    image = QImage(editor.size(), QImage.Format.Format_ARGB32_Premultiplied)
+    scroll_bar = editor.verticalScrollBar()
+
+    def paint_frames() -> None:
+        for frame in range(PAINT_FRAMES):
+            scroll_bar.setValue(scroll_bar.maximum() * frame // PAINT_FRAMES)
+            editor.render(image)
+
+    results["paint_ms"] = median_time(paint_frames) / PAINT_FRAMES
+    results["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return results
+
+
+def run_case(kind: str, lines: int, repeat: int) -> dict:
+    """
+    Measures a document in a new process, so its peak memory is its own.
+
+    Args:
+        kind (str): the kind of the document.
+        lines (int): the number of lines of the document.
+        repeat (int): the number of runs of each time.
+
+    Returns:
+        dict[str, float]: the value of each metric.
+    """
+    with tempfile.TemporaryDirectory() as recovery_dir:
+        environment = dict(os.environ, QT_QPA_PLATFORM="offscreen", AETHER_RECOVERY_DIR=recovery_dir)
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--case", kind, str(lines), "--repeat", str(repeat)],
+            env=environment, capture_output=True, text=True, check=True
+        ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Prints each metric next to its baseline and finds the regressions.
+
+    Args:
+        results (dict[str, dict[str, float]]): the metrics of each case.
+        baseline (dict[str, dict[str, float]]): the stored metrics of each case.
+        threshold (float): the relative increase over the baseline that fails, 0.25 for 25%,
+            if the increase is also over the absolute tolerance of the metric.
+
+    Returns:
+        list[str]: the descriptions of the metrics over the threshold.
+    """
+    failures = []
+    for case, metrics in results.items():
+        print(case)
+        for metric, value in metrics.items():
+            reference = baseline.get(case, {}).get(metric)
+            if reference is None:
+                print(f"    {metric:<22} {value:10.2f}   (no baseline)")
+                continue
+            change = value / reference - 1 if reference else 0.0
+            failed = change > threshold and value - reference > ABSOLUTE_TOLERANCES.get(metric, 0.0)
+            print(f"    {metric:<22} {value:10.2f}   baseline {reference:10.2f}   {change:+7.1%}{'   FAIL' if failed else ''}")
+            if failed:
+                failures.append(f"{case} {metric}: {value:.2f} > {reference:.2f} {change:+.1%}")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=list(KINDS), help="kinds of documents")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="numbers of lines of the documents")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of each time, after a warm-up run; the median is kept")
+    parser.add_argument("--threshold", type=float, default=0.25, help="relative increase over the baseline that fails")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="path of the baseline")
+    parser.add_argument("--save-baseline", action="store_true", help="stores the results as the new baseline")
+    parser.add_argument("--case", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.case:
+        print(json.dumps(measure_case(args.case[0], int(args.case[1]), args.repeat)))
+        return
+
+    results = {}
+    for kind in args.kinds:
+        for lines in args.sizes:
+            results[f"{kind}-{lines}"] = run_case(kind, lines, args.repeat)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+    if args.save_baseline:
+        baseline.update({case: {metric: round(value, 3) for metric, value in metrics.items()} for case, metrics in results.items()})
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(baseline, file, indent=2, sort_keys=True)
+            file.write("\n")
+
+    failures = compare(results, baseline, args.threshold)
+    if failures:
+        print(f"\n{len(failures)} metrics over the baseline by more than {args.threshold:.0%}:")
+        for failure in failures:
+            print(f"    {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Headless batch converter: turns a tree of Markdown files into HTML and/or PDF.
+
+Uses the same markdown extensions and CSS themes of the editor preview, under the
+offscreen Qt platform, with the files distributed over a pool of processes.
+
+Example:
+    python3 convert.py docs -o build/docs --format pdf --theme github_light_style.css -j 8
+"""
+import argparse
+import os
+import sys
+import time
+
+from aether_editor.batch_convert import convert_tree
+
+
+def parse_arguments(argv: list) -> argparse.Namespace:
+    """
+    Reads the command line options.
+
+    Args:
+        argv (list[str]): the command line arguments, without the program name.
+
+    Returns:
+        argparse.Namespace: the parsed options.
+    """
+    themes = sorted(os.listdir(os.path.join(os.path.dirname(__file__), "aether_editor", "documents_styles")))
+    parser = argparse.ArgumentParser(description="Converte arquivos Markdown para HTML e/ou PDF.")
+    parser.add_argument("source", help="diretório (ou arquivo) com os arquivos .md")
+    parser.add_argument("-o", "--output", default="output", help="diretório de saída (padrão: output)")
+    parser.add_argument(
+        "-f", "--format", choices=("html", "pdf", "both"), default="html",
+        help="formato de saída (padrão: html)"
+    )
+    parser.add_argument("-t", "--theme", choices=themes, default="main_style.css", help="tema CSS do documento")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="número de processos (padrão: núcleos da CPU)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="mostra apenas erros e o resumo")
+    return parser.parse_args(argv)
+
+
+def main(argv: list) -> int:
+    """
+    Runs the conversion and prints a summary.
+
+    Args:
+        argv (list[str]): the command line arguments, without the program name.
+
+    Returns:
+        int: the exit status, 1 if any file failed.
+    """
+    options = parse_arguments(argv)
+    formats = ("html", "pdf") if options.format == "both" else (options.format,)
+
+    def report(result):
+        if result.error:
+            print(f"ERRO {result.source}: {result.error}", file=sys.stderr)
+        elif not options.quiet:
+            print(f"ok   {result.source} -> {', '.join(result.outputs)}")
+
+    start = time.perf_counter()
+    results = convert_tree(options.source, options.output, formats, options.theme, options.jobs, report)
+    elapsed = time.perf_counter() - start
+
+    failures = sum(1 for result in results if result.error)
+    print(f"{len(results) - failures} convertidos, {failures} com erro em {elapsed:.2f} s")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))